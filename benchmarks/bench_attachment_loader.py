@@ -0,0 +1,155 @@
+"""
+Benchmark do carregamento de anexos contra um servidor HTTP local.
+
+Sobe um servidor HTTP local com latência artificial por requisição, que serve
+imagens sintéticas de um jogador (incluindo URLs repetidas, conteúdo duplicado
+em URLs diferentes e uma URL inexistente), e mede o tempo para baixar e
+preparar os anexos de forma sequencial e com o pool limitado. Verifica a
+remoção de duplicados, o tratamento de erros, o orçamento total de bytes, o
+orçamento de download e a recusa de origens não permitidas (arquivos locais fora
+de ATTACHMENT_BASE_DIR, hosts fora de ATTACHMENT_ALLOWED_HOSTS e redirecionamentos
+para eles).
+
+Uso:
+    python -m benchmarks.bench_attachment_loader --images 20 --latency 0.2
+"""
+import io
+import os
+import sys
+import time
+import argparse
+import threading
+import contextlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from controllers.attachment_loader import fetch_attachments, prepare_attachments
+
+
+def generate_image(index, size=(1200, 900)):
+    """
+    Gera uma imagem sintética em JPEG, diferente para cada índice.
+    """
+    from PIL import Image
+
+    image = Image.effect_noise(size, 32 + index).convert('RGB')
+    buffer = io.BytesIO()
+    image.save(buffer, 'JPEG', quality=90)
+    return buffer.getvalue()
+
+
+def start_server(files, latency, redirects=None):
+    """
+    Sobe o servidor HTTP local em uma porta livre.
+
+    Returns:
+        tuple: (servidor, URL base)
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(latency)
+            if self.path in (redirects or {}):
+                self.send_response(302)
+                self.send_header('Location', redirects[self.path])
+                self.end_headers()
+                return
+
+            data = files.get(self.path)
+            if data is None:
+                self.send_response(404)
+                self.end_headers()
+                return
+
+            self.send_response(200)
+            self.send_header('Content-Type', 'image/jpeg')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_port}'
+
+
+def load(urls, max_workers, max_total_bytes):
+    """
+    Baixa e prepara os anexos, retornando o tempo total e os resultados.
+    """
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(open(os.devnull, 'w')):
+        fetched = fetch_attachments(urls, max_workers=max_workers)
+        prepared = prepare_attachments(fetched, 'anthropic', max_total_bytes=max_total_bytes,
+                                       max_workers=max_workers)
+    return time.perf_counter() - start, fetched, prepared
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--images', type=int, default=20)
+    parser.add_argument('--latency', type=float, default=0.2)
+    parser.add_argument('--max-workers', type=int, default=20)
+    parser.add_argument('--max-total-mb', type=float, default=10)
+    args = parser.parse_args()
+
+    files = {f'/player/scorecard_{index}': generate_image(index) for index in range(args.images)}
+    files['/player/copy_of_scorecard_0.jpg'] = files['/player/scorecard_0']
+
+    # Apenas o servidor local é uma origem permitida; o redirecionamento leva ao serviço de metadados
+    os.environ['ATTACHMENT_ALLOWED_HOSTS'] = '127.0.0.1'
+    os.environ['ATTACHMENT_BASE_DIR'] = ''
+    metadata_url = 'http://169.254.169.254/latest/meta-data/'
+    server, base_url = start_server(files, args.latency, {'/player/redirect.jpg': metadata_url})
+    urls = [base_url + path for path in files]
+    urls += [urls[0], base_url + '/player/missing.jpg']
+    image_bytes = len(files['/player/scorecard_0'])
+
+    failures = []
+    try:
+        sequential_time, _, _ = load(urls, 1, int(args.max_total_mb * 1024 * 1024))
+        pooled_time, fetched, prepared = load(urls, args.max_workers, int(args.max_total_mb * 1024 * 1024))
+        _, _, limited = load(urls, args.max_workers, 200_000)
+        with contextlib.redirect_stdout(open(os.devnull, 'w')):
+            blocked = fetch_attachments([os.path.abspath(__file__), metadata_url, base_url + '/player/redirect.jpg'])
+            budgeted = fetch_attachments(urls[:args.images], max_workers=args.max_workers,
+                                         max_download_bytes=int(image_bytes * 2.5))
+    finally:
+        server.shutdown()
+
+    statuses = [attachment['status'] for attachment in fetched]
+    print(f'anexos: {len(urls)} URLs  baixados: {statuses.count("loaded")}  '
+          f'duplicados: {statuses.count("duplicate")}  erros: {statuses.count("error")}')
+    print(f'sequencial: {sequential_time:.2f}s  pool ({args.max_workers}): {pooled_time:.2f}s  '
+          f'latência de um download: {args.latency:.2f}s')
+    print(f'enviados: {len(prepared)} anexos, {sum(item["bytes"] for item in prepared) / 1e6:.2f}MB  '
+          f'com orçamento de 200KB: {len(limited)} anexos')
+    downloaded = sum(len(item['data']) for item in budgeted if item['data'] is not None)
+    print(f'orçamento de download de {int(image_bytes * 2.5) / 1e6:.2f}MB: '
+          f'{sum(item["status"] == "loaded" for item in budgeted)} anexos, {downloaded / 1e6:.2f}MB  '
+          f'origens recusadas: {sum(item["status"] == "error" for item in blocked)} de {len(blocked)}')
+
+    if statuses.count('loaded') != args.images or statuses.count('duplicate') != 1 or statuses.count('error') != 1:
+        failures.append('contagem de anexos baixados, duplicados ou com erro incorreta')
+    if pooled_time > sequential_time / 2:
+        failures.append('o pool não reduziu o tempo de carregamento')
+    if sum(item['bytes'] for item in limited) > 200_000:
+        failures.append('o orçamento total de bytes não foi respeitado')
+    if downloaded > image_bytes * 2.5 or sum(item['status'] == 'loaded' for item in budgeted) > 2:
+        failures.append('o orçamento de download não interrompeu os downloads')
+    for item in blocked:
+        if item['status'] != 'error' or 'não permitida' not in item['error']:
+            failures.append(f"origem não permitida carregada: {item['source']}")
+
+    for failure in failures:
+        print(f'[FALHA] {failure}')
+
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
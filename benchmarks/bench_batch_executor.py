@@ -0,0 +1,179 @@
+"""
+Benchmark da inferência simultânea dos lotes (BatchExecutor).
+
+1. Executor isolado: itens de tamanho fixo (simulando lotes e corpos de
+   requisição) processados com latência fixa, com falhas em alguns itens. Valida
+   a ordem dos resultados, a coleta das falhas sem interromper os demais itens e a
+   contrapressão: o número de itens lidos e ainda não concluídos nunca excede o
+   limite de concorrência, mesmo com a leitura mais rápida que o processamento.
+2. process_all_batches: arquivo JSONL sintético com um Bedrock simulado (latência
+   fixa e falha em um dos lotes), comparando a execução serial (max_concurrency=1)
+   com a simultânea.
+
+Uso:
+    python -m benchmarks.bench_batch_executor --items 32 --concurrency 4 --latency 0.1
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import threading
+import contextlib
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+import lambda_handler
+from controllers.batch_executor import BatchExecutor
+from templates.prompt_template import PromptTemplate
+from utils.instrumentation import set_log_level
+from benchmarks.synthetic_data import generate_file
+
+# Tamanho de cada item do executor isolado (simula um lote com seu corpo de requisição)
+ITEM_BYTES = 1024 * 1024
+
+
+class LiveItems:
+    """
+    Conta os itens lidos e ainda não concluídos (mantidos em memória).
+    """
+
+    def __init__(self):
+        self.live = 0
+        self.max_live = 0
+        self._lock = threading.Lock()
+
+    def produce(self, count):
+        for index in range(count):
+            with self._lock:
+                self.live += 1
+                self.max_live = max(self.max_live, self.live)
+            yield index, bytearray(ITEM_BYTES)
+
+    def done(self):
+        with self._lock:
+            self.live -= 1
+
+
+def run_executor(count, concurrency, latency, failing):
+    """
+    Processa os itens com o executor.
+
+    Returns:
+        tuple: (resultados, tempo em segundos, máximo de itens em memória, máximo em andamento)
+    """
+    items = LiveItems()
+    executor = BatchExecutor(concurrency)
+
+    def process(item):
+        index, payload = item
+        try:
+            time.sleep(latency)
+            if index in failing:
+                raise RuntimeError(f'falha simulada no item {index}')
+            return index * 2, len(payload)
+        finally:
+            items.done()
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(open(os.devnull, 'w')):
+        outcomes = list(executor.map(process, items.produce(count)))
+    return outcomes, time.perf_counter() - start, items.max_live, executor.max_in_flight
+
+
+class FakeInferenceService:
+    """
+    Serviço de inferência simulado: latência fixa e falha no lote `failing_batch`.
+    """
+    latency_seconds = 0.1
+    failing_batch = None
+
+    def __init__(self, model_id, request_body, **kwargs):
+        self.request_body = request_body
+        self.latency = None
+        self.usage = {}
+        self.cache_hit = False
+
+    def invoke_model(self):
+        time.sleep(self.latency_seconds)
+        self.latency = self.latency_seconds
+        if self.failing_batch is not None and f'batch_{self.failing_batch:04d}.'.encode() in self.request_body:
+            raise RuntimeError('ThrottlingException simulada')
+        return 'relatório'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--items', type=int, default=32)
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--latency', type=float, default=0.1)
+    parser.add_argument('--size-kb', type=float, default=2048, help='tamanho do arquivo de process_all_batches')
+    args = parser.parse_args()
+
+    set_log_level('ERROR')
+    failures = []
+
+    # 1 - Executor isolado
+    failing = {3, args.items // 2}
+    print(f'{"execução":<12} {"itens":>6} {"falhas":>7} {"tempo":>8} {"em memória":>11} {"em andamento":>13}')
+    timings = {}
+    for name, concurrency in (('serial', 1), ('simultânea', args.concurrency)):
+        outcomes, elapsed, max_live, max_in_flight = run_executor(args.items, concurrency, args.latency, failing)
+        errors = [outcome['index'] for outcome in outcomes if outcome['status'] == 'error']
+        timings[name] = elapsed
+        print(f'{name:<12} {len(outcomes):>6} {len(errors):>7} {elapsed:>7.2f}s {max_live:>11} {max_in_flight:>13}')
+
+        if [outcome['index'] for outcome in outcomes] != list(range(args.items)):
+            failures.append(f'{name}: resultados fora da ordem dos itens')
+        if any(outcome['result'][0] != outcome['index'] * 2 for outcome in outcomes if outcome['status'] == 'success'):
+            failures.append(f'{name}: resultado associado ao item errado')
+        if sorted(errors) != sorted(failing):
+            failures.append(f'{name}: falhas coletadas {errors}, esperadas {sorted(failing)}')
+        if max_live > concurrency:
+            failures.append(f'{name}: {max_live} itens em memória com limite {concurrency}')
+
+    speedup = timings['serial'] / timings['simultânea']
+    print(f'aceleração: {speedup:.1f}x com {args.concurrency} itens simultâneos')
+    if speedup < args.concurrency * 0.7:
+        failures.append(f'aceleração de {speedup:.1f}x abaixo do esperado para {args.concurrency} itens simultâneos')
+
+    # 2 - process_all_batches com o Bedrock simulado
+    FakeInferenceService.latency_seconds = args.latency
+    FakeInferenceService.failing_batch = 1
+    lambda_handler.BedrockInferenceService = FakeInferenceService
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        context_path = os.path.join(work_dir, 'sessions.jsonl')
+        generate_file(context_path, 'jsonl', int(args.size_kb * 1024))
+        prompt = PromptTemplate('player')
+
+        print(f'\n{"process_all_batches":<20} {"lotes":>6} {"falhas":>7} {"tempo":>8}')
+        results = {}
+        for concurrency in (1, args.concurrency):
+            event = {'model': 'nova_pro', 'use_cache': False, 'max_concurrency': concurrency}
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(open(os.devnull, 'w')):
+                results[concurrency] = lambda_handler.process_all_batches(event, prompt, context_path)
+            elapsed = time.perf_counter() - start
+            errors = [result['batch_index'] for result in results[concurrency] if result['status'] == 'error']
+            print(f'{"max_concurrency=" + str(concurrency):<20} {len(results[concurrency]):>6} {len(errors):>7} '
+                  f'{elapsed:>7.2f}s')
+
+            if [result['batch_index'] for result in results[concurrency]] != list(range(len(results[concurrency]))):
+                failures.append(f'max_concurrency={concurrency}: lotes fora da ordem do arquivo')
+            if errors != [1]:
+                failures.append(f'max_concurrency={concurrency}: falhas {errors}, esperada apenas no lote 1')
+
+        rows = [(result['start_row'], result['end_row']) for result in results[args.concurrency]]
+        if rows != [(result['start_row'], result['end_row']) for result in results[1]]:
+            failures.append('intervalos de linhas diferentes entre as execuções serial e simultânea')
+
+    for failure in failures:
+        print(f'[FALHA] {failure}')
+
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
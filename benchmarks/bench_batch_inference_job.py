@@ -0,0 +1,191 @@
+"""
+Execução ponta a ponta do modo de inferência em lote contra um S3/Bedrock locais.
+
+Gera arquivos de contexto sintéticos para vários jogadores, submete o job com um
+S3 em memória e um Bedrock simulado (que lê os registros do S3, responde cada
+um no formato do modelo e grava a saída como o serviço real), aguarda o job e
+agrupa as respostas por jogador em uma nova instância, a partir apenas do ARN do
+job (como a invocação de coleta da Lambda). Verifica que todos os lotes voltaram para o
+jogador correto, cobrindo todas as linhas, e reporta o tempo de cada etapa.
+
+Uso:
+    python -m benchmarks.bench_batch_inference_job --players 50 --size-kb 256
+"""
+import io
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import contextlib
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from controllers.batch_inference_job import BatchInferenceJob
+from benchmarks.synthetic_data import generate_file
+
+
+def split_s3_uri(s3_uri):
+    """
+    Separa um URI 's3://bucket/chave' em (bucket, chave).
+    """
+    bucket, _, key = s3_uri[len('s3://'):].partition('/')
+    return bucket, key
+
+
+class FakeBody(io.BytesIO):
+    """
+    Corpo de resposta com a mesma interface do StreamingBody do botocore.
+    """
+
+    def iter_lines(self):
+        for line in self.read().splitlines():
+            yield line
+
+
+class FakeS3:
+    """
+    S3 em memória com as operações usadas pelo BatchInferenceJob.
+    """
+
+    def __init__(self):
+        self.objects = {}
+
+    def put_object(self, Bucket, Key, Body):
+        self.objects[(Bucket, Key)] = bytes(Body)
+        return {}
+
+    def get_object(self, Bucket, Key):
+        return {'Body': FakeBody(self.objects[(Bucket, Key)])}
+
+    def get_paginator(self, operation_name):
+        s3 = self
+
+        class Paginator:
+            def paginate(self, Bucket, Prefix):
+                keys = sorted(key for bucket, key in s3.objects if bucket == Bucket and key.startswith(Prefix))
+                yield {'Contents': [{'Key': key} for key in keys]}
+
+        return Paginator()
+
+
+class FakeBedrock:
+    """
+    Bedrock de controle simulado: o job avança de estado a cada consulta e, ao
+    concluir, grava as respostas em '<saída>/<ID do job>/records.jsonl.out'.
+    """
+
+    def __init__(self, s3, polls_until_done=3):
+        self.s3 = s3
+        self.polls_until_done = polls_until_done
+        self.jobs = {}
+
+    def create_model_invocation_job(self, jobName, roleArn, modelId, inputDataConfig, outputDataConfig):
+        job_id = f'job{len(self.jobs):08d}'
+        job_arn = f'arn:aws:bedrock:us-east-1:000000000000:model-invocation-job/{job_id}'
+        self.jobs[job_arn] = {
+            'job_id': job_id,
+            'job_name': jobName,
+            'polls': 0,
+            'input_uri': inputDataConfig['s3InputDataConfig']['s3Uri'],
+            'output_uri': outputDataConfig['s3OutputDataConfig']['s3Uri'],
+        }
+        return {'jobArn': job_arn}
+
+    def get_model_invocation_job(self, jobIdentifier):
+        job = self.jobs[jobIdentifier]
+        job['polls'] += 1
+
+        if job['polls'] == self.polls_until_done:
+            self._process(job)
+        return {
+            'status': 'InProgress' if job['polls'] < self.polls_until_done else 'Completed',
+            'jobName': job['job_name'],
+            'inputDataConfig': {'s3InputDataConfig': {'s3Uri': job['input_uri']}},
+            'outputDataConfig': {'s3OutputDataConfig': {'s3Uri': job['output_uri']}},
+        }
+
+    def _process(self, job):
+        bucket, key = split_s3_uri(job['input_uri'])
+        output_lines = []
+
+        for line in self.s3.objects[(bucket, key)].splitlines():
+            record = json.loads(line)
+            output_lines.append(json.dumps({
+                'recordId': record['recordId'],
+                'modelInput': record['modelInput'],
+                'modelOutput': {
+                    'output': {'message': {'content': [{'text': f"relatório {record['recordId']}"}]}},
+                    'usage': {'inputTokens': len(line) // 4, 'outputTokens': 10},
+                },
+            }))
+
+        output_bucket, output_prefix = split_s3_uri(job['output_uri'])
+        output_key = f"{output_prefix}{job['job_id']}/{key.rsplit('/', 1)[-1]}.out"
+        self.s3.put_object(Bucket=output_bucket, Key=output_key, Body='\n'.join(output_lines).encode('utf-8'))
+        self.s3.put_object(Bucket=output_bucket, Key=f"{output_prefix}{job['job_id']}/manifest.json.out",
+                           Body=json.dumps({'totalRecordCount': len(output_lines)}).encode('utf-8'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--players', type=int, default=20)
+    parser.add_argument('--size-kb', type=float, default=256)
+    args = parser.parse_args()
+
+    s3 = FakeS3()
+    bedrock = FakeBedrock(s3)
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        players = []
+        expected_rows = {}
+        for index in range(args.players):
+            context_path = os.path.join(work_dir, f'player_{index}.jsonl')
+            expected_rows[str(index)] = generate_file(context_path, 'jsonl', int(args.size_kb * 1024), seed=index)
+            players.append({'player_id': index, 'context_path': context_path, 'context': f'player {index}'})
+
+        job = BatchInferenceJob('nova_pro', bucket='bench-bucket', role_arn='arn:aws:iam::000000000000:role/bench',
+                                job_name='bench-job', s3_client=s3, bedrock_client=bedrock)
+
+        with contextlib.redirect_stdout(open(os.devnull, 'w')):
+            start = time.perf_counter()
+            job.submit(players)
+            submit_time = time.perf_counter() - start
+
+            job.wait(poll_interval=0)
+
+            # Coleta em outra invocação: apenas o ARN do job, sem o nome gerado na submissão
+            collector = BatchInferenceJob('nova_pro', bucket='bench-bucket',
+                                          role_arn='arn:aws:iam::000000000000:role/bench',
+                                          s3_client=s3, bedrock_client=bedrock)
+            start = time.perf_counter()
+            collector.attach(job.job_arn)
+            results = collector.collect_results()
+            collect_time = time.perf_counter() - start
+
+    failures = []
+    for player_id, rows in expected_rows.items():
+        player_results = results.get(player_id, {})
+        batches = player_results.get('batches', [])
+        covered = sum(batch['end_row'] - batch['start_row'] for batch in batches)
+
+        if player_results.get('status') != 'success' or covered != rows:
+            failures.append(f'jogador {player_id}: estado {player_results.get("status")}, {covered}/{rows} linhas')
+        if any(batch['start_row'] != previous['end_row'] for previous, batch in zip(batches, batches[1:])):
+            failures.append(f'jogador {player_id}: lotes fora de ordem')
+
+    records_bytes = s3.objects[('bench-bucket', job.input_prefix + 'records.jsonl')]
+    print(f'jogadores: {args.players}  registros: {len(job.manifest)}  '
+          f'entrada: {len(records_bytes) / 1024 / 1024:.1f}MB')
+    print(f'submissão: {submit_time:.3f}s  coleta: {collect_time:.3f}s')
+
+    for failure in failures:
+        print(f'[FALHA] {failure}')
+
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
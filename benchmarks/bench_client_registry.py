@@ -0,0 +1,150 @@
+"""
+Benchmark do custo por invocação do cliente Bedrock Runtime.
+
+Compara o comportamento antigo (um cliente novo a cada invocação) com o registro
+de clientes compartilhados (services/bedrock_client_registry.py), usando um
+endpoint HTTP local que simula o bedrock-runtime. Como o stub não usa TLS, o
+ganho real em produção é maior (o handshake TLS também deixa de se repetir).
+
+Uso:
+    python -m benchmarks.bench_client_registry --invocations 200
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+# Resposta simulada no formato da Anthropic
+STUB_RESPONSE = json.dumps({
+    'content': [{'type': 'text', 'text': '<html>ok</html>'}],
+    'usage': {'input_tokens': 10, 'output_tokens': 3},
+}).encode('utf-8')
+
+
+class StubBedrockHandler(BaseHTTPRequestHandler):
+    """
+    Handler HTTP que responde a qualquer POST com uma resposta fixa do modelo.
+    """
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    connections = 0
+    connections_lock = threading.Lock()
+
+    def setup(self):
+        super().setup()
+        with StubBedrockHandler.connections_lock:
+            StubBedrockHandler.connections += 1
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(STUB_RESPONSE)))
+        self.end_headers()
+        self.wfile.write(STUB_RESPONSE)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub_server():
+    """
+    Inicia o servidor HTTP local em uma porta livre.
+
+    Returns:
+        ThreadingHTTPServer: Servidor em execução
+    """
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubBedrockHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def percentile(values, pct):
+    """
+    Calcula o percentil (nearest-rank) de uma lista de valores.
+    """
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def run_invocations(get_client, invocations, model_id, request_body):
+    """
+    Executa as invocações medindo o tempo de cada uma (criação do cliente + chamada).
+
+    Returns:
+        list: Latências em milissegundos
+    """
+    latencies = []
+    for _ in range(invocations):
+        start = time.perf_counter()
+        client = get_client()
+        response = client.invoke_model(
+            modelId=model_id,
+            contentType='application/json',
+            accept='application/json',
+            body=request_body,
+        )
+        response['body'].read()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def summarize(name, latencies, connections):
+    """
+    Imprime o resumo das latências de um cenário.
+    """
+    print(f'{name:<22} mean={statistics.mean(latencies):7.2f}ms '
+          f'p50={percentile(latencies, 50):7.2f}ms p95={percentile(latencies, 95):7.2f}ms '
+          f'conexões={connections}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--invocations', type=int, default=200)
+    args = parser.parse_args()
+
+    server = start_stub_server()
+    endpoint_url = f'http://127.0.0.1:{server.server_address[1]}'
+
+    # Credenciais fictícias: nenhuma chamada sai da máquina
+    os.environ['BEDROCK_ENDPOINT_URL'] = endpoint_url
+    for name in ('AWS_ACCESS_KEY_ID', 'AWS_SECRET_ACCESS_KEY', 'AWS_SESSION_TOKEN'):
+        os.environ[name] = 'testing'
+
+    from services import bedrock_client_registry as registry
+
+    model_id = 'anthropic.claude-3-haiku-20240307-v1:0'
+    request_body = json.dumps({'anthropic_version': 'bedrock-2023-05-31', 'max_tokens': 10,
+                               'messages': [{'role': 'user', 'content': [{'type': 'text', 'text': 'oi'}]}]})
+
+    # Antes: um cliente novo por invocação, como o BedrockInferenceService fazia
+    StubBedrockHandler.connections = 0
+    before = run_invocations(
+        lambda: registry.get_session().client('bedrock-runtime', region_name='us-east-1', endpoint_url=endpoint_url),
+        args.invocations, model_id, request_body,
+    )
+    summarize('cliente por invocação', before, StubBedrockHandler.connections)
+
+    # Depois: cliente compartilhado pelo registro
+    registry.clear_bedrock_clients()
+    StubBedrockHandler.connections = 0
+    after = run_invocations(
+        lambda: registry.get_bedrock_client('us-east-1', registry.get_model_family(model_id)),
+        args.invocations, model_id, request_body,
+    )
+    summarize('cliente compartilhado', after, StubBedrockHandler.connections)
+
+    print(f'Redução média por invocação: {statistics.mean(before) - statistics.mean(after):.2f}ms')
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,403 @@
+"""
+Benchmark de ponta a ponta do lambda_handler com um bedrock-runtime emulado.
+
+Cada cenário (modo x tipo de arquivo x tamanho) roda em um processo novo, que
+importa o lambda_handler, substitui o cliente do Bedrock Runtime por um emulador
+local (latência configurável, respostas no formato de cada família de modelo) e
+invoca o handler várias vezes sobre um arquivo sintético CSV, JSON ou JSONL.
+
+Reporta, por cenário:
+- latência do handler: primeira invocação, p50, p90 e p99 das seguintes
+- latência de cada etapa (p50 e p99), lida das linhas EMF emitidas pelo handler
+- pico de RSS do processo e, com --trace-allocations, o pico de memória alocada
+  (tracemalloc) em cada etapa, medido em uma invocação adicional
+
+Os resultados podem ser gravados em JSON (--output) e comparados com os de
+outra versão do código (--baseline, ou --compare entre dois arquivos gravados).
+benchmarks/baselines/end_to_end.json guarda os resultados da configuração padrão.
+
+Uso:
+    python -m benchmarks.bench_end_to_end --sizes 1KB 1MB 32MB --file-types csv json jsonl
+    python -m benchmarks.bench_end_to_end --sizes 500MB --modes initial_batch --data-dir /tmp/bench-data
+    python -m benchmarks.bench_end_to_end --output results/v2.json --baseline results/v1.json
+    python -m benchmarks.bench_end_to_end --baseline benchmarks/baselines/end_to_end.json
+    python -m benchmarks.bench_end_to_end --compare results/v1.json results/v2.json
+"""
+import io
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import subprocess
+import contextlib
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from benchmarks.synthetic_data import generate_file
+
+# Unidades aceitas em --sizes
+SIZE_UNITS = {'KB': 1024, 'MB': 1024 ** 2, 'GB': 1024 ** 3}
+
+# Eventos de cada modo do handler
+MODE_EVENTS = {
+    'initial_batch': {},
+    'stream': {'stream': True},
+    'all_batches': {'process_all_batches': True},
+}
+
+# Ambiente dos processos de medição: sem cache de respostas, deduplicação de eventos,
+# limitador de taxa, gravação de resultados ou logs além de erros
+WORKER_ENVIRONMENT = {
+    'RESPONSE_CACHE_ENABLED': 'false',
+    'IDEMPOTENCY_ENABLED': 'false',
+    'BEDROCK_REQUESTS_PER_MINUTE': '0',
+    'BEDROCK_TOKENS_PER_MINUTE': '0',
+    'RESULTS_TABLE': '',
+    'RESULTS_BUCKET': '',
+    'WRITE_BATCH_FILES': 'false',
+    'LOG_LEVEL': 'ERROR',
+    'METRICS_ENABLED': 'true',
+}
+
+# Métricas comparadas entre versões (cenário -> valor)
+COMPARED_METRICS = ('p50_ms', 'p99_ms', 'peak_rss_mb')
+
+
+def parse_size(text):
+    """
+    Converte um tamanho como '1KB', '32MB' ou '1.5GB' em bytes.
+    """
+    text = text.strip().upper()
+    for unit, factor in SIZE_UNITS.items():
+        if text.endswith(unit):
+            return int(float(text[:-len(unit)]) * factor)
+    return int(text)
+
+
+def percentile(values, fraction):
+    """
+    Percentil com interpolação linear (fraction entre 0 e 1).
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+class LocalBedrockRuntime:
+    """
+    Emulador local do bedrock-runtime: responde após `latency` segundos mais
+    `latency_per_1k_tokens` por mil tokens estimados da requisição, no formato
+    da família do modelo (Anthropic, Amazon Nova ou Meta Llama).
+    """
+
+    def __init__(self, latency=0.05, latency_per_1k_tokens=0.0, output_words=200):
+        self.latency = latency
+        self.latency_per_1k_tokens = latency_per_1k_tokens
+        self.output_words = output_words
+        self.requests = 0
+
+    def _wait(self, body):
+        self.requests += 1
+        time.sleep(self.latency + len(body) / 4 / 1000 * self.latency_per_1k_tokens)
+
+    def _response_body(self, model_id, text):
+        usage = {'input_tokens': 1000, 'output_tokens': self.output_words}
+        if model_id.startswith('amazon.'):
+            return {'output': {'message': {'content': [{'text': text}]}},
+                    'usage': {'inputTokens': 1000, 'outputTokens': self.output_words}}
+        if model_id.startswith('meta.'):
+            return {'generation': text, 'prompt_token_count': 1000, 'generation_token_count': self.output_words}
+        return {'content': [{'type': 'text', 'text': text}], 'usage': usage}
+
+    def invoke_model(self, modelId, body, **kwargs):
+        self._wait(body)
+        text = ' '.join(['relatório'] * self.output_words)
+        payload = json.dumps(self._response_body(modelId, text)).encode('utf-8')
+        return {'body': io.BytesIO(payload), 'ResponseMetadata': {'RequestId': f'local-{self.requests}'}}
+
+    def invoke_model_with_response_stream(self, modelId, body, **kwargs):
+        self._wait(body)
+
+        def events():
+            for _ in range(self.output_words):
+                if modelId.startswith('amazon.'):
+                    chunk = {'contentBlockDelta': {'delta': {'text': 'relatório '}}}
+                elif modelId.startswith('meta.'):
+                    chunk = {'generation': 'relatório '}
+                else:
+                    chunk = {'type': 'content_block_delta', 'delta': {'type': 'text_delta', 'text': 'relatório '}}
+                yield {'chunk': {'bytes': json.dumps(chunk).encode('utf-8')}}
+
+            metrics = {'amazon-bedrock-invocationMetrics': {'inputTokenCount': 1000,
+                                                            'outputTokenCount': self.output_words}}
+            yield {'chunk': {'bytes': json.dumps(metrics).encode('utf-8')}}
+
+        return {'body': events()}
+
+
+def trace_stage_allocations(allocations):
+    """
+    Substitui StageMetrics.timer por uma versão que também registra o pico de memória
+    alocada (tracemalloc) acima do início de cada etapa. Em etapas aninhadas, o pico
+    da etapa externa considera apenas o trecho após a última etapa interna.
+    """
+    import tracemalloc
+    from utils.instrumentation import StageMetrics
+
+    timer = StageMetrics.timer
+
+    @contextlib.contextmanager
+    def traced_timer(self, stage):
+        before = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        try:
+            with timer(self, stage):
+                yield
+        finally:
+            peak = tracemalloc.get_traced_memory()[1]
+            allocations[stage] = max(allocations.get(stage, 0), peak - before)
+
+    StageMetrics.timer = traced_timer
+
+
+def run_worker(spec):
+    """
+    Executa um cenário no processo atual (chamado em um processo novo pelo main).
+
+    Returns:
+        dict: Latências, métricas por etapa e memória do cenário
+    """
+    import resource
+
+    os.environ.update(WORKER_ENVIRONMENT)
+    if spec.get('model'):
+        os.environ['MODEL_ROUTER_ENABLED'] = 'false'
+
+    import lambda_handler
+    import services.bedrock_services as bedrock_services
+
+    bedrock = LocalBedrockRuntime(spec['latency'], spec['latency_per_1k_tokens'], spec['output_words'])
+    bedrock_services.get_bedrock_client = lambda *args, **kwargs: bedrock
+
+    event = {'context': 'Jogador com histórico de partidas de jogos de tabuleiro',
+             'context_path': spec['context_path'], 'use_cache': False, **MODE_EVENTS[spec['mode']]}
+    if spec.get('model'):
+        event['model'] = spec['model']
+
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    latencies = []
+    stages = {}
+
+    def invoke():
+        output = io.StringIO()
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(output):
+            response = lambda_handler.lambda_handler(event, None)
+        elapsed = (time.perf_counter() - start) * 1000
+        if response['statusCode'] != 200:
+            raise RuntimeError(json.loads(response['body'])['error'])
+
+        stage_values = {}
+        for line in output.getvalue().splitlines():
+            if not line.startswith('{"_aws"'):
+                continue
+            document = json.loads(line)
+            for metric in document['_aws']['CloudWatchMetrics'][0]['Metrics']:
+                value = document[metric['Name']]
+                stage_values.setdefault(metric['Name'], []).extend(value if isinstance(value, list) else [value])
+        return elapsed, stage_values
+
+    for _ in range(spec['repeat']):
+        elapsed, stage_values = invoke()
+        latencies.append(elapsed)
+        for stage, values in stage_values.items():
+            stages.setdefault(stage, []).extend(values)
+
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # Invocação adicional com o tracemalloc, fora das medições de latência
+    allocations = {}
+    if spec['trace_allocations']:
+        import tracemalloc
+        trace_stage_allocations(allocations)
+        tracemalloc.start()
+        invoke()
+        tracemalloc.stop()
+
+    warm = latencies[1:] or latencies
+    return {
+        'requests': bedrock.requests,
+        'first_ms': round(latencies[0], 3),
+        'p50_ms': round(percentile(warm, 0.50), 3),
+        'p90_ms': round(percentile(warm, 0.90), 3),
+        'p99_ms': round(percentile(warm, 0.99), 3),
+        'stages': {stage: {'count': len(values), 'p50_ms': round(percentile(values, 0.50), 3),
+                           'p99_ms': round(percentile(values, 0.99), 3)} for stage, values in stages.items()},
+        'rss_before_mb': round(rss_before / 1024, 1),
+        'peak_rss_mb': round(peak_rss / 1024, 1),
+        'allocations_mb': {stage: round(value / 1024 / 1024, 3) for stage, value in allocations.items()},
+    }
+
+
+def run_scenario(spec):
+    """
+    Executa um cenário em um processo novo (RSS e caches de processo independentes).
+    """
+    result = subprocess.run([sys.executable, '-m', 'benchmarks.bench_end_to_end', '--worker', json.dumps(spec)],
+                            cwd=ROOT_DIR, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else 'falha no worker')
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def get_metadata(args):
+    """
+    Identifica a versão do código e o ambiente da execução.
+    """
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT_DIR, capture_output=True,
+                                text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+
+    return {
+        'commit': commit,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'latency': args.latency,
+        'latency_per_1k_tokens': args.latency_per_1k_tokens,
+        'repeat': args.repeat,
+    }
+
+
+def compare(baseline, current, tolerance):
+    """
+    Compara os cenários em comum de duas execuções.
+
+    Returns:
+        list: Regressões (métrica acima de baseline x tolerância)
+    """
+    regressions = []
+    baseline_scenarios = {scenario['name']: scenario for scenario in baseline['scenarios']}
+
+    print(f'\nComparação com {baseline["metadata"].get("commit")} (tolerância {tolerance:.2f}x)')
+    for scenario in current['scenarios']:
+        previous = baseline_scenarios.get(scenario['name'])
+        if previous is None or 'error' in scenario or 'error' in previous:
+            continue
+        for metric in COMPARED_METRICS:
+            old, new = previous[metric], scenario[metric]
+            ratio = new / old if old else 1.0
+            print(f'  {scenario["name"]:<32} {metric:<12} {old:>10.1f} -> {new:>10.1f} ({ratio:.2f}x)')
+            if ratio > tolerance:
+                regressions.append(f'{scenario["name"]} {metric}: {old:.1f} -> {new:.1f} ({ratio:.2f}x)')
+    return regressions
+
+
+def print_scenario(scenario):
+    if 'error' in scenario:
+        print(f'{scenario["name"]:<32} [ERRO] {scenario["error"]}')
+        return
+
+    print(f'{scenario["name"]:<32} {scenario["first_ms"]:>9.1f} {scenario["p50_ms"]:>9.1f} {scenario["p90_ms"]:>9.1f} '
+          f'{scenario["p99_ms"]:>9.1f} {scenario["peak_rss_mb"]:>8.1f}MB {scenario["requests"]:>6}')
+    for stage, values in sorted(scenario['stages'].items(), key=lambda item: -item[1]['p50_ms']):
+        allocated = scenario['allocations_mb'].get(stage)
+        allocated = f'{allocated:>9.2f}MB' if allocated is not None else ''
+        print(f'    {stage:<28} x{values["count"]:<5} p50 {values["p50_ms"]:>9.2f}ms  '
+              f'p99 {values["p99_ms"]:>9.2f}ms {allocated}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', nargs='+', default=['1KB', '1MB', '16MB'])
+    parser.add_argument('--file-types', nargs='+', default=['csv', 'json', 'jsonl'])
+    parser.add_argument('--modes', nargs='+', default=['initial_batch'], choices=sorted(MODE_EVENTS))
+    parser.add_argument('--model', help='modelo fixo (padrão: escolhido pelo roteador)')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--latency', type=float, default=0.05, help='latência base do Bedrock emulado (s)')
+    parser.add_argument('--latency-per-1k-tokens', type=float, default=0.001)
+    parser.add_argument('--output-words', type=int, default=200)
+    parser.add_argument('--trace-allocations', action='store_true', help='mede o pico alocado por etapa')
+    parser.add_argument('--data-dir', help='diretório dos arquivos sintéticos (reaproveitados entre execuções)')
+    parser.add_argument('--output', help='grava os resultados em JSON')
+    parser.add_argument('--baseline', help='compara com os resultados gravados de outra versão')
+    parser.add_argument('--compare', nargs=2, metavar=('BASELINE', 'ATUAL'), help='compara dois resultados gravados')
+    parser.add_argument('--tolerance', type=float, default=1.25)
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_worker(json.loads(args.worker))))
+        return 0
+
+    if args.compare:
+        with open(args.compare[0], encoding='utf-8') as file:
+            baseline = json.load(file)
+        with open(args.compare[1], encoding='utf-8') as file:
+            current = json.load(file)
+        regressions = compare(baseline, current, args.tolerance)
+        for regression in regressions:
+            print(f'[REGRESSÃO] {regression}')
+        return 1 if regressions else 0
+
+    results = {'metadata': get_metadata(args), 'scenarios': []}
+    print(f'{"cenário":<32} {"1ª (ms)":>9} {"p50":>9} {"p90":>9} {"p99":>9} {"pico RSS":>10} {"chamadas":>6}')
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        data_dir = args.data_dir or work_dir
+        os.makedirs(data_dir, exist_ok=True)
+
+        for file_type in args.file_types:
+            for size in args.sizes:
+                context_path = os.path.join(data_dir, f'sessions_{size.upper()}.{file_type}')
+                if not os.path.exists(context_path):
+                    generate_file(context_path, file_type, parse_size(size))
+
+                for mode in args.modes:
+                    name = f'{mode}/{file_type}/{size.upper()}'
+                    spec = {'mode': mode, 'context_path': context_path, 'model': args.model,
+                            'repeat': args.repeat, 'latency': args.latency,
+                            'latency_per_1k_tokens': args.latency_per_1k_tokens,
+                            'output_words': args.output_words, 'trace_allocations': args.trace_allocations}
+                    try:
+                        scenario = {'name': name, 'mode': mode, 'file_type': file_type,
+                                    'size_bytes': os.path.getsize(context_path), **run_scenario(spec)}
+                    except Exception as e:
+                        scenario = {'name': name, 'error': str(e)}
+
+                    results['scenarios'].append(scenario)
+                    print_scenario(scenario)
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(results, file, indent=2)
+            file.write('\n')
+        print(f'\nResultados gravados em {args.output}')
+
+    failures = [f'{scenario["name"]}: {scenario["error"]}' for scenario in results['scenarios'] if 'error' in scenario]
+    for failure in failures:
+        print(f'[FALHA] {failure}')
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as file:
+            regressions = compare(json.load(file), results, args.tolerance)
+        for regression in regressions:
+            print(f'[REGRESSÃO] {regression}')
+
+    return 1 if failures or regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
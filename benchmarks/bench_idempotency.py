@@ -0,0 +1,249 @@
+"""
+Benchmark da deduplicação de eventos (idempotência) do handler.
+
+Dispara várias invocações simultâneas do mesmo evento sobre um handler simulado
+(latência fixa, como uma inferência no Bedrock) com cada armazenamento: memória,
+arquivos (threads e processos independentes) e uma tabela DynamoDB local, com a
+mesma semântica de gravação condicional. Apenas a primeira invocação deve
+executar o handler, e as demais devem receber o mesmo resultado, com tempo total
+próximo de uma única execução.
+
+Valida também a normalização da chave, a liberação do evento após uma falha, a
+expiração dos resultados e a resposta 409 quando a espera termina antes do fim
+da execução original.
+
+Uso:
+    python -m benchmarks.bench_idempotency --duplicates 8 --latency 0.5
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from services.idempotency import (DynamoDBIdempotencyStore, EventInProgressError, FileIdempotencyStore, Idempotency,
+                                  MemoryIdempotencyStore, build_idempotency_key, idempotent)
+from utils.instrumentation import set_log_level
+
+# Evento repetido em todas as invocações
+EVENT = {'status': 'success', 'folder': '+16472038405', 'lines': 1, 'output_key': '+16472038405/output.jsonl'}
+
+# Intervalo entre as consultas de um evento em andamento
+POLL_INTERVAL = 0.02
+
+
+class ConditionalCheckFailedException(Exception):
+    def __init__(self):
+        super().__init__('The conditional request failed')
+        self.response = {'Error': {'Code': 'ConditionalCheckFailedException'}}
+
+
+class LocalDynamoDB:
+    """
+    Tabela DynamoDB local com a condição de gravação usada pelo armazenamento de
+    idempotência ('attribute_not_exists(idempotency_key) OR expires_at <= :now').
+    """
+
+    def __init__(self, latency=0.005):
+        self.latency = latency
+        self.items = {}
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def put_item(self, TableName, Item, ConditionExpression=None, ExpressionAttributeValues=None):
+        time.sleep(self.latency)
+        with self._lock:
+            self.calls += 1
+            key = Item['idempotency_key']['S']
+            current = self.items.get(key)
+            if ConditionExpression and current is not None:
+                now = float(ExpressionAttributeValues[':now']['N'])
+                if float(current['expires_at']['N']) > now:
+                    raise ConditionalCheckFailedException()
+            self.items[key] = Item
+        return {}
+
+    def get_item(self, TableName, Key, ConsistentRead=False):
+        time.sleep(self.latency)
+        with self._lock:
+            self.calls += 1
+            item = self.items.get(Key['idempotency_key']['S'])
+        return {'Item': item} if item else {}
+
+    def delete_item(self, TableName, Key):
+        time.sleep(self.latency)
+        with self._lock:
+            self.calls += 1
+            self.items.pop(Key['idempotency_key']['S'], None)
+        return {}
+
+
+class SlowHandler:
+    """
+    Handler simulado: responde após uma latência fixa e conta as execuções.
+    """
+
+    def __init__(self, latency, status_code=200):
+        self.latency = latency
+        self.status_code = status_code
+        self.executions = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, event, context):
+        with self._lock:
+            self.executions += 1
+            execution = self.executions
+        time.sleep(self.latency)
+        return {'statusCode': self.status_code, 'body': json.dumps({'execution': execution})}
+
+
+def run_duplicates(idempotency, handler, duplicates, key='evento'):
+    """
+    Invoca o mesmo evento simultaneamente em várias threads.
+
+    Returns:
+        tuple: (respostas, tempo total em segundos)
+    """
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=duplicates) as executor:
+        futures = [executor.submit(idempotency.run, key, lambda: handler(EVENT, None)) for _ in range(duplicates)]
+        responses = [future.result() for future in futures]
+    return responses, time.perf_counter() - start
+
+
+def run_in_process(path, latency, counter_path):
+    """
+    Invocação em um processo independente com o armazenamento em arquivos.
+    """
+    set_log_level('ERROR')
+    idempotency = Idempotency(FileIdempotencyStore(path), poll_interval=POLL_INTERVAL)
+
+    def handler():
+        with open(counter_path, 'a') as file:
+            file.write('x')
+        time.sleep(latency)
+        return {'statusCode': 200, 'body': json.dumps({'pid': os.getpid()})}
+
+    return idempotency.run(build_idempotency_key(EVENT), handler)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--duplicates', type=int, default=8)
+    parser.add_argument('--latency', type=float, default=0.5, help='latência do handler simulado (s)')
+    args = parser.parse_args()
+
+    set_log_level('ERROR')
+    failures = []
+
+    # 1 - Normalização da chave: ordem dos campos, 'request_id' e campos nulos não alteram a chave
+    key = build_idempotency_key(EVENT)
+    reordered = dict(reversed(list(EVENT.items())), request_id='reenvio-2', model=None)
+    if build_idempotency_key(reordered) != key:
+        failures.append('reenvio do mesmo evento gerou outra chave')
+    if build_idempotency_key({**EVENT, 'output_key': 'outro/output.jsonl'}) == key:
+        failures.append('eventos diferentes geraram a mesma chave')
+
+    # 2 - Invocações simultâneas do mesmo evento em cada armazenamento
+    with tempfile.TemporaryDirectory() as work_dir:
+        dynamodb = LocalDynamoDB()
+        stores = {
+            'memory': MemoryIdempotencyStore(),
+            'file': FileIdempotencyStore(os.path.join(work_dir, 'threads')),
+            'dynamodb': DynamoDBIdempotencyStore('idempotency', client=dynamodb),
+        }
+
+        print(f'{"armazenamento":<14} {"invocações":>10} {"execuções":>10} {"tempo":>9} {"serial":>9}')
+        for name, store in stores.items():
+            handler = SlowHandler(args.latency)
+            idempotency = Idempotency(store, poll_interval=POLL_INTERVAL)
+            responses, elapsed = run_duplicates(idempotency, handler, args.duplicates, key)
+            print(f'{name:<14} {args.duplicates:>10} {handler.executions:>10} {elapsed:>8.2f}s '
+                  f'{args.latency * args.duplicates:>8.2f}s')
+
+            if handler.executions != 1:
+                failures.append(f'{name}: {handler.executions} execuções para eventos duplicados')
+            if any(response != responses[0] for response in responses):
+                failures.append(f'{name}: duplicatas receberam respostas diferentes')
+            if elapsed > args.latency * 2:
+                failures.append(f'{name}: duplicatas levaram {elapsed:.2f}s (latência {args.latency}s)')
+
+            # Invocação posterior: resultado gravado, sem nova execução
+            idempotency.run(key, lambda: handler(EVENT, None))
+            if handler.executions != 1 or idempotency.get_stats()['replays'] != args.duplicates:
+                failures.append(f'{name}: resultado gravado não foi reaproveitado')
+
+        # 3 - Processos independentes com o mesmo diretório de registros
+        counter_path = os.path.join(work_dir, 'executions')
+        process_dir = os.path.join(work_dir, 'processes')
+        start = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=args.duplicates) as executor:
+            futures = [executor.submit(run_in_process, process_dir, args.latency, counter_path)
+                       for _ in range(args.duplicates)]
+            responses = [future.result() for future in futures]
+        elapsed = time.perf_counter() - start
+        with open(counter_path) as file:
+            executions = len(file.read())
+        print(f'{"file (procs)":<14} {args.duplicates:>10} {executions:>10} {elapsed:>8.2f}s '
+              f'{args.latency * args.duplicates:>8.2f}s')
+
+        if executions != 1 or any(response != responses[0] for response in responses):
+            failures.append(f'file (processos): {executions} execuções para eventos duplicados')
+
+    # 4 - Falhas não são gravadas: a próxima tentativa executa novamente
+    should_store = lambda response: response['statusCode'] == 200
+    idempotency = Idempotency(MemoryIdempotencyStore(), poll_interval=POLL_INTERVAL)
+    handler = SlowHandler(0.01, status_code=500)
+    for _ in range(2):
+        idempotency.run(key, lambda: handler(EVENT, None), should_store=should_store)
+    if handler.executions != 2:
+        failures.append('resposta de erro foi gravada e impediu a nova tentativa')
+
+    # 5 - Expiração dos resultados gravados
+    idempotency = Idempotency(MemoryIdempotencyStore(), ttl=0.1, poll_interval=POLL_INTERVAL)
+    handler = SlowHandler(0.01)
+    idempotency.run(key, lambda: handler(EVENT, None))
+    time.sleep(0.15)
+    idempotency.run(key, lambda: handler(EVENT, None))
+    if handler.executions != 2:
+        failures.append('resultado expirado foi reaproveitado')
+
+    # 6 - Espera esgotada: a duplicata recebe 409 enquanto a primeira execução continua
+    idempotency = Idempotency(MemoryIdempotencyStore(), wait_timeout=0.05, poll_interval=POLL_INTERVAL)
+    handler = SlowHandler(args.latency)
+    first = threading.Thread(target=idempotency.run, args=(key, lambda: handler(EVENT, None)))
+    first.start()
+    time.sleep(0.02)
+    try:
+        idempotency.run(key, lambda: handler(EVENT, None))
+        failures.append('a espera esgotada não sinalizou o evento em andamento')
+    except EventInProgressError:
+        pass
+    first.join()
+
+    import services.idempotency as idempotency_module
+    idempotency_module._IDEMPOTENCY = Idempotency(MemoryIdempotencyStore(), wait_timeout=0.05,
+                                                  poll_interval=POLL_INTERVAL)
+    decorated = idempotent(build_idempotency_key)(SlowHandler(args.latency))
+    first = threading.Thread(target=decorated, args=(EVENT, None))
+    first.start()
+    time.sleep(0.02)
+    if decorated(EVENT, None)['statusCode'] != 409:
+        failures.append('o handler não respondeu 409 ao evento duplicado em andamento')
+    first.join()
+    idempotency_module.clear_idempotency()
+
+    for failure in failures:
+        print(f'[FALHA] {failure}')
+
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,140 @@
+"""
+Benchmark do pré-processamento de imagens anexadas.
+
+Gera fotos sintéticas de alta resolução (com EXIF, como as fotos de placares
+tiradas pelo celular), monta o corpo da requisição de cada modelo com e sem o
+pré-processamento e reporta o tamanho do corpo, o tempo de preparo (primeira
+vez e com o cache por hash) e o tempo estimado de envio do corpo. Verifica também
+que as imagens processadas em PNG, WEBP e JPEG não mantêm EXIF, perfil ICC ou XMP.
+
+Uso:
+    python -m benchmarks.bench_image_preprocessing --resolutions 4000x3000 6000x4000 --mbps 50
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import contextlib
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from models.model_catalog import MODEL_CATALOG
+
+
+def generate_photo(path, width, height, seed=42):
+    """
+    Gera uma foto sintética (gradiente com ruído) em JPEG de alta qualidade, com EXIF.
+    """
+    from PIL import Image
+
+    noise = Image.effect_noise((width, height), 64).convert('RGB')
+    gradient = Image.linear_gradient('L').resize((width, height)).convert('RGB')
+    photo = Image.blend(noise, gradient, 0.5)
+
+    exif = Image.Exif()
+    exif[0x010F] = 'BenchCamera'
+    exif[0x0112] = 1
+    photo.save(path, 'JPEG', quality=95, exif=exif)
+
+
+def find_metadata(output_format):
+    """
+    Processa uma imagem com EXIF, perfil ICC e XMP no formato informado.
+
+    Returns:
+        list: Metadados presentes na imagem processada
+    """
+    import io
+    from PIL import Image, ImageCms, PngImagePlugin
+    from controllers.image_preprocessor import preprocess_image
+
+    exif = Image.Exif()
+    exif[0x010F] = 'BenchCamera'
+    options = {'icc_profile': ImageCms.ImageCmsProfile(ImageCms.createProfile('sRGB')).tobytes(),
+               'exif': exif.tobytes()}
+    if output_format == 'png':
+        options['pnginfo'] = PngImagePlugin.PngInfo()
+        options['pnginfo'].add_itxt('XML:com.adobe.xmp', '<x:xmpmeta>BenchCamera</x:xmpmeta>')
+    else:
+        options['xmp'] = b'<x:xmpmeta>BenchCamera</x:xmpmeta>'
+
+    buffer = io.BytesIO()
+    Image.new('RGB', (3000, 2000), (20, 120, 40)).save(buffer, output_format.upper(), **options)
+    processed = preprocess_image(buffer.getvalue(), f'placar.{output_format}')['data']
+
+    info = Image.open(io.BytesIO(processed)).info
+    found = [key for key in ('exif', 'icc_profile', 'xmp', 'XML:com.adobe.xmp') if key in info]
+    if b'BenchCamera' in processed:
+        found.append('BenchCamera')
+    return found
+
+
+def build_body(model_name, image_path):
+    """
+    Instancia o modelo com a imagem anexada e monta o corpo da requisição.
+
+    Returns:
+        tuple: (tempo em segundos, tamanho do corpo em bytes)
+    """
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(open(os.devnull, 'w')):
+        model = MODEL_CATALOG[model_name]('Descreva o placar.', file_path=image_path)
+        body = model.get_request_body_bytes()
+    return time.perf_counter() - start, len(body)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--resolutions', nargs='+', default=['3000x2000', '4000x3000', '6000x4000'])
+    parser.add_argument('--models', nargs='+', default=['claude_sonnet', 'nova_pro'])
+    parser.add_argument('--mbps', type=float, default=50, help='banda de upload usada na estimativa de envio')
+    args = parser.parse_args()
+
+    try:
+        import PIL  # noqa: F401
+    except ImportError:
+        print('[ERROR] O benchmark requer o Pillow instalado')
+        return 1
+
+    failures = []
+    print(f'{"modelo":>14} {"resolução":>10} {"original":>9} {"processado":>11} {"preparo":>9} '
+          f'{"c/ cache":>9} {"envio":>15}')
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        for resolution in args.resolutions:
+            width, height = (int(value) for value in resolution.split('x'))
+            image_path = os.path.join(work_dir, f'placar_{resolution}.jpg')
+            generate_photo(image_path, width, height)
+
+            for model_name in args.models:
+                os.environ['IMAGE_PREPROCESSING_ENABLED'] = 'false'
+                _, original_size = build_body(model_name, image_path)
+
+                os.environ['IMAGE_PREPROCESSING_ENABLED'] = 'true'
+                first_time, processed_size = build_body(model_name, image_path)
+                cached_time, _ = build_body(model_name, image_path)
+
+                if processed_size >= original_size:
+                    failures.append(f'{model_name} {resolution}: o corpo não diminuiu')
+
+                upload = lambda size: size * 8 / (args.mbps * 1e6)
+                print(f'{model_name:>14} {resolution:>10} {original_size / 1e6:>7.2f}MB {processed_size / 1e6:>9.2f}MB '
+                      f'{first_time * 1000:>7.0f}ms {cached_time * 1000:>7.1f}ms '
+                      f'{upload(original_size):>6.2f}s->{upload(processed_size):.2f}s')
+
+    os.environ['IMAGE_PREPROCESSING_ENABLED'] = 'true'
+    for output_format in ('png', 'webp', 'jpeg'):
+        metadata = find_metadata(output_format)
+        if metadata:
+            failures.append(f'{output_format}: metadados mantidos na imagem processada: {", ".join(metadata)}')
+
+    for failure in failures:
+        print(f'[FALHA] {failure}')
+
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
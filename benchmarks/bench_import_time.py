@@ -0,0 +1,112 @@
+"""
+Benchmark de regressão do tempo de import (cold start) do lambda_handler.
+
+Executa `python -X importtime -c "import lambda_handler"` em processos novos,
+calcula a mediana do tempo cumulativo de import e compara com a baseline
+versionada em benchmarks/baselines/import_time.json. Também verifica que as
+dependências pesadas (pandas, boto3, ...) não são importadas no cold start.
+
+Uso:
+    python -m benchmarks.bench_import_time              # compara com a baseline
+    python -m benchmarks.bench_import_time --update     # regrava a baseline
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_PATH = os.path.join(ROOT_DIR, 'benchmarks', 'baselines', 'import_time.json')
+
+# Módulo importado pela Lambda no cold start
+ENTRYPOINT_MODULE = 'lambda_handler'
+
+
+def run_importtime(module_name):
+    """
+    Importa o módulo em um processo novo com -X importtime.
+
+    Returns:
+        dict: Tempo cumulativo (µs) de cada módulo importado
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module_name}'],
+        cwd=ROOT_DIR, capture_output=True, text=True, check=True,
+    )
+
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, self_us, cumulative_us, name = [part.strip() for part in line.replace('import time:', '|').split('|')]
+        modules[name] = int(cumulative_us)
+    return modules
+
+
+def profile(runs):
+    """
+    Executa o import várias vezes e consolida os resultados.
+
+    Returns:
+        dict: Mediana do tempo total (ms), módulos importados e os mais lentos
+    """
+    samples = [run_importtime(ENTRYPOINT_MODULE) for _ in range(runs)]
+    totals = [sample[ENTRYPOINT_MODULE] / 1000 for sample in samples]
+
+    # Módulos mais lentos da última execução (exceto o próprio entrypoint)
+    last = samples[-1]
+    slowest = sorted(((name, us / 1000) for name, us in last.items() if name != ENTRYPOINT_MODULE),
+                     key=lambda item: item[1], reverse=True)[:10]
+
+    return {
+        'total_ms': statistics.median(totals),
+        'modules': set(last),
+        'slowest': slowest,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=7)
+    parser.add_argument('--update', action='store_true', help='Regrava a baseline com o resultado atual')
+    args = parser.parse_args()
+
+    with open(BASELINE_PATH, 'r', encoding='utf-8') as file:
+        baseline = json.load(file)
+
+    result = profile(args.runs)
+
+    print(f'Tempo de import de {ENTRYPOINT_MODULE}: {result["total_ms"]:.1f}ms (mediana de {args.runs})')
+    for name, ms in result['slowest']:
+        print(f'  {ms:8.1f}ms  {name}')
+
+    if args.update:
+        baseline['total_ms'] = round(result['total_ms'], 1)
+        with open(BASELINE_PATH, 'w', encoding='utf-8') as file:
+            json.dump(baseline, file, indent=2)
+            file.write('\n')
+        print(f'Baseline atualizada em {BASELINE_PATH}')
+        return 0
+
+    failures = []
+
+    # Dependências pesadas não podem ser carregadas no cold start
+    forbidden = sorted(name for name in baseline['forbidden_modules'] if name in result['modules'])
+    if forbidden:
+        failures.append(f'módulos pesados importados no cold start: {", ".join(forbidden)}')
+
+    # O tempo total não pode exceder a baseline além da tolerância
+    limit_ms = baseline['total_ms'] * baseline['tolerance']
+    if result['total_ms'] > limit_ms:
+        failures.append(f'tempo de import {result["total_ms"]:.1f}ms excede o limite de {limit_ms:.1f}ms')
+
+    for failure in failures:
+        print(f'[REGRESSÃO] {failure}')
+
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
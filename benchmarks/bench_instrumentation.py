@@ -0,0 +1,115 @@
+"""
+Benchmark do custo do log e das métricas por etapa.
+
+Monta um evento e um corpo de requisição com uma imagem em base64 de vários MB
+e compara o custo de registrá-los como antes (print do valor inteiro) com o log
+por nível (desabilitado no nível INFO e resumido no nível DEBUG). Mede também o
+custo de cada stage_timer e valida os documentos EMF emitidos (JSON válido, no
+máximo 100 valores por métrica e todas as execuções registradas).
+
+Uso:
+    python -m benchmarks.bench_instrumentation --image-mb 5 --repeat 20
+"""
+import os
+import sys
+import json
+import time
+import base64
+import argparse
+import contextlib
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from utils.instrumentation import (EMF_MAX_VALUES, StageMetrics, get_stage_metrics, log_debug, set_log_level,
+                                   stage_timer)
+
+
+def measure(func, repeat):
+    """
+    Executa a função com a saída descartada e retorna o tempo médio, em milissegundos.
+    """
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            func()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--image-mb', type=float, default=5)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--timers', type=int, default=100_000)
+    args = parser.parse_args()
+
+    image = base64.b64encode(os.urandom(int(args.image_mb * 1024 * 1024))).decode('ascii')
+    event = {'context': 'Jogador com 120 partidas', 'attachments': ['s3://bucket/placar.jpg'],
+             'inline_image': image}
+    body = {'messages': [{'role': 'user', 'content': [
+        {'type': 'image', 'source': {'type': 'base64', 'media_type': 'image/jpeg', 'data': image}},
+        {'type': 'text', 'text': 'Descreva o placar.'},
+    ]}]}
+
+    def legacy():
+        print(f'[DEBUG] Event: {event}')
+        print(body)
+
+    def instrumented():
+        log_debug('Evento recebido', event=event)
+        log_debug('Corpo da requisição', body=body)
+
+    failures = []
+    legacy_ms = measure(legacy, args.repeat)
+    set_log_level('INFO')
+    disabled_ms = measure(instrumented, args.repeat)
+    set_log_level('DEBUG')
+    summarized_ms = measure(instrumented, args.repeat)
+    set_log_level('INFO')
+
+    print(f'payload: {len(image) / 1e6:.1f}MB em base64')
+    print(f'print do valor inteiro: {legacy_ms:.2f}ms  log INFO (desabilitado): {disabled_ms:.4f}ms  '
+          f'log DEBUG (resumido): {summarized_ms:.3f}ms')
+
+    if summarized_ms > legacy_ms / 10:
+        failures.append('o log resumido não reduziu o custo em ao menos 10x')
+
+    # Custo de cada medição de etapa
+    get_stage_metrics().reset()
+    start = time.perf_counter()
+    for _ in range(args.timers):
+        with stage_timer('noop'):
+            pass
+    timer_us = (time.perf_counter() - start) / args.timers * 1e6
+    get_stage_metrics().reset()
+    print(f'stage_timer: {timer_us:.2f}us por medição')
+
+    # Documentos EMF: etapas com mais de 100 execuções são divididas em vários documentos
+    metrics = StageMetrics()
+    for index in range(250):
+        metrics.record('invoke', 0.1 + index / 1000)
+    metrics.record('prompt_render', 0.002)
+    documents = [json.loads(json.dumps(document)) for document in metrics.to_emf(dimensions={'Mode': 'bench'})]
+
+    invoke_values = sum(len(document['invoke']) if isinstance(document['invoke'], list) else 1
+                        for document in documents if 'invoke' in document)
+    print(f'EMF: {len(documents)} documentos, {invoke_values} valores de invoke')
+
+    if invoke_values != 250 or len(documents) != 3:
+        failures.append('valores de invoke perdidos ou divididos incorretamente no EMF')
+    for document in documents:
+        definition = document['_aws']['CloudWatchMetrics'][0]
+        names = [metric['Name'] for metric in definition['Metrics']]
+        if any(isinstance(document[name], list) and len(document[name]) > EMF_MAX_VALUES for name in names):
+            failures.append('documento EMF com mais de 100 valores em uma métrica')
+        if definition['Dimensions'] != [['Mode']] or document.get('Mode') != 'bench':
+            failures.append('dimensões do documento EMF incorretas')
+
+    for failure in failures:
+        print(f'[FALHA] {failure}')
+
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,77 @@
+"""
+Benchmark da sumarização map-reduce com um Bedrock simulado.
+
+Gera arquivos JSONL sintéticos de tamanhos crescentes e executa o
+MapReduceSummarizer com um serviço de inferência falso, que responde após uma
+latência fixa com um digest de tamanho fixo. Reporta lotes, níveis de
+combinação, chamadas e o tempo total: com as chamadas de cada nível em
+paralelo, o tempo deve crescer com o número de níveis (logaritmo do número de
+lotes), e não com o número de lotes.
+
+Uso:
+    python -m benchmarks.bench_map_reduce --sizes-kb 64 256 1024 4096
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import contextlib
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+import controllers.map_reduce_summarizer as map_reduce_summarizer
+from controllers.map_reduce_summarizer import MapReduceSummarizer
+from benchmarks.synthetic_data import generate_file
+
+
+class FakeInferenceService:
+    """
+    Serviço de inferência simulado: latência fixa e digest de tamanho fixo.
+    """
+    latency_seconds = 0.05
+    digest_words = 300
+
+    def __init__(self, model_id, request_body, **kwargs):
+        self.model_id = model_id
+        self.usage = {}
+
+    def invoke_model(self):
+        time.sleep(self.latency_seconds)
+        self.usage = {'input_tokens': 0, 'output_tokens': self.digest_words}
+        return ' '.join(['digest'] * self.digest_words)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes-kb', type=float, nargs='+', default=[64, 256, 1024, 4096])
+    parser.add_argument('--max-tokens', type=int, default=8_000)
+    parser.add_argument('--fan-in', type=int, default=4)
+    parser.add_argument('--max-workers', type=int, default=32)
+    parser.add_argument('--latency', type=float, default=0.05)
+    args = parser.parse_args()
+
+    FakeInferenceService.latency_seconds = args.latency
+    map_reduce_summarizer.BedrockInferenceService = FakeInferenceService
+
+    print(f'{"arquivo":>9} {"lotes":>6} {"níveis":>7} {"chamadas":>9} {"tempo":>8}')
+    with tempfile.TemporaryDirectory() as work_dir:
+        for size_kb in args.sizes_kb:
+            context_path = os.path.join(work_dir, f'sessions_{size_kb}.jsonl')
+            generate_file(context_path, 'jsonl', int(size_kb * 1024))
+
+            summarizer = MapReduceSummarizer('nova_pro', 'player', context_path, max_tokens=args.max_tokens,
+                                             fan_in=args.fan_in, max_depth=8, max_workers=args.max_workers,
+                                             use_cache=False)
+            with contextlib.redirect_stdout(open(os.devnull, 'w')):
+                result = summarizer.run()
+
+            print(f'{size_kb:>7.0f}KB {result["batches"]:>6} {result["levels"]:>7} {result["calls"]:>9} '
+                  f'{result["latency"]:>7.2f}s')
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
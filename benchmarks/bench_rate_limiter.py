@@ -0,0 +1,220 @@
+"""
+Benchmark do limitador de taxa (AIMD) contra um Bedrock simulado com cota.
+
+Um cliente falso aceita no máximo --quota-rpm requisições por minuto e responde
+ThrottlingException acima disso. Várias threads disparam requisições durante
+--duration segundos em três cenários:
+
+    sem-retry    a primeira falha interrompe a requisição (comportamento antigo)
+    retry        backoff exponencial com jitter, sem limitador
+    retry+aimd   backoff + limitador compartilhado, configurado acima da cota real
+
+Reporta a vazão obtida em relação à cota, a quantidade de throttlings e de
+requisições que falharam. Com o limitador, a vazão deve se aproximar da cota
+com muito menos throttlings.
+
+Em seguida, com um relógio simulado, valida a cota de tokens por minuto: uma
+requisição grande rejeitada por throttling algumas vezes antes do sucesso deve
+ser cobrada apenas uma vez (as reservas das tentativas rejeitadas são
+devolvidas), sem esperas no limitador entre as tentativas além do backoff e sem
+atrasar a próxima requisição.
+
+Uso:
+    python -m benchmarks.bench_rate_limiter --quota-rpm 600 --duration 10
+    python -m benchmarks.bench_rate_limiter --quota-tpm 200000 --request-tokens 70000 --throttles 3
+"""
+import os
+import sys
+import time
+import argparse
+import threading
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from services.rate_limiter import ModelRateLimiter, TokenBucket
+from services.retry_policy import RetryPolicy, call_with_retry
+
+
+class ThrottlingException(Exception):
+    """
+    Erro no formato do botocore.exceptions.ClientError para um throttling.
+    """
+
+    def __init__(self):
+        super().__init__('Rate exceeded')
+        self.response = {'Error': {'Code': 'ThrottlingException'}, 'ResponseMetadata': {'HTTPStatusCode': 429}}
+
+
+class QuotaClient:
+    """
+    Cliente Bedrock simulado: aceita requisições dentro da cota e rejeita as demais.
+    """
+
+    def __init__(self, quota_rpm, latency):
+        # Rajada pequena, como a cota por segundo aplicada pelo serviço
+        self.quota = TokenBucket(quota_rpm, capacity=max(1, quota_rpm / 60))
+        self.latency = latency
+        self.accepted = 0
+        self.throttled = 0
+        self._lock = threading.Lock()
+
+    def invoke_model(self):
+        with self.quota._lock:
+            self.quota._refill()
+            allowed = self.quota.tokens >= 1
+            if allowed:
+                self.quota.tokens -= 1
+
+        with self._lock:
+            if allowed:
+                self.accepted += 1
+            else:
+                self.throttled += 1
+
+        time.sleep(self.latency)
+        if not allowed:
+            raise ThrottlingException()
+        return {}
+
+
+def run_scenario(name, quota_rpm, duration, workers, latency):
+    """
+    Executa um cenário e retorna as métricas.
+    """
+    client = QuotaClient(quota_rpm, latency)
+    limiter = None
+    if name == 'retry+aimd':
+        limiter = ModelRateLimiter('bench-model', requests_per_minute=quota_rpm * 3, tokens_per_minute=0,
+                                   decrease_cooldown=0.5)
+
+    max_attempts = 1 if name == 'sem-retry' else 5
+    failures = []
+    deadline = time.monotonic() + duration
+
+    def worker():
+        policy = RetryPolicy(max_attempts=max_attempts, base_delay=0.05, max_delay=1.0)
+        while time.monotonic() < deadline:
+            try:
+                call_with_retry(client.invoke_model, policy, limiter)
+            except ThrottlingException:
+                failures.append(1)
+
+    threads = [threading.Thread(target=worker) for _ in range(workers)]
+    start = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - start
+
+    return {
+        'rpm': client.accepted * 60 / elapsed,
+        'throttled': client.throttled,
+        'failed': len(failures),
+        'rate_factor': limiter.rate_factor if limiter else None,
+    }
+
+
+class FakeClock:
+    """
+    Relógio simulado: a espera apenas avança o tempo.
+    """
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        # Como o time.sleep, toda espera avança o relógio (esperas residuais menores
+        # que a precisão do float não o alterariam)
+        self.now += max(seconds, 1e-6)
+
+
+def run_token_scenario(quota_tpm, request_tokens, throttles, max_delay):
+    """
+    Executa uma requisição rejeitada `throttles` vezes antes do sucesso e mede a
+    espera da requisição seguinte, de mesmo tamanho, no limitador de tokens/min.
+
+    Returns:
+        tuple: (duração da requisição com as novas tentativas, espera da seguinte), em segundos
+    """
+    clock = FakeClock()
+    # Sem redução AIMD, para que a diferença venha apenas das reservas de tokens
+    limiter = ModelRateLimiter('bench-model', requests_per_minute=0, tokens_per_minute=quota_tpm,
+                               decrease_factor=1.0, clock=clock, sleep=clock.sleep)
+    policy = RetryPolicy(max_attempts=throttles + 1, base_delay=0.05, max_delay=max_delay, sleep=clock.sleep)
+    attempts = []
+
+    def invoke_model():
+        attempts.append(1)
+        if len(attempts) <= throttles:
+            raise ThrottlingException()
+        return {}
+
+    call_with_retry(invoke_model, policy, limiter, request_tokens)
+    limiter.record_usage(request_tokens, request_tokens)
+    duration = clock.now
+
+    return duration, limiter.acquire(request_tokens)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--quota-rpm', type=float, default=600)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--workers', type=int, default=16)
+    parser.add_argument('--latency', type=float, default=0.02, help='Latência simulada por chamada (s)')
+    parser.add_argument('--quota-tpm', type=float, default=200_000, help='Cota de tokens por minuto')
+    parser.add_argument('--request-tokens', type=int, default=70_000, help='Tokens de cada requisição')
+    parser.add_argument('--throttles', type=int, default=3, help='Throttlings antes do sucesso')
+    args = parser.parse_args()
+
+    # Mensagens de depuração do limitador são omitidas da tabela
+    devnull = open(os.devnull, 'w')
+
+    print(f'{"cenário":<11} {"vazão/min":>10} {"% da cota":>10} {"throttlings":>12} {"falhas":>7}')
+    for name in ('sem-retry', 'retry', 'retry+aimd'):
+        stdout, sys.stdout = sys.stdout, devnull
+        try:
+            result = run_scenario(name, args.quota_rpm, args.duration, args.workers, args.latency)
+        finally:
+            sys.stdout = stdout
+
+        print(f'{name:<11} {result["rpm"]:>10.0f} {result["rpm"] / args.quota_rpm:>9.0%} '
+              f'{result["throttled"]:>12} {result["failed"]:>7}')
+
+    # Cota de tokens/min: requisição com throttlings comparada à aceita na primeira tentativa
+    max_delay = 1.0
+    failures = []
+    stdout, sys.stdout = sys.stdout, devnull
+    try:
+        results = {throttles: run_token_scenario(args.quota_tpm, args.request_tokens, throttles, max_delay)
+                   for throttles in (0, args.throttles)}
+    finally:
+        sys.stdout = stdout
+
+    print(f'\n{"throttlings":<11} {"duração":>9} {"espera da próxima":>18}')
+    for throttles, (duration, wait) in results.items():
+        print(f'{throttles:<11} {duration:>8.2f}s {wait:>17.2f}s')
+
+    baseline_duration, baseline_wait = results[0]
+    duration, wait = results[args.throttles]
+    # Além da requisição sem throttlings, apenas o backoff entre as tentativas
+    if duration > baseline_duration + args.throttles * max_delay:
+        failures.append(f'{args.throttles} throttlings: requisição levou {duration:.2f}s, '
+                        f'{duration - baseline_duration:.2f}s além da aceita na primeira tentativa')
+    if wait > baseline_wait + 0.01:
+        failures.append(f'{args.throttles} throttlings atrasaram a próxima requisição em '
+                        f'{wait - baseline_wait:.2f}s')
+
+    for failure in failures:
+        print(f'[FALHA] {failure}')
+
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,94 @@
+"""
+Benchmark da serialização do corpo das requisições.
+
+Compara o caminho anterior (montar o dict e serializá-lo com json.dumps no
+BedrockInferenceService e codificá-lo em bytes, como faz o botocore) com o construtor de corpos pré-serializados
+(get_request_body_bytes), para imagens em base64 e arquivos de texto de
+vários MB. Verifica que os dois corpos decodificam para o mesmo JSON (e que
+textos comuns sob as chaves 'data' e 'bytes', inclusive em bytes, continuam
+escapados; apenas o base64 de encode_base64() é inserido sem escape) e reporta o
+tempo mediano e o tamanho enviado.
+
+Uso:
+    python -m benchmarks.bench_request_body --sizes-mb 1 5 20 --repeat 5
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import contextlib
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from models.model_catalog import MODEL_CATALOG
+from models.request_body_builder import encode_base64, encode_value
+from benchmarks.synthetic_data import generate_text
+
+
+def measure(func, repeat):
+    """
+    Executa a função `repeat` vezes e retorna (tempo mediano, último resultado).
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes-mb', type=float, nargs='+', default=[1, 5, 20])
+    parser.add_argument('--models', nargs='+', default=['nova_pro', 'claude_sonnet'])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    failures = []
+
+    # Strings comuns sob as chaves de base64 passam pelo escape do JSON
+    value = {'data': 'aspas " barra \\ e acentuação', 'bytes': ['\n']}
+    if json.loads(encode_value(value)) != value:
+        failures.append('string comum sob a chave data/bytes inserida sem escape')
+    text = 'aspas " barra \\ e acentuação\n'
+    value = {'data': text.encode('utf-8'), 'bytes': bytearray(b'"')}
+    if json.loads(encode_value(value)) != {'data': text, 'bytes': '"'}:
+        failures.append('valor em bytes inserido sem escape')
+
+    print(f'{"modelo":>14} {"arquivo":>12} {"json.dumps":>11} {"bytes":>9} {"ganho":>7} {"enviado":>14}')
+
+    for size_mb in args.sizes_mb:
+        size_bytes = int(size_mb * 1024 * 1024)
+        inputs = {
+            'imagem.png': encode_base64(os.urandom(size_bytes * 3 // 4)),
+            'sessoes.csv': generate_text('csv', size_bytes),
+        }
+
+        for model_name in args.models:
+            for file_name, file_content in inputs.items():
+                with contextlib.redirect_stdout(open(os.devnull, 'w')):
+                    model = MODEL_CATALOG[model_name]('Resuma o arquivo.', file_content=file_content,
+                                                      file_name=file_name)
+
+                dumps_time, dumps_body = measure(lambda: json.dumps(model.get_request_body()).encode('utf-8'),
+                                                 args.repeat)
+                bytes_time, bytes_body = measure(model.get_request_body_bytes, args.repeat)
+
+                if json.loads(bytes_body) != json.loads(dumps_body):
+                    failures.append(f'{model_name} {file_name} {size_mb}MB: corpos diferentes')
+
+                print(f'{model_name:>14} {file_name[:-4] + f"/{size_mb:g}MB":>12} {dumps_time * 1000:>9.1f}ms '
+                      f'{bytes_time * 1000:>7.1f}ms {dumps_time / bytes_time:>6.1f}x '
+                      f'{len(dumps_body) / 1e6:>5.1f}->{len(bytes_body) / 1e6:.1f}MB')
+
+    for failure in failures:
+        print(f'[FALHA] {failure}')
+
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,193 @@
+"""
+Benchmark da gravação dos resultados das inferências.
+
+Simula o processamento de todos os lotes de um arquivo (cada inferência com uma
+latência fixa) e compara o tempo total da invocação com duas formas de gravar
+os resultados:
+
+- serial: um PutItem por resultado, no caminho da inferência
+- sink: ResultsSink, com BatchWriteItem em segundo plano e flush no fim
+
+Os clientes DynamoDB e S3 são locais, com latência por requisição; o DynamoDB
+devolve parte dos itens como não processados para exercitar as novas tentativas.
+O primeiro resultado é um relatório HTML grande, que deve ser comprimido e
+enviado ao S3 com upload multipart enquanto as inferências seguintes continuam.
+
+Uso:
+    python -m benchmarks.bench_results_sink --batches 40 --inference-latency 0.1 --write-latency 0.03
+"""
+import os
+import sys
+import gzip
+import json
+import time
+import random
+import argparse
+import threading
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from services.results_sink import S3_MIN_PART_SIZE, ResultsSink
+
+
+class LocalDynamoDB:
+    """
+    DynamoDB em memória com put_item e batch_write_item (com itens não processados).
+    """
+
+    def __init__(self, latency, unprocessed_rate=0.3, seed=42):
+        self.items = {}
+        self.latency = latency
+        self.unprocessed_rate = unprocessed_rate
+        self.rng = random.Random(seed)
+        self.requests = 0
+        self.lock = threading.Lock()
+
+    def put_item(self, TableName, Item):
+        time.sleep(self.latency)
+        with self.lock:
+            self.requests += 1
+            self.items[Item['result_id']['S']] = Item
+        return {}
+
+    def batch_write_item(self, RequestItems):
+        time.sleep(self.latency)
+        unprocessed = {}
+        with self.lock:
+            self.requests += 1
+            for table_name, requests in RequestItems.items():
+                keys = [request['PutRequest']['Item']['result_id']['S'] for request in requests]
+                if len(set(keys)) != len(keys):
+                    raise ValueError('Provided list of item keys contains duplicates')
+                for request in requests:
+                    if self.rng.random() < self.unprocessed_rate:
+                        unprocessed.setdefault(table_name, []).append(request)
+                    else:
+                        item = request['PutRequest']['Item']
+                        self.items[item['result_id']['S']] = item
+        return {'UnprocessedItems': unprocessed}
+
+
+class LocalS3:
+    """
+    S3 em memória com put_object e upload multipart.
+    """
+
+    def __init__(self, latency):
+        self.objects = {}
+        self.uploads = {}
+        self.latency = latency
+        self.lock = threading.Lock()
+
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        time.sleep(self.latency)
+        self.objects[(Bucket, Key)] = bytes(Body)
+
+    def create_multipart_upload(self, Bucket, Key, **kwargs):
+        upload_id = f'upload-{len(self.uploads)}'
+        self.uploads[upload_id] = {}
+        return {'UploadId': upload_id}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body):
+        time.sleep(self.latency)
+        with self.lock:
+            self.uploads[UploadId][PartNumber] = Body.read()
+        return {'ETag': f'"{PartNumber}"'}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        parts = self.uploads.pop(UploadId)
+        self.objects[(Bucket, Key)] = b''.join(parts[part['PartNumber']] for part in MultipartUpload['Parts'])
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        self.uploads.pop(UploadId, None)
+
+
+def build_results(batches, html_mb):
+    """
+    Gera um relatório HTML grande (pouco compressível) seguido dos resultados dos lotes.
+    """
+    rng = random.Random(7)
+    rows = ''.join(f'<tr><td>{rng.getrandbits(64):x}</td><td>{rng.random():.6f}</td></tr>'
+                   for _ in range(int(html_mb * 1024 * 1024 / 48)))
+    report = {'model_id': 'anthropic.claude-3-5-sonnet-20240620-v1:0', 'status': 'success',
+              'text': f'<html><body><table>{rows}</table></body></html>', 'latency': 1.0}
+
+    return [report] + [{'batch_index': index, 'model_id': 'anthropic.claude-3-haiku-20240307-v1:0',
+                'text': f'Resumo do lote {index}. ' * 200, 'latency': 0.1,
+                'usage': {'input_tokens': 50_000, 'output_tokens': 800}} for index in range(batches)]
+
+
+def run_serial(results, inference_latency, dynamodb):
+    start = time.perf_counter()
+    for index, result in enumerate(results):
+        time.sleep(inference_latency)
+        item = {'result_id': {'S': f'serial#{index}'}, 'result': {'S': json.dumps(result)}}
+        dynamodb.put_item(TableName='results', Item=item)
+    return time.perf_counter() - start
+
+
+def run_sink(results, inference_latency, sink):
+    start = time.perf_counter()
+    for index, result in enumerate(results):
+        time.sleep(inference_latency)
+        sink.put('sink', f'batch_{index}', result)
+
+    flush_start = time.perf_counter()
+    flushed = sink.flush(timeout=60)
+    end = time.perf_counter()
+    return end - start, end - flush_start, flushed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--batches', type=int, default=40)
+    parser.add_argument('--inference-latency', type=float, default=0.1)
+    parser.add_argument('--write-latency', type=float, default=0.03)
+    parser.add_argument('--unprocessed-rate', type=float, default=0.1)
+    parser.add_argument('--html-mb', type=float, default=24)
+    args = parser.parse_args()
+
+    results = build_results(args.batches, args.html_mb)
+    inference_time = len(results) * args.inference_latency
+
+    serial_dynamodb = LocalDynamoDB(args.write_latency)
+    serial_time = run_serial(results[1:], args.inference_latency, serial_dynamodb)
+
+    dynamodb = LocalDynamoDB(args.write_latency, args.unprocessed_rate)
+    s3 = LocalS3(args.write_latency)
+    sink = ResultsSink(table_name='results', bucket='bench-results', dynamodb_client=dynamodb, s3_client=s3,
+                       part_size=S3_MIN_PART_SIZE)
+    sink_time, flush_time, flushed = run_sink(results, args.inference_latency, sink)
+    stats = sink.get_stats()
+
+    print(f'resultados: {len(results)}  inferência simulada: {inference_time:.2f}s')
+    print(f'serial (PutItem, sem o HTML): {serial_time:.2f}s  ({serial_dynamodb.requests} requisições)')
+    print(f'sink: {sink_time:.2f}s  (flush final: {flush_time * 1000:.0f}ms, '
+          f'{stats["batch_requests"]} BatchWriteItem, {stats["unprocessed_retries"]} itens repetidos, '
+          f'{stats["multipart_uploads"]} uploads multipart)')
+
+    failures = []
+    if not flushed or stats['pending'] or stats['errors']:
+        failures.append(f'gravação incompleta: {stats}')
+    if len(dynamodb.items) != len(results):
+        failures.append(f'{len(dynamodb.items)} de {len(results)} itens gravados no DynamoDB')
+    if sink_time - inference_time > (serial_time - inference_time) / 2:
+        failures.append('a gravação adicionou tempo relevante ao caminho da inferência')
+
+    html_item = dynamodb.items.get('sink#batch_0', {})
+    html_uri = html_item.get('result_s3_uri', {}).get('S', '')
+    html_object = s3.objects.get(tuple(html_uri[len('s3://'):].split('/', 1)))
+    if stats['multipart_uploads'] != 1 or html_object is None:
+        failures.append('o relatório HTML não foi enviado ao S3 com upload multipart')
+    elif json.loads(gzip.decompress(html_object)) != results[0]:
+        failures.append('o relatório HTML gravado no S3 difere do original')
+
+    for failure in failures:
+        print(f'[FALHA] {failure}')
+
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
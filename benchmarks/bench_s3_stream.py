@@ -0,0 +1,177 @@
+"""
+Benchmark da leitura do arquivo de contexto diretamente do S3, como stream.
+
+Usa um S3 local em memória que atende GETs por intervalo (Range) com latência
+e banda simuladas, e compara duas formas de percorrer todos os lotes:
+
+- download: baixa o objeto inteiro para um arquivo local e só então gera os lotes
+- stream: TokenManager com o URI 's3://', lendo por intervalos com prefetch
+
+Verifica que os lotes são idênticos aos do arquivo local, que o primeiro lote do
+stream chega antes do fim do download, que o tempo total do stream não excede o
+do download e que o pico de memória (tracemalloc) do stream fica limitado à
+janela de intervalos, independentemente do tamanho do objeto.
+
+Os tempos e o pico de memória são medidos em execuções separadas: o tracemalloc
+rastreia cada alocação, inclusive os intervalos baixados pela thread de prefetch,
+e distorce a comparação dos tempos totais.
+
+Uso:
+    python -m benchmarks.bench_s3_stream --size-mb 32 --mbps 400 --chunk-mb 1
+"""
+import io
+import os
+import sys
+import time
+import argparse
+import tempfile
+import tracemalloc
+import contextlib
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from controllers.token_manager import TokenManager
+from services.s3_stream import S3RangeReader
+from benchmarks.synthetic_data import generate_file
+
+
+class LocalS3:
+    """
+    S3 em memória com head_object e get_object (com Range), simulando a latência
+    de cada requisição e a banda de download.
+    """
+
+    def __init__(self, latency=0.02, mbps=400):
+        self.objects = {}
+        self.latency = latency
+        self.bytes_per_second = mbps * 1e6 / 8
+        self.requests = 0
+
+    def put_object(self, Bucket, Key, Body):
+        self.objects[(Bucket, Key)] = bytes(Body)
+
+    def head_object(self, Bucket, Key):
+        return {'ContentLength': len(self.objects[(Bucket, Key)])}
+
+    def get_object(self, Bucket, Key, Range=None):
+        data = self.objects[(Bucket, Key)]
+        if Range:
+            start, end = (int(value) for value in Range[len('bytes='):].split('-'))
+            data = data[start:end + 1]
+
+        self.requests += 1
+        time.sleep(self.latency + len(data) / self.bytes_per_second)
+        return {'Body': io.BytesIO(data), 'ContentLength': len(data)}
+
+
+def run(context_path, s3_client, download_to=None, trace_memory=False):
+    """
+    Percorre todos os lotes, opcionalmente baixando o objeto inteiro antes.
+
+    Returns:
+        dict: Tempo até o primeiro lote, tempo total, lotes e pico de memória (com trace_memory)
+    """
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    first_batch = None
+    batches = []
+
+    with contextlib.redirect_stdout(open(os.devnull, 'w')):
+        if download_to:
+            bucket, key = context_path[len('s3://'):].split('/', 1)
+            with open(download_to, 'wb') as file:
+                file.write(s3_client.get_object(Bucket=bucket, Key=key)['Body'].read())
+            context_path = download_to
+
+        token_manager = TokenManager(context_path=context_path, prompt='prompt', max_tokens=60_000,
+                                     preload=False, s3_client=s3_client)
+        for batch in token_manager.iter_batches():
+            if first_batch is None:
+                first_batch = time.perf_counter() - start
+            batches.append((batch['start_row'], batch['end_row'], batch['tokens'], hash(batch['content'])))
+
+    total = time.perf_counter() - start
+    peak = None
+    if trace_memory:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return {'first_batch': first_batch, 'total': total, 'batches': batches, 'peak': peak}
+
+
+def measure(context_path, s3_client, download_to=None):
+    """
+    Mede os tempos e, em uma segunda execução, o pico de memória.
+    """
+    result = run(context_path, s3_client, download_to)
+    result['peak'] = run(context_path, s3_client, download_to, trace_memory=True)['peak']
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size-mb', type=float, default=32)
+    parser.add_argument('--file-types', nargs='+', default=['jsonl', 'csv'])
+    parser.add_argument('--mbps', type=float, default=400)
+    parser.add_argument('--latency', type=float, default=0.02)
+    parser.add_argument('--chunk-mb', type=float, default=1)
+    parser.add_argument('--prefetch', type=int, default=2)
+    args = parser.parse_args()
+
+    os.environ['S3_STREAM_CHUNK_SIZE'] = str(int(args.chunk_mb * 1024 * 1024))
+    os.environ['S3_STREAM_PREFETCH_CHUNKS'] = str(args.prefetch)
+
+    chunk_size = int(args.chunk_mb * 1024 * 1024)
+    failures = []
+    print(f'{"tipo":>6} {"modo":>9} {"1º lote":>9} {"total":>8} {"lotes":>6} {"GETs":>5} {"pico":>9}')
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        for file_type in args.file_types:
+            local_path = os.path.join(work_dir, f'sessions.{file_type}')
+            generate_file(local_path, file_type, int(args.size_mb * 1024 * 1024))
+
+            s3 = LocalS3(args.latency, args.mbps)
+            with open(local_path, 'rb') as file:
+                s3.put_object('bench-bucket', f'player/sessions.{file_type}', file.read())
+            s3_uri = f's3://bench-bucket/player/sessions.{file_type}'
+
+            # Intervalo em consumo, intervalos em prefetch (limitados pelo leitor), buffer do
+            # leitor de texto e o lote atual
+            reader = S3RangeReader('bench-bucket', f'player/sessions.{file_type}', s3_client=s3)
+            window = (reader.prefetch + 2) * chunk_size + 4 * 1024 * 1024
+            reader.close()
+
+            local = run(local_path, s3)
+            results = {
+                'download': measure(s3_uri, s3, download_to=os.path.join(work_dir, f'download.{file_type}')),
+                'stream': None,
+            }
+            requests_before = s3.requests
+            results['stream'] = run(s3_uri, s3)
+            stream_requests = s3.requests - requests_before
+            results['stream']['peak'] = run(s3_uri, s3, trace_memory=True)['peak']
+
+            for mode, result in results.items():
+                if result['batches'] != local['batches']:
+                    failures.append(f'{file_type} {mode}: lotes diferentes dos lotes do arquivo local')
+
+                requests = stream_requests if mode == 'stream' else 1
+                print(f'{file_type:>6} {mode:>9} {result["first_batch"]:>8.2f}s {result["total"]:>7.2f}s '
+                      f'{len(result["batches"]):>6} {requests:>5} {result["peak"] / 1024 / 1024:>7.1f}MB')
+
+            if results['stream']['first_batch'] >= results['download']['first_batch']:
+                failures.append(f'{file_type}: o primeiro lote do stream não chegou antes')
+            if results['stream']['total'] > results['download']['total'] * 1.1:
+                failures.append(f'{file_type}: tempo total do stream acima do tempo com o download')
+            if results['stream']['peak'] > window:
+                failures.append(f'{file_type}: pico de memória do stream acima da janela de intervalos')
+
+    for failure in failures:
+        print(f'[FALHA] {failure}')
+
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,147 @@
+"""
+Benchmark de precisão e velocidade dos estimadores de tokens.
+
+Mede a vazão (MB/s) de cada estimador sobre amostras sintéticas de CSV, JSONL e
+prosa, e compara as estimativas com o estimador antigo (split por espaços).
+
+Em seguida, lê um JSONL de contagens reais no formato
+{"family": "anthropic", "text": "...", "tokens": 1234} e reporta, por família, o
+erro percentual médio e a maior subestimativa de cada estimador (uma
+subestimativa maior que a margem de segurança do TokenManager gera lotes acima
+do limite), antes e depois de calibrate() (ajuste em metade das amostras,
+avaliação na outra metade).
+
+Por padrão usa baselines/token_reference.jsonl: prompts, prosa em inglês e
+português e amostras de CSV e JSONL, contados com os tokenizadores públicos
+indicados no campo "tokenizer" de cada registro (tokenizer.json do SDK da
+Anthropic; cl100k_base, do qual o tokenizador do Llama 3 deriva, como
+aproximação para a família meta). Não há tokenizador público do Amazon Nova.
+Com --reference, use contagens coletadas do campo usage.input_tokens das
+respostas do Bedrock.
+
+Uso:
+    python -m benchmarks.bench_token_estimators
+    python -m benchmarks.bench_token_estimators --reference usage_samples.jsonl
+"""
+import os
+import sys
+import json
+import time
+import argparse
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from controllers.token_estimator import TOKEN_ESTIMATORS, get_token_estimator
+from benchmarks.synthetic_data import generate_text
+
+# Contagens de referência versionadas junto com os benchmarks
+REFERENCE_PATH = os.path.join(ROOT_DIR, 'benchmarks', 'baselines', 'token_reference.jsonl')
+
+# Texto em prosa usado como amostra (semelhante ao prompt do relatório)
+PROSE_SAMPLE = ('Analyze the player game sessions below and produce an HTML report with the '
+                'most played games, the best players and interesting trends. ') * 200
+
+
+def measure_throughput(estimator, text, repeat):
+    """
+    Mede a vazão do estimador em MB/s (melhor de `repeat` execuções).
+
+    Returns:
+        tuple: (MB/s, tokens estimados)
+    """
+    size_mb = len(text.encode('utf-8')) / 1024 / 1024
+    best = float('inf')
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+        tokens = estimator.count_tokens(text)
+        best = min(best, time.perf_counter() - start)
+
+    return size_mb / best, tokens
+
+
+def mean_absolute_percentage_error(estimator, samples):
+    """
+    Erro percentual absoluto médio das estimativas em relação às contagens reais.
+    """
+    errors = [abs(estimator.count_tokens(text) - tokens) / tokens for text, tokens in samples if tokens]
+    return 100 * sum(errors) / len(errors) if errors else float('nan')
+
+
+def max_underestimate(estimator, samples):
+    """
+    Maior subestimativa percentual em relação às contagens reais (0 se nenhuma amostra é subestimada).
+    """
+    return 100 * max([0.0] + [(tokens - estimator.count_tokens(text)) / tokens for text, tokens in samples if tokens])
+
+
+def load_reference(path):
+    """
+    Carrega as contagens reais agrupadas por família de modelo.
+
+    Returns:
+        dict: Lista de (texto, tokens) por família
+    """
+    samples = {}
+    with open(path, 'r', encoding='utf-8') as file:
+        for line in file:
+            if line.strip():
+                record = json.loads(line)
+                samples.setdefault(record['family'], []).append((record['text'], int(record['tokens'])))
+    return samples
+
+
+def report_accuracy(reference):
+    """
+    Reporta o erro de cada estimador de família, antes e depois da calibração.
+    """
+    print(f'\n{"família":<10} {"amostras":>8} {"erro espaços":>13} {"erro heurística":>16} '
+          f'{"maior subestimativa":>20} {"erro calibrado":>15}')
+
+    for family, samples in sorted(reference.items()):
+        estimator = get_token_estimator(family)
+        fit_samples, eval_samples = samples[0::2], samples[1::2]
+
+        calibrated_error = float('nan')
+        if hasattr(estimator, 'calibrate') and fit_samples and eval_samples:
+            calibrated_error = mean_absolute_percentage_error(estimator.calibrate(fit_samples), eval_samples)
+
+        print(f'{family:<10} {len(samples):>8} '
+              f'{mean_absolute_percentage_error(TOKEN_ESTIMATORS["whitespace"], samples):>12.1f}% '
+              f'{mean_absolute_percentage_error(estimator, samples):>15.1f}% '
+              f'{max_underestimate(estimator, samples):>19.1f}% '
+              f'{calibrated_error:>14.1f}%')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size-mb', type=float, default=2)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--reference', default=REFERENCE_PATH, help='JSONL com contagens reais de tokens por família')
+    args = parser.parse_args()
+
+    size_bytes = int(args.size_mb * 1024 * 1024)
+    samples = {
+        'csv': generate_text('csv', size_bytes),
+        'jsonl': generate_text('jsonl', size_bytes),
+        'prosa': PROSE_SAMPLE,
+    }
+
+    print(f'{"estimador":<11} {"amostra":<7} {"MB/s":>8} {"tokens":>10} {"vs espaços":>11}')
+    for sample_name, text in samples.items():
+        whitespace_tokens = TOKEN_ESTIMATORS['whitespace'].count_tokens(text)
+
+        for family, estimator in TOKEN_ESTIMATORS.items():
+            throughput, tokens = measure_throughput(estimator, text, args.repeat)
+            print(f'{family:<11} {sample_name:<7} {throughput:>8.1f} {tokens:>10} '
+                  f'{tokens / max(1, whitespace_tokens):>10.2f}x')
+
+    print(f'\nReferência: {os.path.relpath(args.reference, ROOT_DIR)}')
+    report_accuracy(load_reference(args.reference))
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,90 @@
+"""
+Benchmark de memória do TokenManager (tracemalloc).
+
+Gera arquivos CSV e JSONL sintéticos de tamanhos crescentes e mede o pico de
+memória alocada pelo TokenManager no modo antigo (arquivo inteiro em memória)
+e no modo streaming (linha a linha). No modo streaming o pico deve acompanhar
+o tamanho do lote, e não o tamanho do arquivo.
+
+Uso:
+    python -m benchmarks.bench_token_manager_memory --sizes-mb 8 32 128
+"""
+import os
+import sys
+import argparse
+import tempfile
+import tracemalloc
+import contextlib
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from controllers.token_manager import TokenManager
+from benchmarks.synthetic_data import generate_file
+
+# Prompt fixo utilizado em todas as medições
+PROMPT = 'Analyze the player game sessions and produce an HTML report. ' * 20
+
+# Margem aceita para o pico do modo streaming, em múltiplos do tamanho do lote
+STREAMING_PEAK_FACTOR = 4
+
+
+def measure_peak(context_path, streaming):
+    """
+    Mede o pico de memória (bytes) da criação do TokenManager com o lote inicial.
+
+    Returns:
+        tuple: (pico em bytes, tamanho do lote em bytes)
+    """
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+
+    with contextlib.redirect_stdout(open(os.devnull, 'w')):
+        token_manager = TokenManager(context_path, PROMPT, streaming=streaming)
+
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return peak, len(token_manager.get_batch_content().encode('utf-8'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes-mb', type=float, nargs='+', default=[4, 16, 64])
+    args = parser.parse_args()
+
+    failures = []
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        # O TokenManager grava os lotes em './tmp/'
+        os.chdir(work_dir)
+
+        print(f'{"formato":<7} {"arquivo":>9} {"lote":>9} {"pico antigo":>12} {"pico streaming":>15}')
+        for file_type in ('csv', 'jsonl'):
+            for size_mb in args.sizes_mb:
+                context_path = os.path.join(work_dir, f'sessions_{size_mb}.{file_type}')
+                generate_file(context_path, file_type, int(size_mb * 1024 * 1024))
+
+                legacy_peak, _ = measure_peak(context_path, streaming=False)
+                streaming_peak, batch_bytes = measure_peak(context_path, streaming=True)
+
+                print(f'{file_type:<7} {size_mb:>7.1f}MB {batch_bytes / 1024:>7.0f}KB '
+                      f'{legacy_peak / 1024 / 1024:>10.1f}MB {streaming_peak / 1024 / 1024:>13.1f}MB')
+
+                # O pico do modo streaming deve ser limitado pelo tamanho do lote
+                if streaming_peak > STREAMING_PEAK_FACTOR * batch_bytes:
+                    failures.append(f'{file_type} {size_mb}MB: pico {streaming_peak} bytes excede '
+                                    f'{STREAMING_PEAK_FACTOR}x o lote ({batch_bytes} bytes)')
+
+                os.remove(context_path)
+
+        os.chdir(ROOT_DIR)
+
+    for failure in failures:
+        print(f'[REGRESSÃO] {failure}')
+
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
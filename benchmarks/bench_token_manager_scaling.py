@@ -0,0 +1,306 @@
+"""
+Benchmark de escalabilidade dos caminhos de leitura do TokenManager.
+
+Gera arquivos CSV, JSON e JSONL sintéticos (semente fixa) de tamanhos
+crescentes, com muitas linhas pequenas ('small') ou poucas linhas enormes
+('large'), e mede em cada caminho de leitura:
+
+- vazão em linhas/s e MB/s (melhor de --repeat execuções)
+- pico de memória alocada (tracemalloc), medido em uma execução adicional
+
+Caminhos medidos (cada um apenas nos formatos que o utilizam):
+
+- initial_batch / initial_batch_legacy: lote inicial nos modos streaming e antigo
+  (no modo antigo, read_file_content + calculate_batch_size + prepare_initial_batch)
+- iter_batches: todos os lotes do arquivo
+- count_rows / count_rows_legacy: get_number_of_rows nos modos streaming e antigo
+- read_jsonl_lines: _read_jsonl_lines com todas as linhas do arquivo
+- pandas_read_csv: pd.read_csv do arquivo inteiro, como em prepare_initial_batch
+
+Ao final, o caso mais lento (menor MB/s) é executado sob o cProfile e as funções
+com maior tempo acumulado são impressas. Nos caminhos streaming de CSV e JSONL o
+pico de memória não deve crescer com o tamanho do arquivo.
+
+Uso:
+    python -m benchmarks.bench_token_manager_scaling --sizes 1MB 8MB 32MB --row-shapes small large
+    python -m benchmarks.bench_token_manager_scaling --paths iter_batches count_rows --file-types jsonl
+    python -m benchmarks.bench_token_manager_scaling --output results/scaling.json --profile-output slowest.prof
+"""
+import io
+import os
+import sys
+import json
+import time
+import pstats
+import cProfile
+import argparse
+import platform
+import tempfile
+import subprocess
+import contextlib
+import tracemalloc
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from controllers.token_manager import TokenManager
+from benchmarks.bench_end_to_end import parse_size
+from benchmarks.synthetic_data import generate_file
+
+# Prompt fixo utilizado em todas as medições
+PROMPT = 'Analyze the player game sessions and produce an HTML report. ' * 20
+
+
+def run_initial_batch(context_path, streaming):
+    return TokenManager(context_path, PROMPT, streaming=streaming).lines_to_process
+
+
+def run_iter_batches(context_path):
+    token_manager = TokenManager(context_path, PROMPT, preload=False)
+    return sum(batch['end_row'] - batch['start_row'] for batch in token_manager.iter_batches())
+
+
+def run_count_rows(context_path, streaming):
+    token_manager = TokenManager(context_path, PROMPT, preload=False, streaming=streaming)
+    return token_manager.get_number_of_rows(context_path)
+
+
+def run_read_jsonl_lines(context_path):
+    token_manager = TokenManager(context_path, PROMPT, preload=False)
+    return len(token_manager._read_jsonl_lines(context_path, sys.maxsize))
+
+
+def run_pandas_read_csv(context_path):
+    import pandas as pd
+    with open(context_path, newline='', encoding='utf-8') as file:
+        return len(pd.read_csv(file))
+
+
+# Caminho -> (função, formatos em que o caminho é utilizado)
+PATHS = {
+    'initial_batch': (lambda path: run_initial_batch(path, True), ('csv', 'json', 'jsonl')),
+    'initial_batch_legacy': (lambda path: run_initial_batch(path, False), ('csv', 'json', 'jsonl')),
+    'iter_batches': (run_iter_batches, ('csv', 'json', 'jsonl')),
+    'count_rows': (lambda path: run_count_rows(path, True), ('csv', 'json', 'jsonl')),
+    'count_rows_legacy': (lambda path: run_count_rows(path, False), ('csv', 'json', 'jsonl')),
+    'read_jsonl_lines': (run_read_jsonl_lines, ('jsonl',)),
+    'pandas_read_csv': (run_pandas_read_csv, ('csv',)),
+}
+
+# Caminhos que leem CSV e JSONL linha a linha: o pico de memória deve ser limitado
+# pelo lote, e não pelo tamanho do arquivo (JSON é sempre decodificado por inteiro)
+STREAMING_PATHS = ('initial_batch', 'iter_batches', 'count_rows')
+STREAMING_FILE_TYPES = ('csv', 'jsonl')
+
+# Crescimento aceito do pico dos caminhos streaming entre o menor e o maior arquivo
+STREAMING_PEAK_FACTOR = 2
+STREAMING_PEAK_SLACK_BYTES = 1024 * 1024
+
+# Número de funções impressas do perfil do caso mais lento
+PROFILE_TOP_FUNCTIONS = 15
+
+
+def quiet():
+    """
+    Descarta a saída impressa durante as medições.
+    """
+    return contextlib.redirect_stdout(io.StringIO())
+
+
+def measure(func, context_path, repeat):
+    """
+    Mede o caminho sobre o arquivo.
+
+    Returns:
+        tuple: (melhor tempo em segundos, pico de memória alocada em bytes, valor retornado)
+    """
+    best = None
+    with quiet():
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = func(context_path)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+
+        # O tracemalloc torna a execução mais lenta, por isso o pico é medido à parte
+        tracemalloc.start()
+        tracemalloc.reset_peak()
+        try:
+            func(context_path)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+    return best, peak, result
+
+
+def profile(func, context_path, output=None):
+    """
+    Executa o caminho sob o cProfile e imprime as funções com maior tempo acumulado.
+    """
+    profiler = cProfile.Profile()
+    with quiet():
+        profiler.runcall(func, context_path)
+
+    if output:
+        profiler.dump_stats(output)
+
+    stats = pstats.Stats(profiler, stream=sys.stdout)
+    stats.strip_dirs().sort_stats('cumulative').print_stats(PROFILE_TOP_FUNCTIONS)
+
+
+def check_streaming_peaks(results):
+    """
+    Verifica que o pico dos caminhos streaming não cresce com o tamanho do arquivo.
+
+    Returns:
+        list: Regressões encontradas
+    """
+    regressions = []
+    groups = {}
+    for result in results:
+        if result['path'] in STREAMING_PATHS and result['file_type'] in STREAMING_FILE_TYPES:
+            key = (result['path'], result['file_type'], result['row_shape'])
+            groups.setdefault(key, []).append(result)
+
+    for (path, file_type, row_shape), group in groups.items():
+        if len(group) < 2:
+            continue
+        smallest = min(group, key=lambda result: result['size_bytes'])
+        largest = max(group, key=lambda result: result['size_bytes'])
+        limit = STREAMING_PEAK_FACTOR * smallest['peak_bytes'] + STREAMING_PEAK_SLACK_BYTES
+        if largest['peak_bytes'] > limit:
+            regressions.append(f'{path}/{file_type}/{row_shape}: pico de {largest["peak_bytes"] / 1e6:.1f}MB com '
+                               f'{largest["size"]}, acima de {limit / 1e6:.1f}MB (cresce com o arquivo)')
+
+    return regressions
+
+
+def peak_mb(result):
+    return result['peak_bytes'] / 1024 / 1024
+
+
+def get_metadata(args):
+    """
+    Identifica a versão do código, o ambiente e os parâmetros da execução.
+    """
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT_DIR, capture_output=True,
+                                text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+
+    return {
+        'commit': commit,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'seed': args.seed,
+        'repeat': args.repeat,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', nargs='+', default=['1MB', '8MB', '32MB'])
+    parser.add_argument('--file-types', nargs='+', default=['csv', 'json', 'jsonl'])
+    parser.add_argument('--row-shapes', nargs='+', default=['small', 'large'], choices=['small', 'large'])
+    parser.add_argument('--paths', nargs='+', default=list(PATHS), choices=list(PATHS))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=42, help='semente do gerador de dados sintéticos')
+    parser.add_argument('--data-dir', help='diretório dos arquivos sintéticos (reaproveitados entre execuções)')
+    parser.add_argument('--output', help='grava os resultados em JSON')
+    parser.add_argument('--profile-output', help='grava o perfil do caso mais lento (formato pstats)')
+    args = parser.parse_args()
+
+    results = []
+    failures = []
+    profile_output = args.profile_output and os.path.abspath(args.profile_output)
+    original_dir = os.getcwd()
+
+    print(f'{"caminho":<21} {"formato":<6} {"linhas":<6} {"arquivo":>8} {"registros":>10} '
+          f'{"tempo (ms)":>11} {"linhas/s":>11} {"MB/s":>8} {"pico":>9}')
+
+    # Importa o pandas antes das medições, para que a importação não seja contada no primeiro caso CSV
+    if 'csv' in args.file_types:
+        import pandas  # noqa: F401
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        data_dir = os.path.abspath(args.data_dir or work_dir)
+        os.makedirs(data_dir, exist_ok=True)
+
+        # O modo antigo do TokenManager grava o lote inicial em './tmp/'
+        os.chdir(work_dir)
+
+        for file_type in args.file_types:
+            for row_shape in args.row_shapes:
+                for size in args.sizes:
+                    context_path = os.path.join(data_dir, f'sessions_{row_shape}_{args.seed}_{size.upper()}.'
+                                                          f'{file_type}')
+                    if not os.path.exists(context_path):
+                        generate_file(context_path, file_type, parse_size(size), seed=args.seed, row_shape=row_shape)
+                    size_bytes = os.path.getsize(context_path)
+                    rows = None
+
+                    for path in args.paths:
+                        func, file_types = PATHS[path]
+                        if file_type not in file_types:
+                            continue
+
+                        try:
+                            seconds, peak, value = measure(func, context_path, args.repeat)
+                        except Exception as e:
+                            failures.append(f'{path}/{file_type}/{row_shape}/{size.upper()}: {e}')
+                            continue
+
+                        # Os caminhos que percorrem o arquivo inteiro informam o número de registros
+                        if path in ('count_rows', 'iter_batches'):
+                            rows = rows or value
+
+                        result = {'path': path, 'file_type': file_type, 'row_shape': row_shape,
+                                  'size': size.upper(), 'size_bytes': size_bytes, 'seconds': seconds,
+                                  'mb_per_second': size_bytes / 1e6 / seconds, 'peak_bytes': peak,
+                                  'context_path': context_path}
+                        results.append(result)
+
+                    # Vazão em linhas/s calculada com o número de registros do arquivo
+                    rows = rows or TokenManager(context_path, PROMPT, preload=False).get_number_of_rows(context_path)
+                    for result in results:
+                        if result['context_path'] == context_path:
+                            result['rows'] = rows
+                            result['rows_per_second'] = rows / result['seconds']
+                            print(f'{result["path"]:<21} {file_type:<6} {row_shape:<6} {size.upper():>8} '
+                                  f'{rows:>10} {result["seconds"] * 1000:>11.1f} {result["rows_per_second"]:>11.0f} '
+                                  f'{result["mb_per_second"]:>8.1f} {peak_mb(result):>7.1f}MB')
+
+        # Perfil do caso mais lento, com os arquivos ainda disponíveis
+        if results:
+            slowest = min(results, key=lambda result: result['mb_per_second'])
+            print(f'\nPerfil do caso mais lento: {slowest["path"]}/{slowest["file_type"]}/{slowest["row_shape"]}/'
+                  f'{slowest["size"]} ({slowest["mb_per_second"]:.1f}MB/s)')
+            profile(PATHS[slowest['path']][0], slowest['context_path'], profile_output)
+
+        os.chdir(original_dir)
+
+    for result in results:
+        del result['context_path']
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump({'metadata': get_metadata(args), 'results': results}, file, indent=2)
+            file.write('\n')
+        print(f'\nResultados gravados em {args.output}')
+
+    regressions = check_streaming_peaks(results)
+
+    for failure in failures:
+        print(f'[FALHA] {failure}')
+    for regression in regressions:
+        print(f'[REGRESSÃO] {regression}')
+
+    return 1 if failures or regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
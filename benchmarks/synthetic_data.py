@@ -0,0 +1,113 @@
+"""
+Gerador determinístico de dados sintéticos de sessões de jogo para os benchmarks.
+
+A mesma semente sempre gera os mesmos arquivos, permitindo comparar resultados
+entre versões do código.
+"""
+import json
+import random
+
+# Jogos e termos usados para compor as anotações das sessões
+GAMES = ['catan', 'carcassonne', 'azul', 'wingspan', 'terraforming mars', 'ticket to ride', 'gloomhaven']
+NOTE_TERMS = ['strategy', 'cooperative', 'competitive', 'expansion', 'victory', 'resource', 'trade',
+              'blocked', 'combo', 'endgame', 'rematch', 'tiebreaker', 'rookie', 'veteran']
+
+# Formatos de linha: muitas linhas pequenas ou poucas linhas enormes
+ROW_SHAPES = {
+    'small': (5, 30),
+    'large': (2_000, 8_000),
+}
+
+
+def generate_row(rng, session_id, row_shape='small'):
+    """
+    Gera uma sessão de jogo sintética.
+
+    Args:
+        rng (random.Random): Gerador de números aleatórios com semente fixa
+        session_id (int): Identificador da sessão
+        row_shape (str): 'small' ou 'large' (tamanho das anotações)
+
+    Returns:
+        dict: Sessão de jogo
+    """
+    min_terms, max_terms = ROW_SHAPES[row_shape]
+    return {
+        'session_id': session_id,
+        'player': f'player-{rng.randint(1, 500)}',
+        'game': rng.choice(GAMES),
+        'score': rng.randint(0, 200),
+        'duration_minutes': round(rng.uniform(15, 240), 1),
+        'notes': ' '.join(rng.choice(NOTE_TERMS) for _ in range(rng.randint(min_terms, max_terms))),
+    }
+
+
+def format_row(row, file_type):
+    """
+    Serializa uma sessão como linha CSV ou JSON.
+    """
+    if file_type == 'csv':
+        return (f"{row['session_id']},{row['player']},{row['game']},{row['score']},"
+                f"{row['duration_minutes']},\"{row['notes']}\"")
+    return json.dumps(row, ensure_ascii=False)
+
+
+def generate_file(path, file_type, size_bytes, seed=42, row_shape='small'):
+    """
+    Gera um arquivo CSV, JSON (lista) ou JSONL com tamanho aproximado.
+
+    Args:
+        path (str): Caminho do arquivo de saída
+        file_type (str): 'csv', 'json' ou 'jsonl'
+        size_bytes (int): Tamanho aproximado do arquivo
+        seed (int): Semente do gerador (padrão: 42)
+        row_shape (str): 'small' ou 'large'
+
+    Returns:
+        int: Número de linhas/itens gerados
+    """
+    rng = random.Random(seed)
+    written = 0
+    rows = 0
+
+    with open(path, 'w', encoding='utf-8') as file:
+        if file_type == 'csv':
+            written += file.write('session_id,player,game,score,duration_minutes,notes\n')
+        elif file_type == 'json':
+            written += file.write('[\n')
+
+        while written < size_bytes or rows == 0:
+            line = format_row(generate_row(rng, rows, row_shape), file_type)
+            if file_type == 'json':
+                line = (',\n' if rows else '') + line
+            else:
+                line += '\n'
+            written += file.write(line)
+            rows += 1
+
+        if file_type == 'json':
+            file.write('\n]\n')
+
+    return rows
+
+
+def generate_text(file_type, size_bytes, seed=42, row_shape='small'):
+    """
+    Gera o conteúdo sintético diretamente em memória (para amostras pequenas).
+
+    Returns:
+        str: Conteúdo no formato solicitado
+    """
+    rng = random.Random(seed)
+    lines = []
+    written = 0
+
+    if file_type == 'csv':
+        lines.append('session_id,player,game,score,duration_minutes,notes')
+
+    while written < size_bytes or not lines:
+        line = format_row(generate_row(rng, len(lines), row_shape), file_type)
+        lines.append(line)
+        written += len(line) + 1
+
+    return '\n'.join(lines) + '\n'
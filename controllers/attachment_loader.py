@@ -0,0 +1,386 @@
+import os
+import hashlib
+import posixpath
+import threading
+import urllib.parse
+
+from utils.environment import get_env
+from utils.instrumentation import log_debug, log_error, stage_timer
+from controllers.image_preprocessor import get_image_format, preprocess_image
+from models.request_body_builder import encode_base64
+from services.s3_stream import S3RangeReader, is_s3_uri, parse_s3_uri
+
+# Extensões dos anexos enviados como texto
+TEXT_EXTENSIONS = ('.csv', '.txt', '.json', '.jsonl')
+
+# Content-Types aceitos para URLs sem extensão reconhecida
+CONTENT_TYPE_EXTENSIONS = {
+    'image/png': '.png',
+    'image/jpeg': '.jpg',
+    'image/gif': '.gif',
+    'image/webp': '.webp',
+    'text/plain': '.txt',
+    'text/csv': '.csv',
+    'application/json': '.json',
+}
+
+# Limites padrão: downloads simultâneos, tempo máximo por download, tamanho de cada
+# anexo baixado, tamanho total (já codificado) dos anexos de uma requisição e total de
+# bytes baixados por requisição (as imagens encolhem no pré-processamento)
+DEFAULT_ATTACHMENT_MAX_WORKERS = 8
+DEFAULT_ATTACHMENT_TIMEOUT = 10
+DEFAULT_ATTACHMENT_MAX_BYTES = 30 * 1024 * 1024
+DEFAULT_ATTACHMENT_MAX_TOTAL_BYTES = 10 * 1024 * 1024
+DEFAULT_ATTACHMENT_MAX_DOWNLOAD_BYTES = 30 * 1024 * 1024
+
+# Bytes lidos por vez de cada anexo (o orçamento de download é descontado a cada bloco)
+ATTACHMENT_READ_CHUNK_SIZE = 64 * 1024
+
+
+class DownloadBudget:
+
+    def __init__(self, max_bytes):
+        """
+        Orçamento de bytes compartilhado pelos downloads simultâneos de uma requisição.
+
+        Args:
+            max_bytes (int): Total de bytes que podem ser baixados
+        """
+        self.remaining = max_bytes
+        self._lock = threading.Lock()
+
+    def consume(self, size):
+        """
+        Desconta `size` bytes do orçamento.
+
+        Returns:
+            bool: False, sem descontar, quando o orçamento restante não comporta os bytes
+        """
+        with self._lock:
+            if size > self.remaining:
+                return False
+            self.remaining -= size
+            return True
+
+    def release(self, size):
+        """
+        Devolve ao orçamento os bytes de um anexo descartado.
+        """
+        with self._lock:
+            self.remaining += size
+
+
+def is_url(source):
+    """
+    Verifica se a origem do anexo é uma URL HTTP(S).
+    """
+    return source.lower().startswith(('http://', 'https://'))
+
+
+def get_attachment_policy():
+    """
+    Lê as origens de anexos permitidas.
+
+    Sem configuração, nenhuma origem é aceita além do bucket S3_BUCKET_NAME: caminhos
+    locais e URLs arbitrários permitiriam ler arquivos da Lambda ou acessar endereços
+    internos (ex: o serviço de metadados) a partir do evento.
+
+    Returns:
+        dict: 'hosts' (hosts HTTP(S); '.dominio' aceita os subdomínios), 'buckets'
+            (buckets do S3) e 'base_dir' (diretório dos arquivos locais, ou None)
+    """
+    def split_list(value):
+        return [item.strip().lower() for item in (value or '').split(',') if item.strip()]
+
+    base_dir = get_env('ATTACHMENT_BASE_DIR')
+    return {
+        'hosts': split_list(get_env('ATTACHMENT_ALLOWED_HOSTS')),
+        'buckets': split_list(get_env('ATTACHMENT_ALLOWED_BUCKETS') or get_env('S3_BUCKET_NAME')),
+        'base_dir': os.path.realpath(base_dir) if base_dir else None,
+    }
+
+
+def resolve_attachment_source(source, policy):
+    """
+    Verifica se a origem do anexo é permitida.
+
+    Args:
+        source (str): Caminho local, URI 's3://bucket/chave' ou URL
+        policy (dict): Origens permitidas (ver get_attachment_policy)
+
+    Returns:
+        str: Origem a ser lida (caminhos locais são resolvidos dentro de 'base_dir')
+
+    Raises:
+        PermissionError: Se a origem não estiver entre as permitidas
+    """
+    if is_url(source):
+        host = (urllib.parse.urlparse(source).hostname or '').lower()
+        if host and any(host == allowed or (allowed.startswith('.') and host.endswith(allowed))
+                        for allowed in policy['hosts']):
+            return source
+
+    elif is_s3_uri(source):
+        if parse_s3_uri(source)[0].lower() in policy['buckets']:
+            return source
+
+    elif policy['base_dir']:
+        # Resolve links simbólicos e '..' antes de comparar com o diretório base
+        path = os.path.realpath(os.path.join(policy['base_dir'], source))
+        if os.path.commonpath([path, policy['base_dir']]) == policy['base_dir']:
+            return path
+
+    raise PermissionError(f'origem de anexo não permitida: {source}')
+
+
+def read_attachment(stream, data, max_bytes, budget=None):
+    """
+    Lê o anexo em blocos para `data`, interrompendo a leitura assim que o anexo
+    excede `max_bytes` ou o orçamento de download da requisição se esgota.
+
+    Args:
+        stream: Arquivo, resposta HTTP ou stream do S3 aberto para leitura binária
+        data (bytearray): Destino dos bytes lidos
+        max_bytes (int): Tamanho máximo do anexo
+        budget (DownloadBudget): Orçamento compartilhado pelos anexos da requisição (opcional)
+    """
+    while True:
+        chunk = stream.read(ATTACHMENT_READ_CHUNK_SIZE)
+        if not chunk:
+            return
+        if len(data) + len(chunk) > max_bytes:
+            raise ValueError(f'anexo maior que {max_bytes} bytes')
+        if budget is not None and not budget.consume(len(chunk)):
+            raise ValueError('orçamento de download dos anexos esgotado')
+        data += chunk
+
+
+def get_attachment_name(source, content_type=None):
+    """
+    Obtém o nome do anexo a partir do caminho ou da URL, completando a extensão pelo
+    Content-Type quando a URL não possui uma extensão reconhecida.
+
+    Args:
+        source (str): Caminho local ou URL
+        content_type (str): Content-Type da resposta HTTP (opcional)
+
+    Returns:
+        str: Nome do arquivo
+    """
+    if not is_url(source):
+        return os.path.basename(source)
+
+    name = posixpath.basename(urllib.parse.unquote(urllib.parse.urlparse(source).path)) or 'attachment'
+    known = get_image_format(name) or name.lower().endswith(TEXT_EXTENSIONS)
+    extension = CONTENT_TYPE_EXTENSIONS.get((content_type or '').split(';')[0].strip().lower())
+    if not known and extension:
+        name += extension
+    return name
+
+
+def build_url_opener(policy):
+    """
+    Cria o opener HTTP(S) dos anexos, que só segue redirecionamentos para hosts permitidos.
+    """
+    # O urllib.request (http.client, email) só é importado quando há anexos por URL (reduz o cold start)
+    import urllib.request
+
+    class AllowedRedirectHandler(urllib.request.HTTPRedirectHandler):
+        def redirect_request(self, req, fp, code, msg, headers, newurl):
+            resolve_attachment_source(newurl, policy)
+            return super().redirect_request(req, fp, code, msg, headers, newurl)
+
+    return urllib.request.build_opener(AllowedRedirectHandler)
+
+
+def fetch_attachment(source, timeout=DEFAULT_ATTACHMENT_TIMEOUT, max_bytes=DEFAULT_ATTACHMENT_MAX_BYTES,
+                     policy=None, budget=None):
+    """
+    Lê um anexo de um caminho local, de um objeto do S3 ou de uma URL HTTP(S), desde
+    que a origem seja permitida (ver get_attachment_policy).
+
+    Args:
+        source (str): Caminho local (relativo a ATTACHMENT_BASE_DIR), URI 's3://bucket/chave' ou URL
+        timeout (float): Tempo máximo do download, em segundos
+        max_bytes (int): Tamanho máximo do anexo
+        policy (dict): Origens permitidas (padrão: get_attachment_policy())
+        budget (DownloadBudget): Orçamento de download compartilhado pelos anexos (opcional)
+
+    Returns:
+        dict: 'source', 'file_name', 'data' (bytes), 'status' ('loaded' ou 'error') e 'error'
+    """
+    policy = policy or get_attachment_policy()
+    data = bytearray()
+    try:
+        path = resolve_attachment_source(source, policy)
+
+        if is_url(source):
+            import urllib.request
+
+            request = urllib.request.Request(source, headers={'User-Agent': 'bedrock-inference-lambda'})
+            with build_url_opener(policy).open(request, timeout=timeout) as response:
+                file_name = get_attachment_name(source, response.headers.get('Content-Type'))
+                read_attachment(response, data, max_bytes, budget)
+        elif is_s3_uri(source):
+            file_name = get_attachment_name(source)
+            with S3RangeReader(*parse_s3_uri(source)) as stream:
+                read_attachment(stream, data, max_bytes, budget)
+        else:
+            file_name = get_attachment_name(source)
+            with open(path, 'rb') as f:
+                read_attachment(f, data, max_bytes, budget)
+
+        return {'source': source, 'file_name': file_name, 'data': bytes(data), 'status': 'loaded', 'error': None}
+
+    except Exception as e:
+        # Os bytes de um anexo descartado voltam ao orçamento dos demais
+        if budget is not None:
+            budget.release(len(data))
+        log_error(f'Erro ao carregar o anexo {source}: {e}')
+        return {'source': source, 'file_name': get_attachment_name(source), 'data': None, 'status': 'error',
+                'error': str(e)}
+
+
+def fetch_attachments(sources, max_workers=None, timeout=None, max_download_bytes=None):
+    """
+    Lê vários anexos simultaneamente, com um número limitado de downloads em paralelo,
+    e remove os anexos de conteúdo idêntico (mesmo hash), preservando a ordem.
+
+    Com N anexos e `max_workers` >= N, o tempo total é próximo ao do download mais
+    lento, e não à soma dos downloads. Os downloads compartilham um orçamento de
+    bytes: esgotado o orçamento, os anexos seguintes não são baixados.
+
+    Args:
+        sources (list): Caminhos locais (relativos a ATTACHMENT_BASE_DIR), URIs do S3 e URLs
+        max_workers (int): Downloads simultâneos (padrão: ATTACHMENT_MAX_WORKERS ou 8)
+        timeout (float): Tempo máximo de cada download (padrão: ATTACHMENT_TIMEOUT_SECONDS ou 10)
+        max_download_bytes (int): Total de bytes baixados (padrão: ATTACHMENT_MAX_DOWNLOAD_BYTES ou 30 MB)
+
+    Returns:
+        list: Anexos lidos (ver fetch_attachment), na ordem das origens; duplicados
+            recebem o status 'duplicate' e não carregam o conteúdo
+    """
+    sources = list(dict.fromkeys(sources))
+    if not sources:
+        return []
+
+    max_workers = max_workers or int(get_env('ATTACHMENT_MAX_WORKERS', DEFAULT_ATTACHMENT_MAX_WORKERS))
+    timeout = timeout or float(get_env('ATTACHMENT_TIMEOUT_SECONDS', DEFAULT_ATTACHMENT_TIMEOUT))
+    max_download_bytes = max_download_bytes or int(get_env('ATTACHMENT_MAX_DOWNLOAD_BYTES',
+                                                           DEFAULT_ATTACHMENT_MAX_DOWNLOAD_BYTES))
+    policy = get_attachment_policy()
+    budget = DownloadBudget(max_download_bytes)
+
+    # O pool de threads só é importado quando há anexos (reduz o cold start)
+    from concurrent.futures import ThreadPoolExecutor
+
+    with stage_timer('attachment_fetch'), ThreadPoolExecutor(max_workers=min(max_workers, len(sources))) as executor:
+        attachments = list(executor.map(
+            lambda source: fetch_attachment(source, timeout, policy=policy, budget=budget), sources))
+
+    seen = {}
+    for attachment in attachments:
+        if attachment['data'] is None:
+            continue
+        digest = hashlib.sha256(attachment['data']).hexdigest()
+        if digest in seen:
+            attachment.update(data=None, status='duplicate', error=f'conteúdo idêntico a {seen[digest]}')
+        else:
+            seen[digest] = attachment['source']
+
+    return attachments
+
+
+def prepare_attachment(attachment, model_family=None):
+    """
+    Codifica um anexo lido no formato dos blocos de conteúdo dos modelos.
+
+    Imagens passam pelo pré-processamento (redução, recompressão e remoção de
+    metadados) e são codificadas em base64; arquivos de texto são decodificados.
+
+    Returns:
+        dict: 'source', 'file_name', 'kind' ('image', 'text' ou 'unsupported'),
+            'format' (imagens), 'content' (texto ou base64) e 'bytes' (tamanho enviado)
+    """
+    file_name = attachment['file_name']
+    prepared = {'source': attachment['source'], 'file_name': file_name, 'kind': 'unsupported', 'format': None,
+                'content': None, 'bytes': 0}
+
+    if get_image_format(file_name):
+        image = preprocess_image(attachment['data'], file_name, model_family)
+        content = encode_base64(image['data'])
+        prepared.update(kind='image', format=image['format'], content=content, bytes=len(content))
+
+    elif file_name.lower().endswith(TEXT_EXTENSIONS):
+        content = attachment['data'].decode('utf-8', errors='replace')
+        prepared.update(kind='text', content=content, bytes=len(attachment['data']))
+
+    return prepared
+
+
+def prepare_attachments(attachments, model_family=None, max_total_bytes=None, max_workers=None,
+                        include_images=True):
+    """
+    Prepara os anexos lidos para um modelo, em paralelo, respeitando o orçamento total.
+
+    Os anexos são incluídos na ordem recebida enquanto o tamanho total (já
+    codificado) couber em `max_total_bytes`; os demais são descartados.
+
+    Args:
+        attachments (list): Anexos lidos por fetch_attachments
+        model_family (str): Família do modelo, que define os limites das imagens
+        max_total_bytes (int): Orçamento total dos anexos (padrão: ATTACHMENT_MAX_TOTAL_BYTES ou 10 MB)
+        max_workers (int): Anexos processados simultaneamente (padrão: ATTACHMENT_MAX_WORKERS ou 8)
+        include_images (bool): Inclui as imagens; False para modelos que aceitam apenas texto
+
+    Returns:
+        list: Anexos preparados que couberam no orçamento
+    """
+    loaded = [attachment for attachment in attachments if attachment['data'] is not None
+              and (include_images or not get_image_format(attachment['file_name']))]
+    if not loaded:
+        return []
+
+    max_total_bytes = max_total_bytes or int(get_env('ATTACHMENT_MAX_TOTAL_BYTES', DEFAULT_ATTACHMENT_MAX_TOTAL_BYTES))
+    max_workers = max_workers or int(get_env('ATTACHMENT_MAX_WORKERS', DEFAULT_ATTACHMENT_MAX_WORKERS))
+
+    from concurrent.futures import ThreadPoolExecutor
+
+    with stage_timer('file_load'), ThreadPoolExecutor(max_workers=min(max_workers, len(loaded))) as executor:
+        prepared = list(executor.map(lambda attachment: prepare_attachment(attachment, model_family), loaded))
+
+    selected = []
+    total_bytes = 0
+    for attachment in prepared:
+        if attachment['kind'] == 'unsupported':
+            log_debug(f"Formato não suportado, anexo ignorado: {attachment['file_name']}", tag='ATTACHMENT')
+            continue
+        if total_bytes + attachment['bytes'] > max_total_bytes:
+            log_debug(f"Orçamento de {max_total_bytes} bytes excedido, anexo ignorado: "
+                      f"{attachment['source']}", tag='ATTACHMENT')
+            continue
+        selected.append(attachment)
+        total_bytes += attachment['bytes']
+
+    log_debug(f'{len(selected)} de {len(attachments)} anexos incluídos ({total_bytes} bytes)', tag='ATTACHMENT')
+    return selected
+
+
+def load_attachments(sources, model_family=None, include_images=True):
+    """
+    Lê e prepara os anexos de uma requisição.
+
+    Args:
+        sources (list): Caminhos locais, URIs do S3 e URLs, ou os anexos já lidos por fetch_attachments (para
+            reaproveitar os downloads entre vários modelos)
+        model_family (str): Família do modelo
+        include_images (bool): Inclui as imagens (padrão: True)
+
+    Returns:
+        list: Anexos preparados (ver prepare_attachments)
+    """
+    sources = list(sources)
+    if not all(isinstance(source, dict) for source in sources):
+        sources = fetch_attachments(sources)
+
+    return prepare_attachments(sources, model_family, include_images=include_images)
@@ -0,0 +1,119 @@
+import os
+from utils.instrumentation import log_debug
+
+class BatchBuilder:
+
+    def __init__(self, file_type, header=None, header_tokens=0):
+        """
+        Inicializa o construtor de lotes em memória.
+
+        Os registros são acumulados já como texto, na forma em que foram lidos do
+        arquivo, e o conteúdo do lote é montado uma única vez em build(), sem
+        passar por arquivos temporários.
+
+        Args:
+            file_type (str): 'csv', 'json' ou 'jsonl'
+            header (str): Cabeçalho do CSV, repetido em todos os lotes (opcional)
+            header_tokens (int): Tokens do cabeçalho
+        """
+        self.file_type = file_type
+        self.header = header
+        self.header_tokens = header_tokens
+        self.reset()
+
+    def reset(self):
+        """
+        Descarta os registros acumulados, mantendo o cabeçalho.
+        """
+        self.records = []
+        self.tokens = self.header_tokens
+
+    def add(self, record, record_tokens):
+        """
+        Adiciona um registro ao lote.
+
+        Args:
+            record (str): Texto do registro
+            record_tokens (int): Tokens do registro
+        """
+        self.records.append(record)
+        self.tokens += record_tokens
+
+    def fits(self, record_tokens, budget):
+        """
+        Verifica se um registro cabe no lote sem exceder o limite de tokens.
+
+        Args:
+            record_tokens (int): Tokens do registro
+            budget (float): Limite de tokens do lote
+
+        Returns:
+            bool: True se o registro couber no lote
+        """
+        return self.tokens + record_tokens <= budget
+
+    def __len__(self):
+        return len(self.records)
+
+    def render(self):
+        """
+        Monta o conteúdo do lote no formato do arquivo de origem.
+
+        Returns:
+            str: Conteúdo do lote
+        """
+        if self.file_type == 'csv':
+            return (self.header or '') + ''.join(self.records)
+        elif self.file_type == 'jsonl':
+            return '\n'.join(self.records) + '\n'
+        else:
+            return '[\n' + ',\n'.join(self.records) + '\n]'
+
+    def build(self, batch_index, start_row, prompt_tokens, file_name=None):
+        """
+        Gera o dicionário do lote com o conteúdo em memória.
+
+        Args:
+            batch_index (int): Índice do lote
+            start_row (int): Índice do primeiro registro do lote
+            prompt_tokens (int): Tokens do prompt
+            file_name (str): Nome do lote apresentado ao modelo (padrão: 'batch_<índice>.<tipo>')
+
+        Returns:
+            dict: Informações e conteúdo do lote
+        """
+        return {
+            'batch_index': batch_index,
+            'start_row': start_row,
+            'end_row': start_row + len(self.records),
+            'rows': len(self.records),
+            'tokens': self.tokens,
+            'total_tokens': prompt_tokens + self.tokens,
+            'file_type': self.file_type,
+            'file_name': file_name or f'batch_{batch_index:04d}.{self.file_type}',
+            'content': self.render(),
+            'path': None,
+        }
+
+    @staticmethod
+    def write(batch, output_dir):
+        """
+        Salva o conteúdo de um lote em disco. Usado apenas para depuração.
+
+        Args:
+            batch (dict): Lote gerado por build()
+            output_dir (str): Diretório de saída
+
+        Returns:
+            str: Caminho do arquivo salvo
+        """
+        os.makedirs(output_dir, exist_ok=True)
+        output_path = os.path.join(output_dir, batch['file_name'])
+
+        with open(output_path, 'w', encoding='utf-8') as file:
+            file.write(batch['content'])
+
+        batch['path'] = output_path
+        log_debug(f"Batch armazenado em: {output_path}")
+
+        return output_path
@@ -0,0 +1,104 @@
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.instrumentation import log_error
+
+# Número padrão de lotes processados simultaneamente (sobrescrito pelo .env: BATCH_MAX_WORKERS)
+DEFAULT_BATCH_MAX_WORKERS = 4
+
+
+class BatchExecutor:
+    """
+    Processa os itens de um iterável (ex: lotes do TokenManager) em um pool de threads,
+    com no máximo `max_workers` itens em andamento.
+
+    O próximo item só é lido do iterável quando há uma vaga livre, de modo que o
+    número de lotes (e de corpos de requisição montados a partir deles) mantidos em
+    memória nunca excede o limite, mesmo quando a leitura é mais rápida que a
+    inferência. Os resultados são entregues na ordem dos itens, assim que o item e
+    todos os anteriores terminam, e uma falha é registrada no resultado do item, sem
+    interromper os demais.
+    """
+
+    def __init__(self, max_workers=DEFAULT_BATCH_MAX_WORKERS):
+        """
+        Args:
+            max_workers (int): Número máximo de itens em andamento (padrão: 4)
+        """
+        if max_workers < 1:
+            raise ValueError('max_workers deve ser maior ou igual a 1')
+
+        self.max_workers = max_workers
+
+        # Itens em andamento (atual e máximo observado), atualizados pelas threads
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def map(self, func, items):
+        """
+        Aplica func a cada item e gera os resultados na ordem dos itens.
+
+        Args:
+            func (callable): Função aplicada a cada item (executada em uma thread do pool)
+            items (iterable): Itens a processar, lidos sob demanda
+
+        Yields:
+            dict: Resultado de cada item: 'index', 'status' ('success' ou 'error') e
+                'result' (retorno de func) ou 'error' (mensagem da exceção)
+        """
+        slots = threading.Semaphore(self.max_workers)
+        pending = deque()
+        iterator = iter(items)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            index = 0
+            while True:
+                # Entrega os resultados já concluídos, na ordem, antes de aguardar uma vaga
+                while pending and pending[0][1].done():
+                    yield self._outcome(*pending.popleft())
+
+                # Uma falha na leitura dos itens é propagada após a conclusão dos itens
+                # em andamento (na saída do ThreadPoolExecutor)
+                slots.acquire()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    slots.release()
+                    break
+
+                pending.append((index, executor.submit(self._call, func, item, slots)))
+
+                # Apenas a thread mantém a referência ao item, liberado ao fim do processamento
+                del item
+                index += 1
+
+            while pending:
+                yield self._outcome(*pending.popleft())
+
+    def _call(self, func, item, slots):
+        """
+        Executa func(item) em uma thread do pool, liberando a vaga ao terminar.
+        """
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+        try:
+            return func(item)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+            slots.release()
+
+    @staticmethod
+    def _outcome(index, future):
+        """
+        Monta o resultado de um item a partir da sua future.
+        """
+        try:
+            return {'index': index, 'status': 'success', 'result': future.result()}
+        except Exception as e:
+            log_error(f'Erro no processamento do item {index}: {e}')
+            return {'index': index, 'status': 'error', 'error': str(e)}
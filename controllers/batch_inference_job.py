@@ -0,0 +1,326 @@
+import json
+import time
+import hashlib
+
+# Importar o TokenManager, os estimadores, o catálogo de modelos e os templates
+from controllers.token_manager import TokenManager
+from controllers.token_estimator import get_token_estimator
+from models.model_catalog import get_model_class
+from templates.prompt_template import PromptTemplate
+
+# Importar o extrator de respostas e o registro de clientes AWS
+from services.bedrock_services import BedrockInferenceService
+from services.bedrock_client_registry import get_aws_client
+from services.s3_stream import parse_s3_uri
+from utils.instrumentation import log_debug, log_error
+
+# Tamanho do recordId exigido pelo Bedrock batch inference (alfanumérico)
+RECORD_ID_LENGTH = 11
+
+# Estados do job no Bedrock
+JOB_RUNNING_STATUSES = {'Submitted', 'Validating', 'Scheduled', 'InProgress', 'Stopping'}
+JOB_SUCCESS_STATUSES = {'Completed', 'PartiallyCompleted'}
+
+# Nomes dos arquivos gravados no prefixo de entrada de cada job
+RECORDS_FILE_NAME = 'records.jsonl'
+MANIFEST_FILE_NAME = 'manifest.json'
+
+
+def build_record_id(player_id, batch_index):
+    """
+    Gera um recordId estável (mesmo jogador e lote geram sempre o mesmo ID).
+
+    Args:
+        player_id (str): Identificador do jogador
+        batch_index (int): Índice do lote no arquivo de contexto
+
+    Returns:
+        str: recordId alfanumérico de RECORD_ID_LENGTH caracteres
+    """
+    digest = hashlib.sha256(f'{player_id}\n{batch_index}'.encode('utf-8')).hexdigest()
+    return digest[:RECORD_ID_LENGTH].upper()
+
+
+class BatchInferenceJob:
+
+    def __init__(self, model_name, bucket, role_arn, job_name=None, input_prefix='batch-inference/input/',
+                 output_prefix='batch-inference/output/', template_name=None, s3_client=None, bedrock_client=None):
+        """
+        Inicializa um job de inferência em lote (Bedrock batch inference) para vários jogadores.
+
+        Os lotes de cada jogador são montados pelo TokenManager e convertidos em registros
+        JSONL com o corpo de requisição do modelo. O job é processado de forma assíncrona
+        pelo Bedrock e as respostas são agrupadas novamente por jogador.
+
+        Args:
+            model_name (str): Nome do modelo no catálogo (ex: 'nova_pro')
+            bucket (str): Bucket S3 dos registros de entrada e das respostas
+            role_arn (str): ARN da role IAM usada pelo Bedrock para acessar o bucket
+            job_name (str): Nome do job (padrão: gerado a partir do modelo e do horário)
+            input_prefix (str): Prefixo S3 dos registros de entrada
+            output_prefix (str): Prefixo S3 das respostas
+            template_name (str): Template de prompt utilizado (padrão: DEFAULT_TEMPLATE_NAME)
+            s3_client: Cliente S3 (padrão: cliente compartilhado do processo)
+            bedrock_client: Cliente Bedrock de controle (padrão: cliente compartilhado do processo)
+        """
+        self.model_class = get_model_class(model_name)
+        self.bucket = bucket
+        self.role_arn = role_arn
+        self.job_name = job_name or f"{model_name.replace('_', '-')}-{time.strftime('%Y%m%d-%H%M%S')}"
+        self.input_prefix = f"{input_prefix.rstrip('/')}/{self.job_name}/"
+        self.output_prefix = f"{output_prefix.rstrip('/')}/{self.job_name}/"
+        self.template_name = template_name
+        self.s3_client = s3_client or get_aws_client('s3')
+        self.bedrock_client = bedrock_client or get_aws_client('bedrock')
+
+        self.job_arn = None
+        self.model_id = None
+        self.manifest = {}
+
+    def build_records(self, players):
+        """
+        Converte os lotes de cada jogador em registros do batch inference.
+
+        Args:
+            players (list): Jogadores no formato {'player_id': ..., 'context_path': ..., 'context': ...}
+
+        Yields:
+            dict: Registro {'recordId': ..., 'modelInput': corpo da requisição}
+        """
+        estimator = get_token_estimator(self.model_class.model_family)
+
+        for player in players:
+            player_id = str(player['player_id'])
+            prompt = PromptTemplate(player.get('context'), self.template_name)
+            prompt_text = prompt.get_prompt_text()
+
+            token_manager = TokenManager(context_path=player['context_path'], prompt=prompt_text, preload=False,
+                                         estimator=estimator, prompt_tokens=prompt.get_prompt_tokens(estimator))
+
+            for batch in token_manager.iter_batches():
+                model = self.model_class(prompt_text, file_content=batch['content'], file_name=batch['file_name'])
+                self.model_id = model.get_model_id()
+
+                record_id = build_record_id(player_id, batch['batch_index'])
+                if record_id in self.manifest:
+                    raise ValueError(f'recordId duplicado: {record_id} (jogador {player_id})')
+
+                self.manifest[record_id] = {
+                    'player_id': player_id,
+                    'batch_index': batch['batch_index'],
+                    'start_row': batch['start_row'],
+                    'end_row': batch['end_row'],
+                    'tokens': batch['tokens'],
+                }
+
+                yield {'recordId': record_id, 'modelInput': model.get_request_body()}
+
+    def write_input(self, players):
+        """
+        Grava os registros JSONL e o manifesto (recordId -> jogador/lote) no prefixo de entrada.
+
+        Args:
+            players (list): Jogadores a serem processados
+
+        Returns:
+            str: URI S3 do arquivo de registros
+        """
+        self.manifest = {}
+        records = [json.dumps(record, ensure_ascii=False) for record in self.build_records(players)]
+        if not records:
+            raise ValueError('Nenhum registro gerado para o job de inferência em lote')
+
+        records_key = self.input_prefix + RECORDS_FILE_NAME
+        self.s3_client.put_object(Bucket=self.bucket, Key=records_key,
+                                  Body=('\n'.join(records) + '\n').encode('utf-8'))
+
+        # O manifesto permite agrupar as respostas em outra invocação da Lambda
+        self.s3_client.put_object(Bucket=self.bucket, Key=self.input_prefix + MANIFEST_FILE_NAME,
+                                  Body=json.dumps({'model_id': self.model_id, 'records': self.manifest}).encode('utf-8'))
+
+        log_debug(f'{len(records)} registros gravados em s3://{self.bucket}/{records_key}')
+        return f's3://{self.bucket}/{records_key}'
+
+    def submit(self, players):
+        """
+        Grava os registros e cria o job de inferência em lote no Bedrock.
+
+        Args:
+            players (list): Jogadores a serem processados
+
+        Returns:
+            str: ARN do job
+        """
+        records_uri = self.write_input(players)
+
+        response = self.bedrock_client.create_model_invocation_job(
+            jobName=self.job_name,
+            roleArn=self.role_arn,
+            modelId=self.model_id,
+            inputDataConfig={'s3InputDataConfig': {'s3Uri': records_uri, 's3InputFormat': 'JSONL'}},
+            outputDataConfig={'s3OutputDataConfig': {'s3Uri': f's3://{self.bucket}/{self.output_prefix}'}},
+        )
+        self.job_arn = response['jobArn']
+
+        log_debug(f'Job de inferência em lote criado: {self.job_arn}')
+        return self.job_arn
+
+    def attach(self, job_arn):
+        """
+        Associa a instância a um job submetido em outra invocação da Lambda.
+
+        O nome do job e os prefixos de entrada (manifesto) e de saída (respostas) são
+        lidos do próprio job no Bedrock, e não do evento: o nome gerado pelo construtor
+        contém o horário da invocação e não localizaria o manifesto.
+
+        Args:
+            job_arn (str): ARN do job
+
+        Returns:
+            dict: Resposta de get_model_invocation_job (campos 'status', 'message', ...)
+        """
+        job = self.get_status(job_arn)
+
+        records_uri = job['inputDataConfig']['s3InputDataConfig']['s3Uri']
+        self.bucket, records_key = parse_s3_uri(records_uri)
+        self.input_prefix = records_key.rsplit('/', 1)[0] + '/'
+        self.output_prefix = parse_s3_uri(job['outputDataConfig']['s3OutputDataConfig']['s3Uri'])[1].rstrip('/') + '/'
+        self.job_name = job['jobName']
+        self.job_arn = job_arn
+        self.manifest = {}
+
+        return job
+
+    def get_status(self, job_arn=None):
+        """
+        Consulta o estado do job no Bedrock.
+
+        Returns:
+            dict: Resposta de get_model_invocation_job (campos 'status', 'message', ...)
+        """
+        return self.bedrock_client.get_model_invocation_job(jobIdentifier=job_arn or self.job_arn)
+
+    def wait(self, job_arn=None, poll_interval=60, timeout=24 * 60 * 60, sleep=time.sleep):
+        """
+        Aguarda o fim do job, consultando o estado periodicamente.
+
+        Args:
+            job_arn (str): ARN do job (padrão: o job submetido por esta instância)
+            poll_interval (float): Intervalo entre consultas, em segundos
+            timeout (float): Tempo máximo de espera, em segundos
+            sleep (callable): Função de espera
+
+        Returns:
+            str: Estado final do job ('Completed' ou 'PartiallyCompleted')
+
+        Raises:
+            RuntimeError: Se o job falhar, for interrompido ou exceder o tempo limite
+        """
+        deadline = time.monotonic() + timeout
+
+        while True:
+            job = self.get_status(job_arn)
+            status = job['status']
+
+            if status in JOB_SUCCESS_STATUSES:
+                return status
+            if status not in JOB_RUNNING_STATUSES:
+                raise RuntimeError(f"Job de inferência em lote terminou com estado {status}: {job.get('message')}")
+            if time.monotonic() >= deadline:
+                raise RuntimeError(f'Tempo limite excedido aguardando o job ({status})')
+
+            log_debug(f'Job de inferência em lote em andamento: {status}')
+            sleep(poll_interval)
+
+    def load_manifest(self):
+        """
+        Lê o manifesto gravado por write_input() (usado quando a coleta ocorre em outra invocação).
+        """
+        response = self.s3_client.get_object(Bucket=self.bucket, Key=self.input_prefix + MANIFEST_FILE_NAME)
+        manifest = json.loads(response['Body'].read())
+        self.model_id = manifest['model_id']
+        self.manifest = manifest['records']
+
+    def collect_results(self, job_arn=None):
+        """
+        Lê as respostas do job e as agrupa por jogador, na ordem dos lotes.
+
+        O Bedrock grava as respostas em '<prefixo de saída>/<ID do job>/records.jsonl.out',
+        uma linha por registro com 'modelOutput' ou 'error'.
+
+        Args:
+            job_arn (str): ARN do job (padrão: o job submetido por esta instância)
+
+        Returns:
+            dict: Resultados por jogador ({'status': ..., 'batches': [...]})
+        """
+        if not self.manifest:
+            self.load_manifest()
+
+        job_id = (job_arn or self.job_arn).rsplit('/', 1)[-1]
+        output_prefix = f'{self.output_prefix}{job_id}/'
+
+        results = {}
+        paginator = self.s3_client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=output_prefix):
+            for item in page.get('Contents', []):
+                # Ignora o manifesto de estatísticas gravado pelo Bedrock (manifest.json.out)
+                if not item['Key'].endswith(RECORDS_FILE_NAME + '.out'):
+                    continue
+
+                body = self.s3_client.get_object(Bucket=self.bucket, Key=item['Key'])['Body']
+                for line in body.iter_lines():
+                    if line.strip():
+                        self._merge_record(json.loads(line), results)
+
+        # Ordena os lotes e marca jogadores com lotes ausentes ou com erro
+        for player_id, player_results in results.items():
+            player_results['batches'].sort(key=lambda batch: batch['batch_index'])
+            expected = sum(1 for record in self.manifest.values() if record['player_id'] == player_id)
+            succeeded = sum(1 for batch in player_results['batches'] if batch['status'] == 'success')
+            player_results['status'] = 'success' if succeeded == expected else 'partial'
+
+        for record in self.manifest.values():
+            results.setdefault(record['player_id'], {'model_id': self.model_id, 'status': 'missing', 'batches': []})
+
+        return results
+
+    def _merge_record(self, output_record, results):
+        """
+        Associa uma linha de resposta ao jogador e ao lote de origem pelo recordId.
+        """
+        record = self.manifest.get(output_record.get('recordId'))
+        if record is None:
+            log_error(f"recordId desconhecido na saída do job: {output_record.get('recordId')}")
+            return
+
+        batch = {
+            'batch_index': record['batch_index'],
+            'start_row': record['start_row'],
+            'end_row': record['end_row'],
+            'tokens': record['tokens'],
+        }
+
+        model_output = output_record.get('modelOutput')
+        if model_output is not None:
+            batch.update({
+                'status': 'success',
+                'text': BedrockInferenceService.extract_response_text(model_output),
+                'usage': BedrockInferenceService.extract_usage(model_output),
+            })
+        else:
+            batch.update({'status': 'error', 'error': output_record.get('error')})
+
+        player_results = results.setdefault(record['player_id'], {'model_id': self.model_id, 'batches': []})
+        player_results['batches'].append(batch)
+
+    def run(self, players, poll_interval=60, timeout=24 * 60 * 60):
+        """
+        Executa o fluxo completo: grava os registros, submete o job, aguarda e agrupa as respostas.
+
+        Returns:
+            dict: Resultados por jogador
+        """
+        self.submit(players)
+        self.wait(poll_interval=poll_interval, timeout=timeout)
+        return self.collect_results()
@@ -0,0 +1,249 @@
+import io
+import math
+import hashlib
+import threading
+
+from utils.environment import get_env
+from utils.instrumentation import log_debug, log_error
+from services.response_cache import MemoryCache
+
+# Extensões de imagem aceitas pelos modelos e o formato correspondente
+IMAGE_FORMATS = {
+    'png': 'png',
+    'jpg': 'jpeg',
+    'jpeg': 'jpeg',
+    'gif': 'gif',
+    'webp': 'webp',
+}
+
+# Maior lado útil da imagem, em pixels, por família de modelo: acima disso o próprio
+# modelo reduz a imagem antes de processá-la, e os pixels extras só aumentam o payload
+MAX_IMAGE_DIMENSIONS = {
+    'anthropic': 1568,
+    'amazon': 2048,
+}
+DEFAULT_MAX_IMAGE_DIMENSION = 1568
+
+# Tamanho máximo padrão da imagem processada, em bytes (antes do base64)
+DEFAULT_IMAGE_MAX_BYTES = 1_000_000
+
+# Qualidades tentadas na recompressão (JPEG/WEBP) e fator de redução quando nenhuma cabe no limite
+JPEG_QUALITY_STEPS = (85, 75, 65, 50)
+DOWNSCALE_FACTOR = 0.75
+MIN_IMAGE_DIMENSION = 256
+
+# Imagens processadas mantidas em memória, indexadas pelo hash do conteúdo e dos parâmetros
+IMAGE_CACHE_MAX_ENTRIES = 64
+IMAGE_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+# Formatos de saída; GIFs (possivelmente animados) são mantidos como estão
+_SAVE_FORMATS = {'png': 'PNG', 'jpeg': 'JPEG', 'webp': 'WEBP'}
+
+
+def get_image_format(file_name):
+    """
+    Retorna o formato da imagem pela extensão do arquivo, ou None se não for uma imagem.
+
+    Args:
+        file_name (str): Nome do arquivo
+
+    Returns:
+        str: 'png', 'jpeg', 'gif', 'webp' ou None
+    """
+    return IMAGE_FORMATS.get(file_name.lower().rsplit('.', 1)[-1]) if file_name else None
+
+
+def is_image_preprocessing_enabled():
+    """
+    Verifica a variável de ambiente IMAGE_PREPROCESSING_ENABLED (padrão: habilitado).
+    """
+    return (get_env('IMAGE_PREPROCESSING_ENABLED') or 'true').lower() in ('1', 'true', 'yes')
+
+
+class ImagePreprocessor:
+
+    def __init__(self, max_dimension=DEFAULT_MAX_IMAGE_DIMENSION, max_bytes=DEFAULT_IMAGE_MAX_BYTES,
+                 cache=None):
+        """
+        Pré-processa imagens anexadas antes da codificação em base64.
+
+        A imagem é rotacionada conforme a orientação EXIF, reduzida ao maior lado útil
+        do modelo, salva sem metadados (EXIF, ICC, XMP) e recomprimida até caber no
+        limite de bytes. Os resultados são mantidos em memória pelo hash do conteúdo,
+        evitando reprocessar anexos repetidos.
+
+        O Pillow é uma dependência opcional, importada apenas na primeira imagem; sem
+        ele, as imagens são enviadas como estão.
+
+        Args:
+            max_dimension (int): Maior lado da imagem, em pixels (padrão: 1568)
+            max_bytes (int): Tamanho máximo da imagem processada, em bytes (padrão: 1 MB)
+            cache (MemoryCache): Cache das imagens processadas (padrão: cache do processo)
+        """
+        self.max_dimension = max_dimension
+        self.max_bytes = max_bytes
+        self.cache = cache if cache is not None else _get_image_cache()
+
+    def build_cache_key(self, data):
+        """
+        Chave do cache: hash do conteúdo original e dos parâmetros do processamento.
+        """
+        digest = hashlib.sha256(data)
+        digest.update(f'|{self.max_dimension}|{self.max_bytes}'.encode('ascii'))
+        return digest.hexdigest()
+
+    def process(self, data, file_name):
+        """
+        Pré-processa uma imagem.
+
+        Args:
+            data (bytes): Conteúdo original da imagem
+            file_name (str): Nome do arquivo (define o formato de origem)
+
+        Returns:
+            dict: 'data' (bytes), 'format' ('png', 'jpeg', 'gif' ou 'webp'), dimensões
+                ('width', 'height'), 'original_bytes', 'bytes' e 'cache_hit'
+        """
+        image_format = get_image_format(file_name) or 'jpeg'
+        cache_key = self.build_cache_key(data)
+
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            return dict(cached, cache_hit=True)
+
+        result = self._process(data, image_format)
+        result['original_bytes'] = len(data)
+        result['bytes'] = len(result['data'])
+        self.cache.put(cache_key, result, result['bytes'], math.inf)
+
+        log_debug(f"{file_name}: {result['original_bytes']} -> {result['bytes']} bytes "
+                  f"({result['format']}, {result['width']}x{result['height']})", tag='IMAGE')
+        return dict(result, cache_hit=False)
+
+    def _process(self, data, image_format):
+        """
+        Reduz, remove os metadados e recomprime a imagem.
+        """
+        try:
+            from PIL import Image, ImageOps
+        except ImportError:
+            log_debug('Pillow não instalado, imagem enviada sem pré-processamento', tag='IMAGE')
+            return {'data': data, 'format': image_format, 'width': None, 'height': None}
+
+        try:
+            image = Image.open(io.BytesIO(data))
+            image.load()
+        except Exception as e:
+            log_error(f'Imagem inválida, enviada sem pré-processamento: {e}')
+            return {'data': data, 'format': image_format, 'width': None, 'height': None}
+
+        # GIFs animados perderiam os quadros: são mantidos como estão
+        if image_format == 'gif' or getattr(image, 'is_animated', False):
+            return {'data': data, 'format': image_format, 'width': image.width, 'height': image.height}
+
+        has_metadata = any(key in image.info for key in ('exif', 'icc_profile', 'xmp', 'XML:com.adobe.xmp'))
+        if (max(image.size) <= self.max_dimension and len(data) <= self.max_bytes and not has_metadata
+                and image_format in _SAVE_FORMATS):
+            return {'data': data, 'format': image_format, 'width': image.width, 'height': image.height}
+
+        # A orientação do EXIF é aplicada aos pixels e os metadados (EXIF, ICC, XMP) são descartados:
+        # o PNG, por exemplo, regravaria o perfil ICC de image.info
+        image = ImageOps.exif_transpose(image)
+        image.info = {}
+        if max(image.size) > self.max_dimension:
+            image.thumbnail((self.max_dimension, self.max_dimension), Image.LANCZOS)
+
+        output_format = image_format if image_format in _SAVE_FORMATS else 'jpeg'
+        while True:
+            encoded, encoded_format = self._encode(image, output_format)
+            if len(encoded) <= self.max_bytes or max(image.size) <= MIN_IMAGE_DIMENSION:
+                return {'data': encoded, 'format': encoded_format, 'width': image.width, 'height': image.height}
+
+            # Nenhuma qualidade coube no limite: reduz as dimensões e tenta novamente
+            new_size = (max(1, int(image.width * DOWNSCALE_FACTOR)), max(1, int(image.height * DOWNSCALE_FACTOR)))
+            image = image.resize(new_size, Image.LANCZOS)
+
+    def _encode(self, image, output_format):
+        """
+        Salva a imagem sem metadados, no menor tamanho que caiba no limite.
+
+        PNGs são mantidos quando cabem (capturas de tela e placares com texto ficam
+        legíveis); caso contrário, a imagem é convertida para JPEG e a qualidade é
+        reduzida passo a passo.
+
+        Returns:
+            tuple: (bytes, formato)
+        """
+        if output_format == 'png':
+            encoded = self._save(image, 'png', optimize=True)
+            if len(encoded) <= self.max_bytes:
+                return encoded, 'png'
+            output_format = 'jpeg'
+
+        # JPEG não possui transparência: a imagem é aplicada sobre um fundo branco
+        if output_format == 'jpeg' and image.mode not in ('RGB', 'L'):
+            image = _flatten(image)
+
+        encoded = None
+        for quality in JPEG_QUALITY_STEPS:
+            encoded = self._save(image, output_format, quality=quality, optimize=True)
+            if len(encoded) <= self.max_bytes:
+                break
+        return encoded, output_format
+
+    @staticmethod
+    def _save(image, output_format, **options):
+        buffer = io.BytesIO()
+        image.save(buffer, _SAVE_FORMATS[output_format], icc_profile=None, **options)
+        return buffer.getvalue()
+
+
+def _flatten(image):
+    """
+    Converte a imagem para RGB, aplicando a transparência sobre um fundo branco.
+    """
+    from PIL import Image
+
+    image = image.convert('RGBA')
+    background = Image.new('RGB', image.size, (255, 255, 255))
+    background.paste(image, mask=image.getchannel('A'))
+    return background
+
+
+# Cache das imagens processadas, compartilhado pelas invocações "quentes" da Lambda
+_IMAGE_CACHE = None
+_IMAGE_CACHE_LOCK = threading.Lock()
+
+
+def _get_image_cache():
+    global _IMAGE_CACHE
+
+    if _IMAGE_CACHE is None:
+        with _IMAGE_CACHE_LOCK:
+            if _IMAGE_CACHE is None:
+                _IMAGE_CACHE = MemoryCache(IMAGE_CACHE_MAX_ENTRIES, IMAGE_CACHE_MAX_BYTES)
+    return _IMAGE_CACHE
+
+
+def preprocess_image(data, file_name, model_family=None):
+    """
+    Pré-processa uma imagem com os limites da família do modelo.
+
+    Args:
+        data (bytes): Conteúdo original da imagem
+        file_name (str): Nome do arquivo
+        model_family (str): Família do modelo ('anthropic', 'amazon', ...) (opcional)
+
+    Returns:
+        dict: Resultado de ImagePreprocessor.process; a imagem original quando o
+            pré-processamento está desabilitado (IMAGE_PREPROCESSING_ENABLED=false)
+    """
+    if not is_image_preprocessing_enabled():
+        return {'data': data, 'format': get_image_format(file_name) or 'jpeg', 'width': None, 'height': None,
+                'original_bytes': len(data), 'bytes': len(data), 'cache_hit': False}
+
+    preprocessor = ImagePreprocessor(
+        max_dimension=MAX_IMAGE_DIMENSIONS.get(model_family, DEFAULT_MAX_IMAGE_DIMENSION),
+        max_bytes=int(get_env('IMAGE_MAX_BYTES', DEFAULT_IMAGE_MAX_BYTES)),
+    )
+    return preprocessor.process(data, file_name)
@@ -0,0 +1,262 @@
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Importar o TokenManager, os estimadores, o catálogo de modelos e os templates
+from controllers.token_manager import TokenManager
+from controllers.batch_executor import BatchExecutor
+from controllers.token_estimator import get_token_estimator
+from models.model_catalog import get_model_class
+from templates.prompt_template import DEFAULT_TEMPLATE_NAME, PromptTemplate
+
+# Importar o serviço de inferência
+from services.bedrock_services import BedrockInferenceService
+from utils.instrumentation import log_debug
+
+# Templates das etapas map (digest de cada lote) e reduce (combinação de digests)
+DIGEST_TEMPLATE_NAME = 'session_digest'
+MERGE_TEMPLATE_NAME = 'digest_merge'
+
+# Limite de saída das chamadas intermediárias (digests são curtos)
+DEFAULT_DIGEST_MAX_TOKENS = 1_500
+
+
+class MapReduceSummarizer:
+
+    def __init__(self, model_name, context, context_path, max_tokens=60_000, fan_in=4, max_depth=4, max_workers=8,
+                 template_name=None, digest_max_tokens=DEFAULT_DIGEST_MAX_TOKENS, use_cache=True,
+                 safety_margin=0.05, prompt_cache=False):
+        """
+        Inicializa a sumarização hierárquica (map-reduce) de arquivos maiores que a janela de contexto.
+
+        Cada lote do arquivo gera um digest compacto (map, executado em paralelo); os digests
+        são combinados em árvore, em grupos de até `fan_in`, até caberem em uma única chamada
+        com o template do relatório (reduce). O número de níveis cresce com o logaritmo do
+        número de lotes, e nenhuma linha do arquivo é descartada.
+
+        Args:
+            model_name (str): Nome do modelo no catálogo (ex: 'nova_pro')
+            context (str): Contexto do jogador usado nos prompts
+            context_path (str): Caminho do arquivo CSV, JSON ou JSONL
+            max_tokens (int): Limite de tokens de entrada de cada chamada (padrão: 60.000)
+            fan_in (int): Número máximo de digests combinados por chamada (padrão: 4)
+            max_depth (int): Número máximo de níveis de combinação (padrão: 4)
+            max_workers (int): Chamadas simultâneas em cada nível (padrão: 8)
+            template_name (str): Template do relatório final (padrão: DEFAULT_TEMPLATE_NAME)
+            digest_max_tokens (int): Limite de saída das chamadas de digest e combinação
+            use_cache (bool): Consulta o cache de respostas antes de cada chamada (padrão: True)
+            safety_margin (float): Fração de max_tokens reservada para erros de estimativa (padrão: 5%)
+            prompt_cache (bool): Envia checkpoints de cache de prompt do Bedrock; o prompt de cada
+                etapa se repete em todas as chamadas do nível (padrão: False)
+        """
+        if fan_in < 2:
+            raise ValueError('fan_in deve ser maior ou igual a 2')
+
+        self.model_class = get_model_class(model_name)
+        self.context = context
+        self.context_path = context_path
+        self.max_tokens = max_tokens
+        self.safety_margin = safety_margin
+        self.budget = max_tokens - int(max_tokens * safety_margin)
+        self.fan_in = fan_in
+        self.max_depth = max_depth
+        self.max_workers = max_workers
+        self.template_name = template_name or DEFAULT_TEMPLATE_NAME
+        self.digest_max_tokens = digest_max_tokens
+        self.use_cache = use_cache
+        self.prompt_cache = prompt_cache
+        self.estimator = get_token_estimator(self.model_class.model_family)
+
+        # Métricas acumuladas das chamadas (atualizadas por várias threads)
+        self.calls = 0
+        self.usage = {'input_tokens': 0, 'output_tokens': 0, 'cache_read_input_tokens': 0,
+                      'cache_write_input_tokens': 0}
+        self._metrics_lock = threading.Lock()
+
+        # Lotes cuja chamada da etapa map falhou (índice e mensagem do erro)
+        self.failed_batches = []
+
+    def _invoke(self, prompt, file_content, file_name, max_tokens=None):
+        """
+        Invoca o modelo com um prompt e um conteúdo anexado.
+
+        Returns:
+            tuple: (texto gerado, ID do modelo)
+        """
+        model_kwargs = {'max_tokens': max_tokens} if max_tokens else {}
+        model = self.model_class(prompt.get_prompt_text(), file_content=file_content, file_name=file_name,
+                                 prompt_cache=self.prompt_cache, cache_prefix=prompt.get_static_prefix(),
+                                 **model_kwargs)
+
+        inference_service = BedrockInferenceService(model.get_model_id(), model.get_request_body_bytes(),
+                                                    use_cache=self.use_cache,
+                                                    estimated_tokens=model.estimate_request_tokens())
+        text = inference_service.invoke_model()
+
+        with self._metrics_lock:
+            self.calls += 1
+            for name in self.usage:
+                self.usage[name] += inference_service.usage.get(name) or 0
+
+        return text, model.get_model_id()
+
+    def map(self, prompt):
+        """
+        Gera o digest de cada lote do arquivo, em paralelo, preservando a ordem dos lotes.
+
+        A leitura do arquivo avança apenas quando há uma chamada livre, limitando os lotes
+        em memória a `max_workers`. Um lote com falha não interrompe os demais: seu índice
+        é registrado em failed_batches e o relatório é gerado com os digests restantes.
+
+        Args:
+            prompt (PromptTemplate): Prompt da etapa map
+
+        Returns:
+            list: Digests dos lotes processados, na ordem dos lotes
+
+        Raises:
+            RuntimeError: Se nenhum lote for processado com sucesso
+        """
+        token_manager = TokenManager(context_path=self.context_path, prompt=prompt.get_prompt_text(),
+                                     max_tokens=self.max_tokens, preload=False, estimator=self.estimator,
+                                     safety_margin=self.safety_margin,
+                                     prompt_tokens=prompt.get_prompt_tokens(self.estimator))
+
+        digests = []
+        for outcome in BatchExecutor(self.max_workers).map(
+            lambda batch: self._invoke(prompt, batch['content'], batch['file_name'], self.digest_max_tokens),
+            token_manager.iter_batches(),
+        ):
+            if outcome['status'] == 'success':
+                digests.append(outcome['result'][0])
+            else:
+                self.failed_batches.append({'batch_index': outcome['index'], 'error': outcome['error']})
+
+        if not digests and self.failed_batches:
+            raise RuntimeError(f'Nenhum lote processado na etapa map: {self.failed_batches[0]["error"]}')
+
+        return digests
+
+    def group_digests(self, digests, prompt_tokens):
+        """
+        Agrupa os digests em grupos de até `fan_in` itens que caibam em uma chamada.
+
+        Args:
+            digests (list): Digests do nível atual
+            prompt_tokens (int): Tokens do prompt de combinação
+
+        Returns:
+            list: Grupos de digests
+        """
+        budget = self.budget - prompt_tokens
+        groups = [[]]
+        group_tokens = 0
+
+        for digest in digests:
+            digest_tokens = self.estimator.count_tokens(digest)
+            if groups[-1] and (len(groups[-1]) >= self.fan_in or group_tokens + digest_tokens > budget):
+                groups.append([])
+                group_tokens = 0
+            groups[-1].append(digest)
+            group_tokens += digest_tokens
+
+        return groups
+
+    @staticmethod
+    def join_digests(digests):
+        """
+        Concatena os digests em um único texto, identificando cada parte.
+        """
+        return '\n\n'.join(f'--- Digest {index + 1} ---\n{digest}' for index, digest in enumerate(digests))
+
+    def fits(self, digests, prompt):
+        """
+        Verifica se os digests cabem em uma única chamada com o prompt informado.
+        """
+        return (prompt.get_prompt_tokens(self.estimator)
+                + self.estimator.count_tokens(self.join_digests(digests))) <= self.budget
+
+    def reduce(self, digests, report_prompt):
+        """
+        Combina os digests em árvore até caberem no prompt do relatório final.
+
+        Args:
+            digests (list): Digests gerados pela etapa map
+            report_prompt (PromptTemplate): Prompt do relatório final
+
+        Returns:
+            tuple: (digests finais, número de níveis de combinação)
+
+        Raises:
+            RuntimeError: Se os digests não couberem após `max_depth` níveis
+        """
+        merge_prompt = PromptTemplate(self.context, MERGE_TEMPLATE_NAME)
+        merge_prompt_tokens = merge_prompt.get_prompt_tokens(self.estimator)
+        depth = 0
+
+        while not self.fits(digests, report_prompt):
+            if depth >= self.max_depth:
+                raise RuntimeError(f'Os digests não couberam no contexto após {depth} níveis de combinação; '
+                                   f'aumente fan_in ou max_depth')
+
+            groups = self.group_digests(digests, merge_prompt_tokens)
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                digests = [text for text, _ in executor.map(
+                    lambda group: self._invoke(merge_prompt, self.join_digests(group), 'session_digests.txt',
+                                               self.digest_max_tokens),
+                    groups,
+                )]
+
+            depth += 1
+            log_debug(f'Nível {depth} da combinação: {len(groups)} digests')
+
+        return digests, depth
+
+    def run(self):
+        """
+        Executa o map-reduce e gera o relatório final.
+
+        Quando o arquivo cabe em um único lote, o relatório é gerado diretamente a
+        partir dos dados, sem etapas intermediárias.
+
+        Returns:
+            dict: Texto do relatório, ID do modelo, níveis, chamadas, latência e uso de tokens
+        """
+        start_time = time.perf_counter()
+        report_prompt = PromptTemplate(self.context, self.template_name)
+
+        # 1 - Arquivo pequeno: um único lote com o prompt do relatório. Apenas o primeiro lote é
+        # lido; em um arquivo grande, a leitura para no primeiro registro que não cabe nele
+        token_manager = TokenManager(context_path=self.context_path, prompt=report_prompt.get_prompt_text(),
+                                     max_tokens=self.max_tokens, preload=False, estimator=self.estimator,
+                                     safety_margin=self.safety_margin,
+                                     prompt_tokens=report_prompt.get_prompt_tokens(self.estimator))
+        report_batches = token_manager.iter_batches()
+        first_batch = next(report_batches, None)
+        report_batches.close()
+        batches, depth = 1, 0
+
+        if first_batch is None or not first_batch['has_more']:
+            content, file_name = (first_batch['content'], first_batch['file_name']) if first_batch else (None, None)
+            text, model_id = self._invoke(report_prompt, content, file_name)
+
+        # 2 - Arquivo grande: digests por lote (map), combinação em árvore (reduce) e relatório final
+        else:
+            digests = self.map(PromptTemplate(self.context, DIGEST_TEMPLATE_NAME))
+            batches = len(digests) + len(self.failed_batches)
+            log_debug(f'Etapa map concluída: {batches} digests')
+
+            digests, depth = self.reduce(digests, report_prompt)
+            text, model_id = self._invoke(report_prompt, self.join_digests(digests), 'session_digests.txt')
+
+        return {
+            'model_id': model_id,
+            'status': 'partial' if self.failed_batches else 'success',
+            'text': text,
+            'batches': batches,
+            'failed_batches': list(self.failed_batches),
+            'levels': depth,
+            'calls': self.calls,
+            'latency': time.perf_counter() - start_time,
+            'usage': dict(self.usage),
+        }
@@ -0,0 +1,232 @@
+import math
+import threading
+from collections import deque
+
+from utils.environment import get_env
+from utils.instrumentation import log_debug
+from models.model_catalog import MODEL_CATALOG
+
+# Latência máxima padrão por requisição, em segundos (sobrescrita pelo .env ou pelo evento)
+DEFAULT_LATENCY_BUDGET = 60.0
+
+# Número de latências observadas mantidas por modelo e mínimo para substituir a estimativa inicial
+DEFAULT_LATENCY_WINDOW = 100
+MIN_LATENCY_SAMPLES = 5
+
+# Nível mínimo do modelo conforme o tamanho da entrada: entradas pequenas vão para o modelo mais
+# rápido e as demais para um modelo intermediário (limite superior de tokens, nível). O TokenManager
+# limita prompt + lote a 60.000 tokens, de modo que o nível 3 é exigido apenas pela qualidade 'high'
+SIZE_TIERS = (
+    (20_000, 1),
+    (math.inf, 2),
+)
+
+# Nível mínimo por qualidade solicitada no evento
+QUALITY_TIERS = {
+    'fast': 1,
+    'balanced': 2,
+    'high': 3,
+}
+
+
+class ModelProfile:
+
+    def __init__(self, name, context_limit, max_output_tokens, tier, base_latency, latency_per_1k_tokens):
+        """
+        Perfil de um modelo usado pelo roteador.
+
+        Args:
+            name (str): Nome do modelo no catálogo
+            context_limit (int): Limite de tokens de entrada do modelo
+            max_output_tokens (int): Limite de tokens de saída aceito pelo modelo, usado como
+                max_tokens das requisições roteadas
+            tier (int): Nível do modelo (1 = mais rápido, 3 = mais capaz e mais lento)
+            base_latency (float): Latência inicial estimada, em segundos, antes de haver observações
+            latency_per_1k_tokens (float): Acréscimo estimado de latência por 1.000 tokens de entrada
+        """
+        self.name = name
+        self.context_limit = context_limit
+        self.max_output_tokens = max_output_tokens
+        self.tier = tier
+        self.base_latency = base_latency
+        self.latency_per_1k_tokens = latency_per_1k_tokens
+
+    def estimate_latency(self, input_tokens):
+        """
+        Estimativa inicial da latência, usada até haver observações suficientes.
+        """
+        return self.base_latency + self.latency_per_1k_tokens * input_tokens / 1000
+
+
+# Perfis dos modelos disponíveis para roteamento (limites de saída dos modelos padrão do catálogo:
+# Claude 3 Haiku, Nova Pro, Llama 3.3 70B e Claude 3.5 Sonnet)
+MODEL_PROFILES = {
+    'claude_haiku': ModelProfile('claude_haiku', context_limit=200_000, max_output_tokens=4096, tier=1,
+                                 base_latency=1.5, latency_per_1k_tokens=0.02),
+    'nova_pro': ModelProfile('nova_pro', context_limit=300_000, max_output_tokens=10_000, tier=2,
+                             base_latency=3.0, latency_per_1k_tokens=0.03),
+    'llama_70b': ModelProfile('llama_70b', context_limit=128_000, max_output_tokens=2048, tier=2,
+                              base_latency=4.0, latency_per_1k_tokens=0.04),
+    'claude_sonnet': ModelProfile('claude_sonnet', context_limit=200_000, max_output_tokens=4096, tier=3,
+                                  base_latency=6.0, latency_per_1k_tokens=0.05),
+}
+
+
+class LatencyTracker:
+    """
+    Janela móvel das latências observadas por modelo, com percentis p50/p95.
+    """
+
+    def __init__(self, window=DEFAULT_LATENCY_WINDOW):
+        self.window = window
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def record(self, model_name, latency):
+        with self._lock:
+            self._samples.setdefault(model_name, deque(maxlen=self.window)).append(latency)
+
+    def count(self, model_name):
+        return len(self._samples.get(model_name, ()))
+
+    def percentile(self, model_name, percentile):
+        """
+        Retorna o percentil (0-100) das latências observadas, ou None sem observações.
+        """
+        with self._lock:
+            samples = sorted(self._samples.get(model_name, ()))
+
+        if not samples:
+            return None
+
+        index = min(len(samples) - 1, max(0, math.ceil(percentile / 100 * len(samples)) - 1))
+        return samples[index]
+
+    def get_stats(self):
+        """
+        Returns:
+            dict: {'modelo': {'samples': n, 'p50': ..., 'p95': ...}}
+        """
+        return {
+            model_name: {
+                'samples': self.count(model_name),
+                'p50': self.percentile(model_name, 50),
+                'p95': self.percentile(model_name, 95),
+            }
+            for model_name in list(self._samples)
+        }
+
+
+class ModelRouter:
+
+    def __init__(self, profiles=None, tracker=None):
+        """
+        Roteador que escolhe o modelo de cada requisição pelo tamanho da entrada, limite de
+        contexto, orçamento de latência e latência observada (p95) de cada modelo.
+
+        Args:
+            profiles (dict): Perfis dos modelos (padrão: MODEL_PROFILES dos modelos do catálogo)
+            tracker (LatencyTracker): Latências observadas (padrão: nova janela móvel)
+        """
+        self.profiles = profiles or {name: profile for name, profile in MODEL_PROFILES.items()
+                                     if name in MODEL_CATALOG}
+        self.tracker = tracker or LatencyTracker()
+
+    def predict_latency(self, profile, input_tokens):
+        """
+        Prevê a latência do modelo: p95 observado, ou a estimativa inicial do perfil.
+        """
+        if self.tracker.count(profile.name) >= MIN_LATENCY_SAMPLES:
+            return self.tracker.percentile(profile.name, 95)
+        return profile.estimate_latency(input_tokens)
+
+    @staticmethod
+    def get_required_tier(input_tokens, quality=None):
+        """
+        Nível mínimo do modelo pelo tamanho da entrada e pela qualidade solicitada.
+        """
+        size_tier = next(tier for max_tokens, tier in SIZE_TIERS if input_tokens <= max_tokens)
+        return max(size_tier, QUALITY_TIERS.get(quality, 1))
+
+    def select(self, input_tokens, latency_budget=None, quality=None):
+        """
+        Escolhe o modelo para uma requisição.
+
+        Entre os modelos cujo contexto comporta a entrada, de nível suficiente e com
+        latência prevista dentro do orçamento, escolhe o de menor nível (mais rápido) e,
+        no empate, o de menor latência prevista. Se nenhum couber no orçamento, escolhe
+        o modelo com a menor latência prevista.
+
+        Args:
+            input_tokens (int): Tokens estimados de entrada
+            latency_budget (float): Latência máxima desejada, em segundos (padrão: .env)
+            quality (str): 'fast', 'balanced' ou 'high' (opcional)
+
+        Returns:
+            dict: Modelo escolhido ('model_name'), seu limite de saída ('max_output_tokens')
+                e a justificativa da escolha
+
+        Raises:
+            ValueError: Se nenhum modelo comportar a entrada
+        """
+        if latency_budget is None:
+            latency_budget = float(get_env('ROUTER_LATENCY_BUDGET_SECONDS', DEFAULT_LATENCY_BUDGET))
+
+        candidates = [profile for profile in self.profiles.values() if input_tokens <= profile.context_limit]
+        if not candidates:
+            raise ValueError(f'Nenhum modelo comporta {input_tokens} tokens de entrada')
+
+        required_tier = self.get_required_tier(input_tokens, quality)
+        predictions = {profile.name: self.predict_latency(profile, input_tokens) for profile in candidates}
+
+        eligible = [profile for profile in candidates
+                    if profile.tier >= required_tier and predictions[profile.name] <= latency_budget]
+
+        if eligible:
+            selected = min(eligible, key=lambda profile: (profile.tier, predictions[profile.name]))
+            reason = 'within_budget'
+        else:
+            selected = min(candidates, key=lambda profile: predictions[profile.name])
+            reason = 'fastest_over_budget'
+
+        log_debug(f'Roteador: {selected.name} para {input_tokens} tokens '
+                  f'(nível mínimo {required_tier}, latência prevista {predictions[selected.name]:.2f}s, {reason})')
+
+        return {
+            'model_name': selected.name,
+            'max_output_tokens': selected.max_output_tokens,
+            'estimated_tokens': input_tokens,
+            'required_tier': required_tier,
+            'predicted_latency': predictions[selected.name],
+            'latency_budget': latency_budget,
+            'reason': reason,
+        }
+
+    def record_latency(self, model_name, latency):
+        """
+        Registra a latência observada de uma invocação do modelo.
+        """
+        if latency is not None:
+            self.tracker.record(model_name, latency)
+
+
+# Roteador do processo, compartilhado entre invocações "quentes" da Lambda
+_MODEL_ROUTER = None
+_MODEL_ROUTER_LOCK = threading.Lock()
+
+
+def get_model_router():
+    """
+    Retorna o roteador do processo, criando-o na primeira chamada.
+
+    Returns:
+        ModelRouter: Roteador compartilhado
+    """
+    global _MODEL_ROUTER
+
+    if _MODEL_ROUTER is None:
+        with _MODEL_ROUTER_LOCK:
+            if _MODEL_ROUTER is None:
+                _MODEL_ROUTER = ModelRouter()
+
+    return _MODEL_ROUTER
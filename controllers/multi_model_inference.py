@@ -0,0 +1,122 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+# Importar as classes de serviços e o catálogo de modelos
+from services.bedrock_services import BedrockInferenceService
+from models.model_catalog import get_model_class
+from controllers.model_router import get_model_router
+from utils.instrumentation import log_debug, log_error
+
+class MultiModelInference:
+
+    def __init__(self, prompt, model_names, file_path=None, timeout=120, timeouts=None, file_content=None, file_name=None,
+                 use_cache=True, prompt_cache=False, cache_prefix=None, attachments=None):
+        """
+        Inicializa a inferência simultânea de um mesmo prompt em vários modelos.
+
+        Args:
+            prompt (str): Texto do prompt enviado a todos os modelos
+            model_names (list): Nomes dos modelos no catálogo (ex: ['nova_pro', 'claude_haiku'])
+            file_path (str): Caminho do arquivo do lote enviado junto ao prompt (opcional)
+            timeout (float): Tempo máximo, em segundos, de espera por cada modelo (padrão: 120)
+            timeouts (dict): Timeouts específicos por modelo, sobrescrevendo o padrão (opcional)
+            file_content (str): Conteúdo do lote já em memória, usado no lugar de file_path (opcional)
+            file_name (str): Nome do lote associado a file_content (opcional)
+            use_cache (bool): Consulta o cache de respostas antes de invocar cada modelo (padrão: True)
+            prompt_cache (bool): Envia checkpoints de cache de prompt do Bedrock (padrão: False)
+            cache_prefix (str): Parte estática inicial do prompt, com checkpoint próprio (opcional)
+            attachments (list): Anexos adicionais já lidos por fetch_attachments, compartilhados
+                pelos modelos sem novos downloads (opcional)
+        """
+        self.prompt = prompt
+        self.file_path = file_path
+        self.file_content = file_content
+        self.file_name = file_name
+        self.timeout = timeout
+        self.timeouts = timeouts or {}
+        self.use_cache = use_cache
+        self.prompt_cache = prompt_cache
+        self.cache_prefix = cache_prefix
+        self.attachments = attachments
+
+        # Remove nomes repetidos, preservando a ordem, e valida os modelos
+        self.model_names = list(dict.fromkeys(model_names))
+        for model_name in self.model_names:
+            get_model_class(model_name)
+
+    def _invoke(self, model_name):
+        """
+        Monta a requisição e invoca um único modelo.
+
+        Args:
+            model_name (str): Nome do modelo no catálogo
+
+        Returns:
+            dict: Texto gerado, latência e uso de tokens do modelo
+        """
+        model = get_model_class(model_name)(self.prompt, self.file_path,
+                                            file_content=self.file_content, file_name=self.file_name,
+                                            prompt_cache=self.prompt_cache, cache_prefix=self.cache_prefix,
+                                            attachments=self.attachments)
+
+        inference_service = BedrockInferenceService(model.get_model_id(), model.get_request_body_bytes(),
+                                                    use_cache=self.use_cache,
+                                                    estimated_tokens=model.estimate_request_tokens())
+        response_text = inference_service.invoke_model()
+
+        # Alimenta as latências observadas usadas pelo roteador de modelos
+        if not inference_service.cache_hit:
+            get_model_router().record_latency(model_name, inference_service.latency)
+
+        return {
+            'model_id': model.get_model_id(),
+            'status': 'success',
+            'text': response_text,
+            'latency': inference_service.latency,
+            'usage': inference_service.usage,
+            'cache_hit': inference_service.cache_hit,
+        }
+
+    def run(self):
+        """
+        Envia o prompt a todos os modelos simultaneamente e coleta os resultados.
+
+        Cada modelo possui seu próprio prazo, contado a partir do início do disparo;
+        um modelo lento é marcado como 'timeout' sem bloquear a coleta dos demais.
+        O tempo total é próximo ao do modelo mais lento, e não à soma dos tempos.
+
+        Returns:
+            dict: Resultado de cada modelo, indexado pelo nome do modelo
+        """
+        data_models = {}
+
+        executor = ThreadPoolExecutor(max_workers=max(1, len(self.model_names)))
+        start_time = time.perf_counter()
+
+        try:
+            futures = {model_name: executor.submit(self._invoke, model_name) for model_name in self.model_names}
+
+            for model_name, future in futures.items():
+                deadline = start_time + self.timeouts.get(model_name, self.timeout)
+
+                try:
+                    data_models[model_name] = future.result(timeout=max(0, deadline - time.perf_counter()))
+
+                except TimeoutError:
+                    future.cancel()
+                    log_error(f'O modelo {model_name} excedeu o tempo limite')
+                    data_models[model_name] = {'status': 'timeout', 'latency': time.perf_counter() - start_time}
+
+                except Exception as e:
+                    log_error(f'Erro na inferência do modelo {model_name}: {e}')
+                    data_models[model_name] = {'status': 'error', 'error': str(e),
+                                               'latency': time.perf_counter() - start_time}
+
+        finally:
+            # Não aguarda threads de modelos que excederam o tempo limite
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        log_debug(f'Inferência em {len(self.model_names)} modelos concluída em '
+                  f'{time.perf_counter() - start_time:.3f}s')
+
+        return data_models
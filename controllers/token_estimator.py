@@ -0,0 +1,257 @@
+import re
+import math
+import string
+
+# Classes de caracteres (em bytes UTF-8) utilizadas pelos estimadores heurísticos
+_LETTERS = string.ascii_letters.encode('ascii')
+_DIGITS = string.digits.encode('ascii')
+_PUNCTUATION = string.punctuation.encode('ascii')
+_NON_ASCII = bytes(range(128, 256))
+_WORD_RUN_RE = re.compile(rb'[A-Za-z]+')
+
+# Nome das características extraídas do texto, na ordem dos coeficientes
+FEATURE_NAMES = ('words', 'letters', 'digits', 'punctuation', 'non_ascii_bytes', 'newlines')
+
+# Estimativa fixa para blocos de imagem (tokens por imagem após o redimensionamento do provedor)
+IMAGE_TOKEN_ESTIMATE = 1_600
+
+
+def extract_features(text):
+    """
+    Extrai as contagens por classe de caractere usadas pelos estimadores.
+
+    As contagens são feitas com bytes.translate/count, que rodam em C, evitando
+    percorrer o texto caractere a caractere em Python.
+
+    Args:
+        text (str): Texto a ser analisado
+
+    Returns:
+        tuple: Contagens na ordem de FEATURE_NAMES
+    """
+    data = text.encode('utf-8')
+    size = len(data)
+
+    return (
+        len(_WORD_RUN_RE.findall(data)),
+        size - len(data.translate(None, _LETTERS)),
+        size - len(data.translate(None, _DIGITS)),
+        size - len(data.translate(None, _PUNCTUATION)),
+        size - len(data.translate(None, _NON_ASCII)),
+        data.count(b'\n'),
+    )
+
+
+class TokenEstimator:
+    """
+    Interface dos estimadores de tokens. Cada família de modelo possui sua própria
+    implementação, pois os tokenizadores diferem entre provedores.
+    """
+    family = 'default'
+
+    def count_tokens(self, text):
+        """
+        Estima o número de tokens de um texto.
+
+        Args:
+            text (str): Texto a ser estimado
+
+        Returns:
+            int: Número estimado de tokens
+        """
+        raise NotImplementedError
+
+
+class WhitespaceTokenEstimator(TokenEstimator):
+    """
+    Estimador antigo: conta palavras separadas por espaços em branco.
+    Subestima JSON denso e superestima prosa; mantido para compatibilidade.
+    """
+    family = 'whitespace'
+
+    def count_tokens(self, text):
+        return len(text.split()) if text and text.strip() else 0
+
+
+class HeuristicTokenEstimator(TokenEstimator):
+    """
+    Estimador por classes de caractere: combina linearmente a quantidade de palavras,
+    letras, dígitos, pontuação, bytes não-ASCII e quebras de linha.
+
+    Os coeficientes aproximam o comportamento de tokenizadores BPE: palavras curtas
+    viram um token, palavras longas são quebradas (peso por letra), números são
+    divididos em grupos de dígitos e cada sinal de pontuação do JSON tende a virar
+    um token próprio. Use calibrate() com contagens reais (ex: usage.input_tokens das
+    respostas do Bedrock) para ajustar os coeficientes de cada família.
+    """
+
+    def __init__(self, family, coefficients):
+        """
+        Args:
+            family (str): Família do modelo (ex: 'anthropic', 'amazon', 'meta')
+            coefficients (dict): Peso de cada característica de FEATURE_NAMES
+        """
+        self.family = family
+        self.coefficients = tuple(coefficients[name] for name in FEATURE_NAMES)
+
+    def count_tokens(self, text):
+        if not text:
+            return 0
+
+        features = extract_features(text)
+        return int(math.ceil(sum(weight * value for weight, value in zip(self.coefficients, features))))
+
+    def calibrate(self, samples, regularization=1e-3):
+        """
+        Ajusta os coeficientes por mínimos quadrados a partir de contagens conhecidas.
+
+        Os coeficientes atuais funcionam como prior (regularização), evitando pesos
+        instáveis para classes de caractere ausentes nas amostras.
+
+        Args:
+            samples (list): Lista de tuplas (texto, tokens_reais)
+            regularization (float): Peso relativo do prior
+
+        Returns:
+            HeuristicTokenEstimator: Novo estimador com os coeficientes ajustados
+        """
+        size = len(FEATURE_NAMES)
+        matrix = [[0.0] * size for _ in range(size)]
+        vector = [0.0] * size
+
+        # Equações normais: (XᵀX + λI) c = Xᵀy + λc₀
+        for text, tokens in samples:
+            features = extract_features(text)
+            for i in range(size):
+                vector[i] += features[i] * tokens
+                for j in range(size):
+                    matrix[i][j] += features[i] * features[j]
+
+        trace = sum(matrix[i][i] for i in range(size)) or 1.0
+        penalty = regularization * trace / size
+        for i in range(size):
+            matrix[i][i] += penalty
+            vector[i] += penalty * self.coefficients[i]
+
+        solution = self._solve(matrix, vector)
+        return HeuristicTokenEstimator(self.family, {
+            name: max(0.0, value) for name, value in zip(FEATURE_NAMES, solution)
+        })
+
+    @staticmethod
+    def _solve(matrix, vector):
+        """
+        Resolve um sistema linear pequeno por eliminação de Gauss com pivotamento parcial.
+        """
+        size = len(vector)
+        rows = [row[:] + [value] for row, value in zip(matrix, vector)]
+
+        for col in range(size):
+            pivot = max(range(col, size), key=lambda r: abs(rows[r][col]))
+            rows[col], rows[pivot] = rows[pivot], rows[col]
+            if abs(rows[col][col]) < 1e-12:
+                continue
+            for r in range(col + 1, size):
+                factor = rows[r][col] / rows[col][col]
+                for c in range(col, size + 1):
+                    rows[r][c] -= factor * rows[col][c]
+
+        solution = [0.0] * size
+        for r in range(size - 1, -1, -1):
+            if abs(rows[r][r]) < 1e-12:
+                continue
+            solution[r] = (rows[r][size] - sum(rows[r][c] * solution[c] for c in range(r + 1, size))) / rows[r][r]
+        return solution
+
+
+class ClaudeTokenEstimator(HeuristicTokenEstimator):
+    """
+    Estimador para os modelos Anthropic Claude. O vocabulário do Claude é menor que
+    o dos tokenizadores mais recentes, gerando mais tokens por caractere.
+    """
+
+    def __init__(self, coefficients=None):
+        super().__init__('anthropic', coefficients or {
+            'words': 0.9, 'letters': 0.065, 'digits': 0.45,
+            'punctuation': 0.6, 'non_ascii_bytes': 0.5, 'newlines': 0.8,
+        })
+
+
+class NovaTokenEstimator(HeuristicTokenEstimator):
+    """
+    Estimador para os modelos Amazon Nova.
+    """
+
+    def __init__(self, coefficients=None):
+        super().__init__('amazon', coefficients or {
+            'words': 0.85, 'letters': 0.06, 'digits': 0.4,
+            'punctuation': 0.55, 'non_ascii_bytes': 0.45, 'newlines': 0.7,
+        })
+
+
+class LlamaTokenEstimator(HeuristicTokenEstimator):
+    """
+    Estimador para os modelos Meta Llama 3, cujo tokenizador (vocabulário de 128k)
+    agrupa dígitos de três em três e compacta melhor o texto em inglês.
+    """
+
+    def __init__(self, coefficients=None):
+        super().__init__('meta', coefficients or {
+            'words': 0.8, 'letters': 0.055, 'digits': 0.34,
+            'punctuation': 0.5, 'non_ascii_bytes': 0.4, 'newlines': 0.6,
+        })
+
+
+# Estimadores disponíveis por família de modelo (sem estado, compartilhados pelo processo)
+TOKEN_ESTIMATORS = {
+    'anthropic': ClaudeTokenEstimator(),
+    'amazon': NovaTokenEstimator(),
+    'meta': LlamaTokenEstimator(),
+    'whitespace': WhitespaceTokenEstimator(),
+}
+
+# Família usada quando o modelo é desconhecido (Claude é o mais conservador)
+DEFAULT_ESTIMATOR_FAMILY = 'anthropic'
+
+
+def get_token_estimator(model_family=None):
+    """
+    Retorna o estimador de tokens da família do modelo.
+
+    Args:
+        model_family (str): Família do modelo ('anthropic', 'amazon', 'meta', 'whitespace')
+
+    Returns:
+        TokenEstimator: Estimador da família ou o estimador padrão
+    """
+    return TOKEN_ESTIMATORS.get(model_family) or TOKEN_ESTIMATORS[DEFAULT_ESTIMATOR_FAMILY]
+
+
+def register_token_estimator(estimator):
+    """
+    Registra (ou substitui) o estimador de uma família, ex: após calibrate().
+
+    Args:
+        estimator (TokenEstimator): Estimador a ser registrado
+    """
+    TOKEN_ESTIMATORS[estimator.family] = estimator
+
+
+def estimate_content_tokens(content, estimator):
+    """
+    Estima os tokens de uma lista de blocos de conteúdo de uma mensagem.
+
+    Args:
+        content (list): Blocos de conteúdo (texto ou imagem) no formato das classes de modelo
+        estimator (TokenEstimator): Estimador da família do modelo
+
+    Returns:
+        int: Número estimado de tokens de entrada
+    """
+    tokens = 0
+    for block in content:
+        if 'text' in block:
+            tokens += estimator.count_tokens(block['text'])
+        elif 'image' in block or block.get('type') == 'image':
+            tokens += IMAGE_TOKEN_ESTIMATE
+    return tokens
@@ -1,61 +1,144 @@
 import os
-import pandas as pd
 import json
 
+# Importar o construtor de lotes em memória e os estimadores de tokens
+from controllers.batch_builder import BatchBuilder
+from controllers.token_estimator import get_token_estimator
+
+# Importar a leitura de arquivos locais e de objetos do S3 como stream
+from services.s3_stream import open_text
+from utils.instrumentation import log_debug, log_warning
+
 class TokenManager:
 
-    def __init__(self, context_path, prompt, max_tokens=60_000):
+    def __init__(self, context_path, prompt, max_tokens=60_000, preload=True, streaming=True, write_batches=False,
+                 estimator=None, safety_margin=0.05, prompt_tokens=None, s3_client=None):
         """
         Inicializa o TokenManager com caminho do arquivo, prompt e limite de tokens.
         
         Args:
-            context_path (str): Caminho do arquivo CSV, JSON ou JSONL
+            context_path (str): Caminho do arquivo CSV, JSON ou JSONL, local ou no S3
+                ('s3://bucket/chave', lido como stream por intervalos, sem download prévio)
             prompt (str): Texto do prompt fixo
             max_total_tokens (int): Limite máximo de tokens (padrão: 60,000)
+            preload (bool): Calcula o lote inicial na criação; use False para percorrer
+                todos os lotes com iter_batches() sem carregar o arquivo inteiro
+            streaming (bool): Lê o arquivo linha a linha, com memória limitada ao tamanho
+                do lote; use False para o modo antigo, que carrega o arquivo inteiro
+            write_batches (bool): Salva os lotes em './tmp/' (apenas para depuração); no
+                modo streaming os lotes são entregues aos modelos diretamente da memória
+            estimator (TokenEstimator): Estimador de tokens da família do modelo
+                (padrão: estimador do Claude, o mais conservador)
+            safety_margin (float): Fração de max_tokens reservada para erros de estimativa (padrão: 5%)
+            prompt_tokens (int): Tokens do prompt já calculados (ex: por um template compilado);
+                quando omitido, o prompt é contado uma única vez com o estimador
+            s3_client: Cliente do S3 usado para URIs 's3://' (padrão: cliente compartilhado do processo)
         """
         self.context_path = context_path
         self.prompt = prompt
         self.max_total_tokens = max_tokens
+        self.streaming = streaming
+        self.write_batches = write_batches
+        self.estimator = estimator or get_token_estimator()
+        self._prompt_tokens = prompt_tokens
+        self.s3_client = s3_client
+
+        # Margem de segurança reservada no limite de tokens de cada lote
+        self.reserved_tokens = int(max_tokens * safety_margin)
+        self.batch = None
+        self.batch_path = None
         
         # Se não houver context_path, apenas calcula tokens do prompt
         if not context_path:
-            self.prompt_tokens = self.count_tokens(prompt)
+            self.prompt_tokens = self.get_prompt_tokens()
             self.context_data = ""
             self.lines_to_process = 0
             self.remaining_lines = 0
+            self.has_more = False
             self.current_tokens = self.prompt_tokens
-            self.batch_path = None
             self.batch_tokens = 0
             return
         
         self.file_type = self._detect_file_type(context_path)
 
-        # Criar diretório de saída se não existir
+        # Criar diretório de saída se não existir (o modo antigo sempre passa pelo disco)
         self.output_dir = './tmp/'
-        os.makedirs(self.output_dir, exist_ok=True)
+        if write_batches or not streaming:
+            os.makedirs(self.output_dir, exist_ok=True)
 
         # Carrega e processa os dados iniciais
-        self.load_initial_data()
+        if preload:
+            self.load_initial_data()
 
     def load_initial_data(self):
         """
         Carrega os dados iniciais e calcula o primeiro lote de processamento
         """
+        if self.streaming:
+            return self.load_initial_data_streaming()
+
         self.context_data = self.read_file_content()
-        prompt_tokens = self.count_tokens(self.prompt)
+        prompt_tokens = self.get_prompt_tokens()
 
         # Calcula o lote inicial
         self.lines_to_process, self.remaining_lines, self.current_tokens = (
             self.calculate_batch_size(self.context_data, prompt_tokens)
         )
+        self.has_more = self.remaining_lines > 0
 
         # Prepara o primeiro lote de dados
         self.prepare_initial_batch(self.context_path, self.lines_to_process)
 
         # Imprime informações de depuração
-        print(f"[DEBUG] Tokens do prompt: {prompt_tokens}")
-        print(f"[DEBUG] Tokens do bacth: {self.batch_tokens}")
-        print(f"[DEBUG] Tokens da soma do prompt + batch: {prompt_tokens + self.batch_tokens}")
+        log_debug(f"Tokens do prompt: {prompt_tokens}")
+        log_debug(f"Tokens do bacth: {self.batch_tokens}")
+        log_debug(f"Tokens da soma do prompt + batch: {prompt_tokens + self.batch_tokens}")
+
+    def load_initial_data_streaming(self):
+        """
+        Calcula e prepara o primeiro lote lendo o arquivo registro a registro.
+
+        A leitura termina no primeiro registro que não cabe no lote: has_more indica se
+        há dados além do primeiro lote, e as linhas restantes não são contadas
+        (remaining_lines é None neste modo). O lote é lido e tokenizado uma única vez e
+        fica disponível em memória via get_batch_content().
+        """
+        prompt_tokens = self.get_prompt_tokens()
+        budget = self.max_total_tokens - self.reserved_tokens - prompt_tokens
+
+        # O conteúdo completo não é mantido em memória neste modo
+        self.context_data = None
+
+        header, records = self._iter_records()
+        builder = BatchBuilder(self.file_type, header, self.count_tokens(header) if header else 0)
+        self.has_more = False
+
+        for record in records:
+            record_tokens = self.count_tokens(record)
+            if len(builder) and not builder.fits(record_tokens, budget):
+                self.has_more = True
+                break
+
+            builder.add(record, record_tokens)
+
+        # Fecha o arquivo (ou o stream do S3) sem ler os registros seguintes
+        records.close()
+
+        self.lines_to_process = len(builder)
+        self.remaining_lines = None
+        self.current_tokens = prompt_tokens + self.reserved_tokens + builder.tokens
+
+        # Monta o primeiro lote em memória, com o mesmo nome utilizado pelo modo antigo
+        self.batch = builder.build(0, 0, prompt_tokens, file_name=f'batch_inicial.{self.file_type}')
+        self.batch_tokens = self.batch['tokens']
+
+        if self.write_batches:
+            self.batch_path = BatchBuilder.write(self.batch, self.output_dir)
+
+        # Imprime informações de depuração
+        log_debug(f"Tokens do prompt: {prompt_tokens}")
+        log_debug(f"Tokens do bacth: {self.batch_tokens}")
+        log_debug(f"Linhas processadas: {self.lines_to_process}, há mais dados: {self.has_more}")
 
     def _detect_file_type(self, file_path):
         """
@@ -91,7 +174,7 @@ class TokenManager:
         file_path = file_path or self.context_path
         
         # Abrindo o arquivo e lendo seu conteúdo
-        with open(file_path, 'r', encoding='utf-8') as file:
+        with open_text(file_path, s3_client=self.s3_client) as file:
             return file.read()
 
     def read_csv_content(self, csv_file_path=None):
@@ -107,15 +190,25 @@ class TokenManager:
         """
         return self.read_file_content(csv_file_path)
 
-    @staticmethod
-    def count_tokens(text):
+    def count_tokens(self, text):
         """
-        Conta tokens usando divisão por espaços em branco.
+        Estima os tokens do texto com o estimador da família do modelo.
 
         Returns:
             int: Número de tokens no texto
         """
-        return len(text.split()) if text.strip() else 0
+        return self.estimator.count_tokens(text)
+
+    def get_prompt_tokens(self):
+        """
+        Retorna os tokens do prompt, contados no máximo uma vez por instância.
+
+        Returns:
+            int: Número de tokens do prompt
+        """
+        if self._prompt_tokens is None:
+            self._prompt_tokens = self.count_tokens(self.prompt)
+        return self._prompt_tokens
 
     def calculate_batch_size(self, file_content, prompt_tokens, buffer_lines=5):
         """
@@ -141,7 +234,7 @@ class TokenManager:
         Calcula quantas linhas podem ser processadas dentro do limite de tokens para CSV.
         """
         lines = csv_content.split('\n')
-        current_tokens = prompt_tokens * 1.5
+        current_tokens = prompt_tokens + self.reserved_tokens
         processed_lines = 0
 
         # Processa as linhas até atingir o limite de tokens
@@ -170,7 +263,7 @@ class TokenManager:
             
             # Se for uma lista, processa cada item
             if isinstance(data, list):
-                current_tokens = prompt_tokens * 1.5
+                current_tokens = prompt_tokens + self.reserved_tokens
                 processed_items = 0
                 
                 for item in data:
@@ -188,11 +281,11 @@ class TokenManager:
             
             # Se for um objeto único, retorna tudo ou nada
             else:
-                total_tokens = prompt_tokens * 1.5 + self.count_tokens(json_content)
+                total_tokens = prompt_tokens + self.reserved_tokens + self.count_tokens(json_content)
                 if total_tokens <= self.max_total_tokens:
                     return 1, 0, total_tokens
                 else:
-                    return 0, 1, prompt_tokens * 1.5
+                    return 0, 1, prompt_tokens + self.reserved_tokens
                     
         except json.JSONDecodeError:
             raise ValueError("Arquivo JSON inválido")
@@ -202,7 +295,7 @@ class TokenManager:
         Calcula quantas linhas podem ser processadas dentro do limite de tokens para JSONL.
         """
         lines = jsonl_content.strip().split('\n')
-        current_tokens = prompt_tokens * 1.5
+        current_tokens = prompt_tokens + self.reserved_tokens
         processed_lines = 0
         
         for line in lines:
@@ -237,13 +330,16 @@ class TokenManager:
             lines_to_process (int): Número de linhas/itens a serem processados
         """
         if self.file_type == 'csv':
-            dataframe_batch = pd.read_csv(context_path, nrows=lines_to_process)
+            # O pandas só é importado quando o caminho CSV é utilizado (reduz o cold start)
+            import pandas as pd
+            with open_text(context_path, newline='', s3_client=self.s3_client) as file:
+                dataframe_batch = pd.read_csv(file, nrows=lines_to_process)
             self.save_batch_to_csv(dataframe_batch, 'batch_inicial.csv')
         elif self.file_type == 'jsonl':
             batch_data = self._read_jsonl_lines(context_path, lines_to_process)
             self.save_batch_to_jsonl(batch_data, 'batch_inicial.jsonl')
         else:  # JSON
-            with open(context_path, 'r', encoding='utf-8') as file:
+            with open_text(context_path, s3_client=self.s3_client) as file:
                 data = json.load(file)
             
             if isinstance(data, list):
@@ -269,7 +365,7 @@ class TokenManager:
 
         # Salva o lote em um arquivo CSV
         dataframe.to_csv(output_path, index=False)
-        print(f"[DEBUG] Batch armazenado em: {output_path}")
+        log_debug(f"Batch armazenado em: {output_path}")
 
         # Armazena o caminho do arquivo
         self.batch_path = output_path
@@ -295,7 +391,7 @@ class TokenManager:
         with open(output_path, 'w', encoding='utf-8') as file:
             json.dump(data, file, ensure_ascii=False, indent=2)
         
-        print(f"[DEBUG] Batch armazenado em: {output_path}")
+        log_debug(f"Batch armazenado em: {output_path}")
 
         # Armazena o caminho do arquivo
         self.batch_path = output_path
@@ -323,7 +419,7 @@ class TokenManager:
                 json.dump(item, file, ensure_ascii=False)
                 file.write('\n')
         
-        print(f"[DEBUG] Batch armazenado em: {output_path}")
+        log_debug(f"Batch armazenado em: {output_path}")
 
         # Armazena o caminho do arquivo
         self.batch_path = output_path
@@ -345,7 +441,7 @@ class TokenManager:
         data = []
         lines_read = 0
         
-        with open(file_path, 'r', encoding='utf-8') as file:
+        with open_text(file_path, s3_client=self.s3_client) as file:
             for line in file:
                 if lines_read >= num_lines:
                     break
@@ -364,6 +460,158 @@ class TokenManager:
         
         return data
     
+    def iter_batches(self, write_files=None):
+        """
+        Percorre todo o arquivo de contexto gerando lotes sucessivos limitados por tokens.
+
+        Para CSV e JSONL o arquivo é lido linha a linha, mantendo em memória apenas o
+        lote corrente. Para JSON o documento precisa ser decodificado por completo, pois
+        a biblioteca padrão não possui um parser incremental.
+
+        Args:
+            write_files (bool): Salva cada lote em './tmp/' para depuração (padrão: write_batches)
+
+        Yields:
+            dict: Lote com índice, intervalo de linhas [start_row, end_row), tokens, conteúdo e
+                has_more (há registros após o lote, sem precisar ler o próximo lote)
+        """
+        if not self.context_path:
+            return
+
+        write_files = self.write_batches if write_files is None else write_files
+
+        prompt_tokens = self.get_prompt_tokens()
+        budget = self.max_total_tokens - self.reserved_tokens - prompt_tokens
+
+        # Cabeçalho do CSV é repetido em todos os lotes
+        header, records = self._iter_records()
+        builder = BatchBuilder(self.file_type, header, self.count_tokens(header) if header else 0)
+
+        batch_index = 0
+        start_row = 0
+
+        for record in records:
+            record_tokens = self.count_tokens(record)
+
+            # Fecha o lote atual caso o próximo registro exceda o limite de tokens
+            if len(builder) and not builder.fits(record_tokens, budget):
+                yield self._finish_batch(builder, batch_index, start_row, prompt_tokens, write_files, True)
+                batch_index += 1
+                start_row += len(builder)
+                builder.reset()
+
+            # Um único registro maior que o limite é enviado sozinho em seu próprio lote; o aviso
+            # informa o índice do próprio registro no arquivo, e não o início do lote
+            if not builder.fits(record_tokens, budget):
+                row = start_row + len(builder)
+                log_warning(f"Registro {row} excede o limite de tokens ({record_tokens} tokens)")
+
+            builder.add(record, record_tokens)
+
+        if len(builder):
+            yield self._finish_batch(builder, batch_index, start_row, prompt_tokens, write_files, False)
+
+    def _finish_batch(self, builder, batch_index, start_row, prompt_tokens, write_file, has_more):
+        """
+        Monta o lote acumulado no construtor e, opcionalmente, o salva em disco.
+
+        Returns:
+            dict: Informações e conteúdo do lote
+        """
+        batch = builder.build(batch_index, start_row, prompt_tokens)
+        batch['has_more'] = has_more
+
+        if write_file:
+            BatchBuilder.write(batch, self.output_dir)
+
+        log_debug(f"Lote {batch_index}: linhas {batch['start_row']}-{batch['end_row']}, tokens {batch['tokens']}")
+
+        return batch
+
+    def _iter_records(self):
+        """
+        Obtém o cabeçalho (apenas CSV) e um gerador de registros do arquivo de contexto.
+
+        Returns:
+            tuple: (cabeçalho ou None, gerador com o texto de cada registro)
+        """
+        if self.file_type == 'csv':
+            file = open_text(self.context_path, newline='', s3_client=self.s3_client)
+            header = self._read_csv_record(file)
+            return header, self._iter_csv_records(file)
+        elif self.file_type == 'jsonl':
+            return None, self._iter_jsonl_records()
+        else:
+            return None, self._iter_json_records()
+
+    @staticmethod
+    def _read_csv_record(file):
+        """
+        Lê um registro CSV completo, que pode ocupar várias linhas físicas quando
+        um campo entre aspas contém quebras de linha.
+
+        Returns:
+            str: Texto do registro (incluindo a quebra de linha) ou string vazia no fim do arquivo
+        """
+        record = file.readline()
+
+        # Um número ímpar de aspas indica um campo entre aspas ainda aberto
+        while record.count('"') % 2 == 1:
+            line = file.readline()
+            if not line:
+                break
+            record += line
+
+        return record
+
+    def _iter_csv_records(self, file):
+        """
+        Gera os registros de dados de um CSV já posicionado após o cabeçalho.
+        """
+        with file:
+            while True:
+                record = self._read_csv_record(file)
+                if not record:
+                    break
+                if not record.strip():
+                    continue
+                if not record.endswith('\n'):
+                    record += '\n'
+                yield record
+
+    def _iter_jsonl_records(self):
+        """
+        Gera as linhas válidas de um arquivo JSONL.
+        """
+        with open_text(self.context_path, s3_client=self.s3_client) as file:
+            for line in file:
+                line = line.strip()
+                if not line:  # Pula linhas vazias
+                    continue
+
+                try:
+                    # Valida se a linha é um JSON válido
+                    json.loads(line)
+                except json.JSONDecodeError:
+                    # Se a linha não for JSON válido, pula
+                    continue
+
+                yield line
+
+    def _iter_json_records(self):
+        """
+        Gera os itens de um arquivo JSON (lista) ou o objeto único como um registro.
+        """
+        with open_text(self.context_path, s3_client=self.s3_client) as file:
+            try:
+                data = json.load(file)
+            except json.JSONDecodeError:
+                raise ValueError("Arquivo JSON inválido")
+
+        items = data if isinstance(data, list) else [data]
+        for item in items:
+            yield json.dumps(item, ensure_ascii=False)
+
     def get_batch_path(self):
         """
         Retorna o caminho do arquivo do lote.
@@ -372,6 +620,43 @@ class TokenManager:
             str: Caminho do arquivo do lote
         """
         return self.batch_path
+
+    def get_batch(self):
+        """
+        Retorna o lote inicial montado em memória (modo streaming).
+
+        Returns:
+            dict: Lote com conteúdo, nome e tokens, ou None caso não haja lote em memória
+        """
+        return self.batch
+
+    def get_batch_content(self):
+        """
+        Retorna o conteúdo do lote inicial, sem nova leitura do disco no modo streaming.
+
+        Returns:
+            str: Conteúdo do lote ou None caso não haja lote
+        """
+        if self.batch is not None:
+            return self.batch['content']
+
+        # Modo antigo: o lote só existe no arquivo salvo em './tmp/'
+        if self.batch_path:
+            return self.read_file_content(self.batch_path)
+
+        return None
+
+    def get_batch_file_name(self):
+        """
+        Retorna o nome do lote inicial apresentado ao modelo.
+
+        Returns:
+            str: Nome do lote (ex: 'batch_inicial.jsonl') ou None caso não haja lote
+        """
+        if self.batch is not None:
+            return self.batch['file_name']
+
+        return os.path.basename(self.batch_path) if self.batch_path else None
     
     def get_file_type(self):
         """
@@ -409,6 +694,44 @@ class TokenManager:
         """
         return self.file_type == 'jsonl'
     
+    @staticmethod
+    def _count_rows_streaming(file_path, file_type, s3_client=None):
+        """
+        Conta as linhas de um CSV ou as linhas válidas de um JSONL lendo o arquivo linha a linha.
+        Mantém a mesma contagem do modo antigo, que dividia o conteúdo por '\n'.
+
+        Args:
+            file_path (str): Caminho do arquivo
+            file_type (str): 'csv' ou 'jsonl'
+
+        Returns:
+            int: Número de linhas no arquivo
+        """
+        rows = 0
+        newlines = 0
+        has_content = False
+
+        with open_text(file_path, s3_client=s3_client) as file:
+            for line in file:
+                if file_type == 'jsonl':
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        json.loads(line)
+                        rows += 1
+                    except json.JSONDecodeError:
+                        continue
+                else:
+                    newlines += line.count('\n')
+                    has_content = has_content or bool(line.strip())
+
+        if file_type == 'jsonl':
+            return rows
+
+        # O split('\n') do modo antigo retorna uma linha a mais que o número de quebras
+        return newlines + 1 if has_content else 0
+
     def get_number_of_rows(self, file_path=None, string_content=None):
         """
         Retorna o número de linhas em um arquivo CSV, itens em um JSON ou linhas em um JSONL.
@@ -423,10 +746,6 @@ class TokenManager:
 
         # Se o caminho do arquivo não for fornecido, usa o caminho do lote
         if file_path is not None:
-            # Lê o conteúdo do arquivo
-            with open(file_path, 'r', encoding='utf-8') as file:
-                content = file.read()
-                
             # Detecta o tipo de arquivo
             _, ext = os.path.splitext(file_path.lower())
             if ext == '.json':
@@ -435,6 +754,14 @@ class TokenManager:
                 file_type = 'jsonl'
             else:
                 file_type = 'csv'
+
+            # No modo streaming, CSV e JSONL são contados linha a linha, sem carregar o arquivo
+            if self.streaming and file_type != 'json':
+                return self._count_rows_streaming(file_path, file_type, self.s3_client)
+
+            # Lê o conteúdo do arquivo
+            with open_text(file_path, s3_client=self.s3_client) as file:
+                content = file.read()
         else:
             content = string_content
             # Tenta detectar se é JSON ou JSONL pelo conteúdo
@@ -1,64 +1,387 @@
-import os
 import json
-from dotenv import load_dotenv
+import time
+import uuid
+from utils.environment import get_env
+from utils.instrumentation import (emit_metrics, get_stage_metrics, log_debug, log_error, log_info, stage_timer,
+                                   timed_iter)
 
 # Importar as classes de serviços necessárias para a Lambda Function
 from services.bedrock_services import BedrockInferenceService
+from services.response_cache import get_response_cache
+from services.results_sink import DEFAULT_RESULTS_FLUSH_TIMEOUT, get_results_sink
+from services.idempotency import build_idempotency_key, idempotent
 
 # Importar as classes de modelos necessárias para a Lambda Function
-from models.amazon_nova_pro import AmazonNovaPro
-from models.anthropic_claude_haiku import AnthropicClaudeHaiku
-from models.anthropic_claude_sonnet import AnthropicClaudeSonnet
+from models.model_catalog import DEFAULT_MODEL_NAME, get_model_class
+from models.prompt_cache import is_prompt_caching_enabled
 
 # Importar as classes de templates necessárias para a Lambda Function
 from templates.prompt_template import PromptTemplate 
 
 # Importar as classes do controlodar necessárias para a Lambda Function
 from controllers.token_manager import TokenManager
+from controllers.token_estimator import get_token_estimator
+from controllers.multi_model_inference import MultiModelInference
+from controllers.model_router import get_model_router
+from controllers.batch_inference_job import JOB_SUCCESS_STATUSES, BatchInferenceJob
+from controllers.map_reduce_summarizer import MapReduceSummarizer
+from controllers.attachment_loader import fetch_attachments
+from controllers.batch_executor import DEFAULT_BATCH_MAX_WORKERS, BatchExecutor
 
-load_dotenv()
+# ============================================================================
+# Função que indica se os lotes devem ser salvos em disco para depuração
+# ----------------------------------------------------------------------------
+def is_batch_debug_enabled():
+    """
+    Verifica a variável de ambiente WRITE_BATCH_FILES.
+
+    Returns:
+        bool: True se os lotes devem ser salvos em './tmp/'
+    """
+    return (get_env('WRITE_BATCH_FILES') or '').lower() in ('1', 'true', 'yes')
+
+# ============================================================================
+# Função que realiza a inferência sobre todos os lotes do arquivo de contexto
+# ----------------------------------------------------------------------------
+def process_all_batches(event, prompt, context_path, results_sink=None, request_id=None):
+    """
+    Percorre todos os lotes do arquivo de contexto e realiza a inferência de cada um.
+
+    Os lotes são enviados ao Bedrock simultaneamente, até 'max_concurrency' (ou
+    BATCH_MAX_WORKERS) lotes em andamento; a leitura do arquivo avança apenas quando
+    um lote termina, limitando os lotes e corpos de requisição mantidos em memória.
+
+    Args:
+        event (dict): Evento recebido pela Lambda (campos opcionais 'model', 'use_cache' e 'max_concurrency')
+        prompt (PromptTemplate): Prompt gerado a partir do template compilado
+        context_path (str): Caminho do arquivo CSV, JSON ou JSONL
+        results_sink (ResultsSink): Gravador dos resultados (opcional); cada lote é enfileirado
+            assim que concluído e gravado em segundo plano durante a inferência dos lotes seguintes
+        request_id (str): ID da invocação usado na chave dos resultados gravados
+
+    Returns:
+        list: Resultado da inferência de cada lote, na ordem do arquivo; os lotes com falha
+            têm 'status' igual a 'error' e a mensagem em 'error', sem interromper os demais
+    """
+    model_class = get_model_class(event.get('model') or DEFAULT_MODEL_NAME)
+    estimator = get_token_estimator(model_class.model_family)
+    prompt_text = prompt.get_prompt_text()
+    prompt_cache = is_prompt_caching_enabled(event)
+    with stage_timer('token_budgeting'):
+        prompt_tokens = prompt.get_prompt_tokens(estimator)
+    token_manager = TokenManager(context_path=context_path, prompt=prompt_text, preload=False,
+                                 write_batches=is_batch_debug_enabled(), estimator=estimator,
+                                 prompt_tokens=prompt_tokens)
+
+    def infer(batch):
+        # Executada em uma thread do pool: o corpo da requisição existe apenas durante a inferência
+        model = model_class(prompt_text, file_content=batch['content'], file_name=batch['file_name'],
+                            prompt_cache=prompt_cache, cache_prefix=prompt.get_static_prefix())
+        inference_service = BedrockInferenceService(
+            model.get_model_id(), model.get_request_body_bytes(), use_cache=event.get('use_cache', True),
+            estimated_tokens=token_manager.get_prompt_tokens() + batch['tokens'] + model.max_tokens,
+        )
+
+        return {
+            'model_id': model.get_model_id(),
+            'status': 'success',
+            'text': inference_service.invoke_model(),
+            'latency': inference_service.latency,
+            'usage': inference_service.usage,
+            'cache_hit': inference_service.cache_hit,
+        }
+
+    # Intervalo de linhas e tokens de cada lote, mantidos sem o conteúdo para compor os resultados
+    batch_ranges = {}
+
+    def batches():
+        for batch in timed_iter(token_manager.iter_batches(), 'batch_build'):
+            batch_ranges[batch['batch_index']] = {name: batch[name]
+                                                  for name in ('batch_index', 'start_row', 'end_row', 'tokens')}
+            yield batch
+
+    executor = BatchExecutor(int(event.get('max_concurrency') or get_env('BATCH_MAX_WORKERS',
+                                                                         DEFAULT_BATCH_MAX_WORKERS)))
+    results = []
+    for outcome in executor.map(infer, batches()):
+        result = {**batch_ranges.pop(outcome['index']),
+                  **(outcome['result'] if outcome['status'] == 'success'
+                     else {'status': 'error', 'error': outcome['error']})}
+        results.append(result)
+
+        if results_sink is not None:
+            results_sink.put(request_id, f"batch_{result['batch_index']}", result,
+                             metadata={'context_path': context_path})
+
+    failures = sum(1 for result in results if result['status'] == 'error')
+    log_info(f'{len(results)} lotes processados ({failures} com falha)')
+    return results
+
+# ============================================================================
+# Função que realiza a inferência sobre o lote inicial do arquivo de contexto
+# ----------------------------------------------------------------------------
+def process_initial_batch(event, prompt, context_path):
+    """
+    Realiza a inferência do lote inicial em um único modelo, escolhido pelo roteador
+    (ou informado no evento), ou, no modo multi-modelo, em vários modelos simultaneamente.
+
+    Args:
+        event (dict): Evento recebido pela Lambda (campos opcionais 'model', 'models', 'model_timeout',
+            'latency_budget', 'quality', 'stream', 'use_cache', 'prompt_cache' e 'attachments')
+        prompt (PromptTemplate): Prompt gerado a partir do template compilado
+        context_path (str): Caminho do arquivo CSV, JSON ou JSONL (opcional)
+
+    Returns:
+        dict: Resultado da inferência de cada modelo, indexado pelo nome do modelo
+    """
+    # 1 - Modo multi-modelo: envia o mesmo prompt e lote a vários modelos simultaneamente
+    model_names = event.get('models') or [name.strip() for name in (get_env('FAN_OUT_MODELS') or '').split(',') if name.strip()]
+
+    # 2 - Instancia a classe TokenManager, que monta o lote inicial em memória; sem um modelo
+    # definido no evento, usa o estimador padrão (o mais conservador)
+    requested_model = None if model_names else event.get('model')
+    estimator = get_token_estimator(get_model_class(requested_model).model_family if requested_model else None)
+    prompt_text = prompt.get_prompt_text()
+    prompt_cache = is_prompt_caching_enabled(event)
+    with stage_timer('token_budgeting'):
+        prompt_tokens = prompt.get_prompt_tokens(estimator)
+    with stage_timer('batch_build'):
+        token_manager = TokenManager(context_path=context_path, prompt=prompt_text,
+                                     write_batches=is_batch_debug_enabled(), estimator=estimator,
+                                     prompt_tokens=prompt_tokens)
+        batch_content = token_manager.get_batch_content()
+        batch_file_name = token_manager.get_batch_file_name()
+
+    # Anexos adicionais (arquivos e URLs, ex: imagens do jogador): baixados uma única vez,
+    # em paralelo, e preparados por cada modelo com os limites da sua família
+    attachments = fetch_attachments(event.get('attachments') or [])
+
+    if model_names:
+        model_timeout = float(event.get('model_timeout') or get_env('MODEL_TIMEOUT_SECONDS', 120))
+        return MultiModelInference(prompt_text, model_names, timeout=model_timeout,
+                                   file_content=batch_content, file_name=batch_file_name,
+                                   use_cache=event.get('use_cache', True), prompt_cache=prompt_cache,
+                                   cache_prefix=prompt.get_static_prefix(), attachments=attachments).run()
+
+    # 3 - Escolhe o modelo: o informado no evento ou o indicado pelo roteador, de acordo com
+    # o tamanho da entrada, o orçamento de latência e a latência observada de cada modelo
+    router = get_model_router()
+    routing = None
+    model_options = {}
+    if requested_model:
+        model_name = requested_model
+    elif get_env('MODEL_ROUTER_ENABLED', 'true').lower() != 'true':
+        model_name = DEFAULT_MODEL_NAME
+    else:
+        latency_budget = event.get('latency_budget')
+        routing = router.select(token_manager.get_prompt_tokens() + token_manager.batch_tokens,
+                                latency_budget=float(latency_budget) if latency_budget else None,
+                                quality=event.get('quality'))
+        model_name = routing['model_name']
+        # Limite de saída do perfil do modelo escolhido (o mesmo padrão das classes dos modelos,
+        # usado nos demais caminhos: modelo explícito, fan-out, todos os lotes, map-reduce e job em lote)
+        model_options['max_tokens'] = routing['max_output_tokens']
+
+    # 4 - Instancia o modelo escolhido, e obtém o ID do modelo e o corpo da requisição
+    model = get_model_class(model_name)(prompt_text, file_content=batch_content, file_name=batch_file_name,
+                                        prompt_cache=prompt_cache, cache_prefix=prompt.get_static_prefix(),
+                                        attachments=attachments, **model_options)
+    input_tokens = model.estimate_input_tokens()
+    log_debug(f'Tokens estimados da requisição para {model_name}: {input_tokens}')
 
-# Obtém o nome do bucket do S3 do arquivo .env
-S3_BUCKET_NAME = os.getenv('S3_BUCKET_NAME')
+    # O corpo é serializado uma única vez, direto em bytes, e enviado sem nova conversão
+    model_id = model.get_model_id()
+    request_body = model.get_request_body_bytes()
+    log_debug('Requisição montada', model_id=model_id, body_bytes=len(request_body))
+
+    # 5 - Realiza a inferência do modelo de NLP
+    inference_service = BedrockInferenceService(model_id, request_body, use_cache=event.get('use_cache', True),
+                                                estimated_tokens=input_tokens + model.max_tokens)
+    if event.get('stream', False):
+        # Modo streaming: recebe o texto em trechos e mede o tempo até o primeiro token
+        response_model = inference_service.invoke_model_stream()
+        log_debug(f'Tempo até o primeiro token: {inference_service.time_to_first_token}')
+    else:
+        response_model = inference_service.invoke_model()
+    log_debug('Resultado da inferência', text=response_model, usage=inference_service.usage)
+
+    # Respostas do cache não representam a latência do modelo
+    if not inference_service.cache_hit:
+        router.record_latency(model_name, inference_service.latency)
+
+    return {
+        model_name: {
+            'model_id': model_id,
+            'status': 'success',
+            'text': response_model,
+            'latency': inference_service.latency,
+            'time_to_first_token': inference_service.time_to_first_token,
+            'usage': inference_service.usage,
+            'cache_hit': inference_service.cache_hit,
+            'routing': routing,
+        }
+    }
+
+# ============================================================================
+# Função que gera o relatório de arquivos maiores que a janela de contexto
+# ----------------------------------------------------------------------------
+def process_map_reduce(event, context, context_path):
+    """
+    Gera o relatório com a sumarização hierárquica (map-reduce), cobrindo todas as
+    linhas do arquivo de contexto mesmo quando ele excede a janela do modelo.
+
+    Args:
+        event (dict): Evento recebido pela Lambda (campos opcionais 'model', 'template', 'fan_in',
+            'max_depth', 'use_cache' e 'prompt_cache')
+        context (str): Contexto do jogador usado nos prompts
+        context_path (str): Caminho do arquivo CSV, JSON ou JSONL
+
+    Returns:
+        dict: Relatório final, níveis de combinação, número de chamadas e uso de tokens
+    """
+    summarizer = MapReduceSummarizer(
+        event.get('model') or DEFAULT_MODEL_NAME, context, context_path,
+        fan_in=int(event.get('fan_in') or get_env('MAP_REDUCE_FAN_IN', 4)),
+        max_depth=int(event.get('max_depth') or get_env('MAP_REDUCE_MAX_DEPTH', 4)),
+        max_workers=int(get_env('MAP_REDUCE_MAX_WORKERS', 8)),
+        template_name=event.get('template'),
+        use_cache=event.get('use_cache', True),
+        prompt_cache=is_prompt_caching_enabled(event),
+    )
+    return summarizer.run()
+
+# ============================================================================
+# Função que submete ou coleta um job de inferência em lote (modo offline)
+# ----------------------------------------------------------------------------
+def process_batch_inference_job(job_event, s3_bucket_name):
+    """
+    Submete um job de inferência em lote do Bedrock para vários jogadores ou, quando
+    o evento traz o 'job_arn', consulta o job e agrupa as respostas por jogador.
+
+    Args:
+        job_event (dict): Campos 'players' (submissão) ou 'job_arn' (coleta; o nome e os prefixos
+            do job são lidos do Bedrock), e opcionalmente 'job_name', 'model', 'template',
+            'bucket' e 'role_arn'
+        s3_bucket_name (str): Bucket padrão dos registros e das respostas
+
+    Returns:
+        dict: Informações do job e, quando concluído, os resultados por jogador
+    """
+    job = BatchInferenceJob(
+        job_event.get('model') or DEFAULT_MODEL_NAME,
+        bucket=job_event.get('bucket') or s3_bucket_name,
+        role_arn=job_event.get('role_arn') or get_env('BATCH_INFERENCE_ROLE_ARN'),
+        job_name=job_event.get('job_name'),
+        template_name=job_event.get('template'),
+    )
+
+    # 1 - Coleta: o job foi submetido em uma invocação anterior
+    if job_event.get('job_arn'):
+        status = job.attach(job_event['job_arn'])['status']
+        result = {'job_arn': job_event['job_arn'], 'job_name': job.job_name, 'status': status}
+        if status in JOB_SUCCESS_STATUSES:
+            result['results'] = job.collect_results(job_event['job_arn'])
+        return result
+
+    # 2 - Submissão: grava os registros de todos os jogadores e cria o job
+    job_arn = job.submit(job_event['players'])
+    return {'job_arn': job_arn, 'job_name': job.job_name, 'status': 'Submitted', 'records': len(job.manifest)}
+
+# ============================================================================
+# Função que identifica eventos duplicados (mesmo 'folder'/'output_key' e parâmetros)
+# ----------------------------------------------------------------------------
+def get_idempotency_key(event):
+    """
+    Retorna a chave de idempotência do evento: a informada em 'idempotency_key' ou o
+    hash do evento normalizado.
+
+    Args:
+        event (dict): Evento recebido pela Lambda
+
+    Returns:
+        str: Chave do evento, ou None para processá-lo sem deduplicação
+    """
+    # A coleta de um job de inferência em lote deve sempre consultar o estado atual do job; a
+    # submissão é deduplicada como os demais eventos, para uma retentativa não criar outro job
+    if (event.get('batch_inference') or {}).get('job_arn'):
+        return None
+    return event.get('idempotency_key') or build_idempotency_key(event)
 
 # ============================================================================
 # Função Lambda para inferência de modelos de NLP e armazenamento no DynamoDB
 # ----------------------------------------------------------------------------
+# Reenvios do mesmo evento (retentativas assíncronas da Lambda ou duplicatas da origem)
+# aguardam ou reaproveitam o resultado da primeira invocação; apenas respostas de
+# sucesso são gravadas, e as falhas liberam o evento para uma nova tentativa
+@idempotent(get_idempotency_key, should_store=lambda response: response.get('statusCode') == 200)
 def lambda_handler(event, context):
+    start_time = time.perf_counter()
 
-    # 1 - Imprime o evento recebido
-    print('*********** Start Lambda ***************') 
-    print(f'[DEBUG] Event: {event}') 
+    # 1 - Registra o evento recebido (resumido: campos grandes nunca são convertidos por inteiro em texto)
+    log_info('*********** Start Lambda ***************')
+    log_debug('Evento recebido', event=event)
 
 
     # 2 - Dicionário para armazenar os resultados da inferência
     data_models = {} 
+
+    # Obtém o nome do bucket do S3 do arquivo .env (carregado apenas na primeira invocação)
+    s3_bucket_name = get_env('S3_BUCKET_NAME')
+
+    request_id = getattr(context, 'aws_request_id', None) or event.get('request_id') or uuid.uuid4().hex
+    results_sink = None
+
+    # Modo da invocação, usado como dimensão das métricas
+    mode = 'initial_batch'
     
     try:
+        # Gravador dos resultados no DynamoDB/S3 (RESULTS_TABLE e/ou RESULTS_BUCKET): as gravações
+        # são feitas em segundo plano e aguardadas apenas no fim da invocação. Um erro na criação
+        # (ex: configuração inválida) gera a resposta de erro, como os demais
+        results_sink = get_results_sink()
+
         # 3 - Cria um contexto para o prompt
         context = event.get('context', None)
+        context_path = event.get('context_path', None)
 
-        # 4 - Gera o prompt para o modelo de NLP
-        prompt = PromptTemplate(context) 
-        print(f'[DEBUG] O prompt gerado: {prompt.get_prompt_text()}') 
+        # Sem um caminho explícito, lê o arquivo do jogador diretamente do S3 como stream
+        # ('s3://<S3_BUCKET_NAME>/<output_key>'), sem baixá-lo antes para o /tmp
+        if not context_path and event.get('output_key') and s3_bucket_name:
+            context_path = f"s3://{s3_bucket_name}/{event['output_key']}"
+            log_debug(f'Arquivo de contexto no S3: {context_path}')
 
-        # 5 - Instancia a classe TokenManager
-        token_manager = TokenManager(context_path=None, prompt=prompt.get_prompt_text())
-        batch_file_path = token_manager.get_batch_path()
+        # 4 - Gera o prompt para o modelo de NLP (o template é compilado uma única vez por processo)
+        with stage_timer('prompt_render'):
+            prompt = PromptTemplate(context, event.get('template'))
+            prompt_text = prompt.get_prompt_text()
+        log_debug('Prompt gerado', prompt=prompt_text)
 
-        # 6 - Instancia o modelo Amazon Nova Pro, e obtém o ID do modelo e o corpo da requisição
-        novapro_model = AmazonNovaPro(prompt.get_prompt_text(), batch_file_path)
-        print(f'[DEBUG] O tamanho do corpo da requisição para Nova Pro: {token_manager.count_tokens(str(novapro_model.get_request_body()))}')
-        
-        # 7 - Realiza a inferência do modelo de NLP para o modelo Amazon Nova Pro
-        model_id = novapro_model.get_model_id()
-        request_body = novapro_model.get_request_body()
-        print(f'[DEBUG] O ID do modelo é: {model_id}')
-        print(f'[DEBUG] O corpo da requisição é: {request_body}')
+        # 5 - Realiza a inferência de acordo com o modo solicitado no evento
+        if event.get('batch_inference'):
+            # Modo offline: job de inferência em lote no Bedrock para vários jogadores
+            mode = 'batch_inference'
+            data_models['batch_inference'] = process_batch_inference_job(event['batch_inference'], s3_bucket_name)
+        elif event.get('map_reduce', False) and context_path:
+            # Relatório único sobre o arquivo inteiro: digests por lote combinados em árvore
+            mode = 'map_reduce'
+            data_models['map_reduce'] = process_map_reduce(event, context, context_path)
+        elif event.get('process_all_batches', False) and context_path:
+            # Cobertura completa: processa todos os lotes do arquivo de contexto
+            mode = 'all_batches'
+            data_models['batches'] = process_all_batches(event, prompt, context_path, results_sink, request_id)
+        else:
+            data_models = process_initial_batch(event, prompt, context_path)
 
-        # 8 - Realiza a inferência do modelo de NLP para o modelo Amazon Nova Pro
-        response_novapro_model = BedrockInferenceService(model_id, request_body).invoke_model()
-        print(f'[DEBUG] O resultado da inferência é: {response_novapro_model}') 
+        # Enfileira os resultados para gravação (os lotes já foram enfileirados durante o processamento)
+        if results_sink is not None:
+            for name, result in data_models.items():
+                if name != 'batches':
+                    results_sink.put(request_id, name, result, metadata={'context_path': context_path})
+
+        # Métricas de acerto do cache de respostas do processo
+        response_cache = get_response_cache()
+        if response_cache is not None:
+            log_debug('Métricas do cache de respostas', stats=response_cache.get_stats())
 
         return {
             'statusCode': 200,
@@ -69,7 +392,7 @@ def lambda_handler(event, context):
         }
     
     except Exception as e:
-        print(f'[ERROR] {e}') 
+        log_error(str(e))
         return {
             'statusCode': 500, 
             'body': json.dumps({ 
@@ -78,10 +401,28 @@ def lambda_handler(event, context):
             })
         }
 
-lambda_handler({
+    finally:
+        # Encerra o uso do gravador na invocação, aguardando as gravações pendentes: o ambiente da
+        # Lambda é congelado após o retorno (o gravador e sua thread são reaproveitados pelo processo)
+        if results_sink is not None:
+            try:
+                with stage_timer('results_flush'):
+                    flushed = results_sink.flush(float(get_env('RESULTS_FLUSH_TIMEOUT_SECONDS',
+                                                               DEFAULT_RESULTS_FLUSH_TIMEOUT)))
+                log_debug(f'Gravação dos resultados (concluída={flushed})', stats=results_sink.get_stats())
+            except Exception as e:
+                log_error(f'Erro ao aguardar a gravação dos resultados: {e}')
+
+        # Durações de cada etapa como métricas EMF (extraídas do log pelo CloudWatch, sem chamadas à API)
+        get_stage_metrics().record('handler_total', time.perf_counter() - start_time)
+        emit_metrics({'Mode': mode})
+
+if __name__ == "__main__":
+    # Chamada de teste para a função lambda_handler (não é executada no import da Lambda)
+    lambda_handler({
 
-  "status": "success",
-  "folder": "+16472038405",
-  "lines": 1,
-  "output_key": "+16472038405/output.jsonl"
-}, None)  # Chamada de teste para a função lambda_handler
\ No newline at end of file
+      "status": "success",
+      "folder": "+16472038405",
+      "lines": 1,
+      "output_key": "+16472038405/output.jsonl"
+    }, None)
\ No newline at end of file
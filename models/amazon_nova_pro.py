@@ -1,38 +1,59 @@
 import os
 import json
-import base64
-from dotenv import load_dotenv
-
-load_dotenv()
-
-# Carrega o ID do modelo da variável de ambiente
-AMAZON_NOVA_PRO_MODEL_ID = os.getenv('AMAZON_NOVA_PRO_MODEL_ID')
+from utils.environment import get_env
+from utils.instrumentation import log_debug, log_error, timed
+from controllers.token_estimator import estimate_content_tokens, get_token_estimator
+from controllers.image_preprocessor import get_image_format, preprocess_image
+from models.prompt_cache import NOVA_CACHE_POINT, get_cache_min_tokens, split_cacheable_prompt
+from controllers.attachment_loader import load_attachments
+from models.request_body_builder import NOVA_MESSAGES_BUILDER, encode_base64
 
 class AmazonNovaPro:
-    def __init__(self, prompt, file_path=None, max_tokens=10_000):
+    # Família do modelo, usada para escolher o estimador de tokens
+    model_family = 'amazon'
+
+    def __init__(self, prompt, file_path=None, max_tokens=10_000, file_content=None, file_name=None,
+                 prompt_cache=False, cache_prefix=None, attachments=None):
         """
         Construtor da classe AmazonNovaPro para configurar o modelo de NLP
         
         Args:
             prompt (str): Texto de entrada para o modelo
             file_path (str): Caminho do arquivo a ser carregado (opcional)
-            max_tokens (int): Limite máximo de tokens (padrão: 1000)
+            max_tokens (int): Limite máximo de tokens gerados (padrão: 10.000)
+            file_content (str): Conteúdo do arquivo já carregado em memória, dispensando a leitura do disco (opcional)
+            file_name (str): Nome do arquivo associado a file_content (opcional)
+            prompt_cache (bool): Marca o prompt com checkpoints de cache de prompt do Bedrock (padrão: False)
+            cache_prefix (str): Parte estática inicial do prompt, com checkpoint próprio (opcional)
+            attachments (list): Arquivos locais e URLs adicionais (ex: imagens do jogador), carregados
+                simultaneamente, sem duplicados e dentro do orçamento total de bytes (opcional)
         """
         self.max_tokens = max_tokens
-        self.model_id = AMAZON_NOVA_PRO_MODEL_ID or "amazon.nova-pro-v1:0"
+        self.cache_prefix = cache_prefix
+        # Carrega o ID do modelo da variável de ambiente
+        self.model_id = get_env('AMAZON_NOVA_PRO_MODEL_ID') or "amazon.nova-pro-v1:0"
+
+        # Checkpoints de cache de prompt apenas nos modelos que os aceitam (os demais rejeitam a requisição)
+        self.cache_min_tokens = get_cache_min_tokens(self.model_id)
+        self.prompt_cache = prompt_cache and self.cache_min_tokens is not None
         
-        # Carrega o arquivo se fornecido
-        self.file_content = None
-        self.file_name = None
-        if file_path:
+        # Utiliza o conteúdo já carregado em memória ou carrega o arquivo, se fornecido
+        self.file_content = file_content
+        self.image_format = None
+        self.file_name = file_name if file_content is not None else None
+        if file_path and file_content is None:
             self.load_file(file_path)
+
+        # Carrega os anexos adicionais simultaneamente
+        self.attachments = load_attachments(attachments or [], self.model_family)
         
         # Configura a mensagem
         self.content = self.set_content(prompt)
         
-        print(f"[DEBUG][NOVA_PRO] Foundation Model ID: {self.model_id}")
-        print(f"[DEBUG][NOVA_PRO] Request body configurado com sucesso")
+        log_debug(f"Foundation Model ID: {self.model_id}", tag='NOVA_PRO')
+        log_debug("Request body configurado com sucesso", tag='NOVA_PRO')
 
+    @timed('file_load')
     def load_file(self, file_path):
         """
         Carrega arquivo como texto ou base64
@@ -44,19 +65,26 @@ class AmazonNovaPro:
             self.file_name = os.path.basename(file_path)
             
             # Para arquivos de texto
-            if file_path.lower().endswith(('.csv', '.txt', '.json')):
+            if file_path.lower().endswith(('.csv', '.txt', '.json', '.jsonl')):
                 with open(file_path, 'r', encoding='utf-8') as f:
                     self.file_content = f.read()
             
-            # Para arquivos binários (imagens, PDF, etc.)
+            # Para imagens: reduzidas, recomprimidas e sem metadados antes do base64
+            elif get_image_format(self.file_name):
+                with open(file_path, 'rb') as f:
+                    image = preprocess_image(f.read(), self.file_name, self.model_family)
+                self.file_content = encode_base64(image['data'])
+                self.image_format = image['format']
+
+            # Para os demais arquivos binários (PDF, etc.)
             else:
                 with open(file_path, 'rb') as f:
-                    self.file_content = base64.b64encode(f.read()).decode('utf-8')
+                    self.file_content = encode_base64(f.read())
             
-            print(f"[DEBUG][NOVA_PRO] Arquivo carregado: {self.file_name}")
+            log_debug(f"Arquivo carregado: {self.file_name}", tag='NOVA_PRO')
             
         except Exception as e:
-            print(f"[ERROR] Erro ao carregar o arquivo: {str(e)}")
+            log_error(f"Erro ao carregar o arquivo: {str(e)}")
             self.file_content = None
             self.file_name = None
             raise e
@@ -72,11 +100,20 @@ class AmazonNovaPro:
             list: Lista com o conteúdo da mensagem
         """
         content = [{"text": prompt}]
+
+        # Com o cache de prompt, cada trecho estático do prompt com o mínimo de tokens do modelo
+        # é seguido por um checkpoint
+        segments = self.get_cacheable_segments(prompt)
+        if segments:
+            content = []
+            for segment in segments:
+                content.append({"text": segment})
+                content.append(dict(NOVA_CACHE_POINT))
         
         # Adiciona arquivo se carregado
         if self.file_content and self.file_name:
             # Para arquivos de texto
-            if isinstance(self.file_content, str) and self.file_name.lower().endswith(('.csv', '.txt', '.json')):
+            if isinstance(self.file_content, str) and self.file_name.lower().endswith(('.csv', '.txt', '.json', '.jsonl')):
                 content.append({
                     "text": f"\n\nConteúdo do arquivo {self.file_name}:\n{self.file_content}"
                 })
@@ -85,15 +122,46 @@ class AmazonNovaPro:
             elif self.file_name.lower().endswith(('.png', '.jpg', '.jpeg', '.gif', '.webp')):
                 content.append({
                     "image": {
-                        "format": self._get_image_format(self.file_name),
+                        "format": self.image_format or self._get_image_format(self.file_name),
                         "source": {
                             "bytes": self.file_content
                         }
                     }
                 })
         
+        # Adiciona os anexos adicionais (arquivos locais e URLs)
+        for attachment in self.attachments:
+            if attachment['kind'] == 'text':
+                content.append({
+                    "text": f"\n\nConteúdo do arquivo {attachment['file_name']}:\n{attachment['content']}"
+                })
+            else:
+                content.append({
+                    "image": {
+                        "format": attachment['format'],
+                        "source": {
+                            "bytes": attachment['content']
+                        }
+                    }
+                })
+
         return content
 
+    def get_cacheable_segments(self, prompt):
+        """
+        Trechos do prompt seguidos por um checkpoint de cache de prompt
+        
+        Args:
+            prompt (str): Texto de entrada para o modelo
+        
+        Returns:
+            list: Trechos do prompt (vazia sem cache de prompt ou sem prefixo com o mínimo de tokens)
+        """
+        if not self.prompt_cache:
+            return []
+        return split_cacheable_prompt(prompt, self.cache_prefix, self.cache_min_tokens,
+                                      get_token_estimator(self.model_family))
+
     def _get_image_format(self, filename):
         """
         Determina o formato da imagem baseado na extensão
@@ -142,6 +210,19 @@ class AmazonNovaPro:
         """
         return json.dumps(self.get_request_body(), indent=2)
 
+    @timed('encode')
+    def get_request_body_bytes(self):
+        """
+        Retorna o corpo da requisição já serializado, pronto para o invoke_model
+
+        O envelope estático é pré-serializado uma vez por processo e o conteúdo da
+        mensagem é inserido diretamente em bytes, sem serializar o dict completo.
+
+        Returns:
+            bytes: Corpo da requisição em JSON (UTF-8)
+        """
+        return NOVA_MESSAGES_BUILDER.build(self.content, max_tokens=self.max_tokens)
+
     def get_model_id(self):
         """
         Retorna o ID do modelo
@@ -149,4 +230,22 @@ class AmazonNovaPro:
         Returns:
             str: ID do modelo
         """
-        return self.model_id
\ No newline at end of file
+        return self.model_id
+
+    def estimate_input_tokens(self):
+        """
+        Estima os tokens de entrada da requisição com o estimador da família do modelo
+        
+        Returns:
+            int: Número estimado de tokens de entrada
+        """
+        return estimate_content_tokens(self.content, get_token_estimator(self.model_family))
+
+    def estimate_request_tokens(self):
+        """
+        Estima os tokens reservados pela requisição (entrada + limite de saída) no limitador de taxa
+        
+        Returns:
+            int: Número estimado de tokens da requisição
+        """
+        return self.estimate_input_tokens() + self.max_tokens
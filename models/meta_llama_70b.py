@@ -1,52 +1,176 @@
 import os
 import json
-from dotenv import load_dotenv
+from utils.environment import get_env
+from utils.instrumentation import log_debug, log_error, timed
+from controllers.token_estimator import get_token_estimator
+from controllers.attachment_loader import load_attachments
+from models.request_body_builder import LLAMA_PROMPT_BUILDER
 
-load_dotenv()
-
-# Carrega o ID do modelo da variável de ambiente
-CLAUDE_SONNET_MODEL_ID = os.getenv('META_LLAMA_70B_MODEL_ID')
+# Formato de prompt de instrução do Llama 3: o texto do usuário entre os cabeçalhos de
+# papel, terminando no cabeçalho do assistente para que o modelo gere a resposta
+LLAMA3_PROMPT_PREFIX = '<|begin_of_text|><|start_header_id|>user<|end_header_id|>\n\n'
+LLAMA3_PROMPT_SUFFIX = '<|eot_id|><|start_header_id|>assistant<|end_header_id|>\n\n'
 
 class MetaLlama70b:
+    # Família do modelo, usada para escolher o estimador de tokens
+    model_family = 'meta'
 
-    def __init__(self, prompt):
-        # 1 - Inicializa a variável do ID do modelo
-        self.model_id = "meta.llama3-3-70b-instruct-v1:0"
+    def __init__(self, prompt, file_path=None, max_tokens=2048, file_content=None, file_name=None,
+                 temperature=0.2, top_p=0.9, prompt_cache=False, cache_prefix=None,
+                 attachments=None):
+        """
+        Construtor da classe MetaLlama70b para configurar o modelo de NLP
 
-        # 2 - Define o body da requisição que será enviada para o modelo
-        self.request_body = self.set_request_body(prompt)    
-    
-    def get_model_id(self):
+        Args:
+            prompt (str): Texto de entrada para o modelo
+            file_path (str): Caminho do arquivo a ser carregado (opcional)
+            max_tokens (int): Limite máximo de tokens gerados (padrão: 2048, o máximo aceito pelo Llama)
+            file_content (str): Conteúdo do arquivo já carregado em memória, dispensando a leitura do disco (opcional)
+            file_name (str): Nome do arquivo associado a file_content (opcional)
+            temperature (float): Temperatura: controla a aleatoriedade da geração (padrão: 0.2)
+            top_p (float): top_p: controla a inclusão dos tokens mais prováveis (padrão: 0.9)
+            prompt_cache (bool): Ignorado, o Llama não suporta cache de prompt no Bedrock
+            cache_prefix (str): Ignorado, o Llama não suporta cache de prompt no Bedrock
+            attachments (list): Arquivos locais e URLs adicionais; apenas os de texto são enviados (opcional)
         """
-        Função que retorna o ID do modelo de soneto de Claude Sonnet
+        self.max_tokens = max_tokens
+        self.temperature = temperature
+        self.top_p = top_p
+        # Carrega o ID do modelo da variável de ambiente
+        self.model_id = get_env('META_LLAMA_70B_MODEL_ID') or "meta.llama3-3-70b-instruct-v1:0"
+
+        # Utiliza o conteúdo já carregado em memória ou carrega o arquivo, se fornecido
+        self.file_content = file_content
+        self.file_name = file_name if file_content is not None else None
+        if file_path and file_content is None:
+            self.load_file(file_path)
+
+        # Carrega os anexos adicionais simultaneamente (o modelo aceita apenas texto)
+        self.attachments = load_attachments(attachments or [], self.model_family, include_images=False)
+
+        # Configura a mensagem
+        self.content = self.set_content(prompt)
+
+        log_debug(f"Foundation Model ID: {self.model_id}", tag='LLAMA')
+        log_debug("Request body configurado com sucesso", tag='LLAMA')
+
+    @timed('file_load')
+    def load_file(self, file_path):
         """
-        return self.model_id
-    
-    
-    def set_request_body(self, prompt):
+        Carrega arquivo de texto (o Llama 3.3 não aceita imagens)
+
+        Args:
+            file_path (str): Caminho do arquivo a ser carregado
         """
-        Função que define o corpo da requisição que será enviada para o modelo
+        try:
+            self.file_name = os.path.basename(file_path)
+
+            with open(file_path, 'r', encoding='utf-8') as f:
+                self.file_content = f.read()
+
+            log_debug(f"Arquivo carregado: {self.file_name}", tag='LLAMA')
+
+        except Exception as e:
+            log_error(f"Erro ao carregar o arquivo: {str(e)}")
+            self.file_content = None
+            self.file_name = None
+            raise e
+
+    def set_content(self, prompt):
+        """
+        Constrói o conteúdo da mensagem
 
         Args:
-            prompt (str): Prompt que será enviado para o modelo
-        
+            prompt (str): Texto de entrada para o modelo
+
         Returns:
-            str: Corpo da requisição em formato JSON
+            list: Lista com os blocos de texto da mensagem
+        """
+        content = [{"text": prompt}]
+
+        # Adiciona arquivo de texto se carregado
+        if self.file_content and self.file_name:
+            if isinstance(self.file_content, str) and self.file_name.lower().endswith(('.csv', '.txt', '.json', '.jsonl')):
+                content.append({
+                    "text": f"\n\nConteúdo do arquivo {self.file_name}:\n{self.file_content}"
+                })
+            else:
+                log_debug(f"Arquivo ignorado, o modelo aceita apenas texto: {self.file_name}", tag='LLAMA')
+
+        # Adiciona os anexos adicionais
+        for attachment in self.attachments:
+            content.append({
+                "text": f"\n\nConteúdo do arquivo {attachment['file_name']}:\n{attachment['content']}"
+            })
+
+        return content
+
+    def get_prompt(self):
         """
-        
-        # Define os parâmetros de geração, incluindo tokens máximos e parâmetros de temperatura
-        self.request_body  = {
-            "max_tokens": 2048,
-            "messages": prompt,
-            "temperature": 0.2,  # Temperatura: controla a aleatoriedade da geração
-            "top_p": 0.9  # top_p: controla a inclusão dos tokens mais prováveis
-        }
-        return json.dumps(self.request_body)  # Retorna o corpo da requisição em formato JSON
+        Retorna o prompt completo no formato de instrução do Llama 3
+
+        Returns:
+            str: Prompt formatado
+        """
+        return LLAMA3_PROMPT_PREFIX + ''.join(block["text"] for block in self.content) + LLAMA3_PROMPT_SUFFIX
 
     def get_request_body(self):
         """
-        Função que retorna o corpo da requisição que será enviada para o modelo
+        Retorna o corpo da requisição no formato JSON especificado
+
+        Returns:
+            dict: Corpo da requisição completo
+        """
+        return {
+                "prompt": self.get_prompt(),
+                "max_gen_len": self.max_tokens,
+                "temperature": self.temperature,
+                "top_p": self.top_p
+            }
+
+    def get_request_body_json(self):
+        """
+        Retorna o corpo da requisição como string JSON
+
+        Returns:
+            str: Corpo da requisição em formato JSON
+        """
+        return json.dumps(self.get_request_body(), indent=2)
+
+    @timed('encode')
+    def get_request_body_bytes(self):
+        """
+        Retorna o corpo da requisição já serializado, pronto para o invoke_model
+
+        Returns:
+            bytes: Corpo da requisição em JSON (UTF-8)
+        """
+        return LLAMA_PROMPT_BUILDER.build(self.get_prompt(), max_gen_len=self.max_tokens,
+                                          temperature=self.temperature, top_p=self.top_p)
+
+    def get_model_id(self):
+        """
+        Retorna o ID do modelo
+
+        Returns:
+            str: ID do modelo
+        """
+        return self.model_id
+
+    def estimate_input_tokens(self):
+        """
+        Estima os tokens de entrada da requisição com o estimador da família do modelo
+
+        Returns:
+            int: Número estimado de tokens de entrada
+        """
+        return get_token_estimator(self.model_family).count_tokens(self.get_prompt())
+
+    def estimate_request_tokens(self):
+        """
+        Estima os tokens reservados pela requisição (entrada + limite de saída) no limitador de taxa
+
+        Returns:
+            int: Número estimado de tokens da requisição
         """
-        return self.request_body
-    
-    
\ No newline at end of file
+        return self.estimate_input_tokens() + self.max_tokens
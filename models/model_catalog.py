@@ -0,0 +1,32 @@
+# Importar as classes de modelos disponíveis para inferência
+from models.amazon_nova_pro import AmazonNovaPro
+from models.anthropic_claude_haiku import AnthropicClaudeHaiku
+from models.anthropic_claude_sonnet import AnthropicClaudeSonnet
+from models.meta_llama_70b import MetaLlama70b
+
+# Catálogo de modelos disponíveis, indexados pelo nome usado nos eventos da Lambda
+MODEL_CATALOG = {
+    'nova_pro': AmazonNovaPro,
+    'claude_haiku': AnthropicClaudeHaiku,
+    'claude_sonnet': AnthropicClaudeSonnet,
+    'llama_70b': MetaLlama70b,
+}
+
+# Modelo utilizado quando o evento não especifica nenhum modelo
+DEFAULT_MODEL_NAME = 'nova_pro'
+
+
+def get_model_class(model_name):
+    """
+    Retorna a classe do modelo a partir do nome no catálogo.
+
+    Args:
+        model_name (str): Nome do modelo (ex: 'nova_pro', 'claude_haiku')
+
+    Returns:
+        type: Classe do modelo
+    """
+    if model_name not in MODEL_CATALOG:
+        raise ValueError(f"Modelo não suportado: {model_name}. Modelos disponíveis: {', '.join(MODEL_CATALOG)}")
+
+    return MODEL_CATALOG[model_name]
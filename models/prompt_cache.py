@@ -0,0 +1,90 @@
+from utils.environment import get_env
+
+# Checkpoint de cache de prompt no formato da Anthropic (bloco de conteúdo marcado)
+ANTHROPIC_CACHE_CONTROL = {"type": "ephemeral"}
+
+# Checkpoint de cache de prompt no formato da Amazon Nova (bloco próprio após o conteúdo)
+NOVA_CACHE_POINT = {"cachePoint": {"type": "default"}}
+
+# Modelos que aceitam checkpoints de cache de prompt no Bedrock (trecho do ID do modelo, também
+# presente nos perfis de inferência entre regiões) e o mínimo de tokens do prefixo cacheável. Os
+# demais (ex: Claude 3 Haiku e Claude 3.5 Sonnet v1) rejeitam a requisição com ValidationException
+PROMPT_CACHE_MIN_TOKENS = {
+    'anthropic.claude-3-5-haiku': 2048,
+    'anthropic.claude-3-7-sonnet': 1024,
+    'anthropic.claude-sonnet-4': 1024,
+    'anthropic.claude-opus-4': 1024,
+    'amazon.nova-micro': 1024,
+    'amazon.nova-lite': 1024,
+    'amazon.nova-pro': 1024,
+    'amazon.nova-premier': 1024,
+}
+
+
+def is_prompt_caching_enabled(event=None):
+    """
+    Verifica se os checkpoints de cache de prompt devem ser enviados.
+
+    O campo 'prompt_cache' do evento tem prioridade sobre a variável de ambiente
+    PROMPT_CACHING_ENABLED (padrão: desabilitado). Mesmo habilitado, os checkpoints
+    só são enviados aos modelos que os aceitam (get_cache_min_tokens).
+
+    Args:
+        event (dict): Evento recebido pela Lambda (opcional)
+
+    Returns:
+        bool: True se o cache de prompt estiver habilitado
+    """
+    if event and event.get('prompt_cache') is not None:
+        return bool(event['prompt_cache'])
+    return (get_env('PROMPT_CACHING_ENABLED') or '').lower() in ('1', 'true', 'yes')
+
+
+def get_cache_min_tokens(model_id):
+    """
+    Retorna o mínimo de tokens do prefixo cacheável do modelo.
+
+    Args:
+        model_id (str): ID do modelo (ou do perfil de inferência) no Bedrock
+
+    Returns:
+        int: Mínimo de tokens, ou None se o modelo não aceita checkpoints
+    """
+    for model_name, min_tokens in PROMPT_CACHE_MIN_TOKENS.items():
+        if model_name in model_id:
+            return min_tokens
+    return None
+
+
+def split_cacheable_prompt(prompt, cache_prefix=None, min_tokens=0, estimator=None):
+    """
+    Divide o prompt nos trechos seguidos por um checkpoint de cache.
+
+    O primeiro checkpoint fica após o bloco estático de instruções do template
+    (comum a todos os jogadores) e o segundo após o prompt completo (comum a
+    todos os lotes do mesmo jogador), antes do arquivo anexado. Um checkpoint cujo
+    prefixo (do início do prompt até ele) não atinge o mínimo de tokens do modelo
+    nunca seria aproveitado: o trecho é unido ao seguinte, sem checkpoint.
+
+    Args:
+        prompt (str): Texto completo do prompt
+        cache_prefix (str): Parte estática inicial do prompt (opcional)
+        min_tokens (int): Mínimo de tokens do prefixo cacheável (get_cache_min_tokens)
+        estimator (TokenEstimator): Estimador da família do modelo (obrigatório com min_tokens)
+
+    Returns:
+        list: Trechos do prompt, na ordem; cada um é seguido por um checkpoint. Vazia
+            quando nem o prompt completo atinge o mínimo (o prompt vai sem checkpoints)
+    """
+    segments = [prompt]
+    if cache_prefix and prompt.startswith(cache_prefix) and len(prompt) > len(cache_prefix):
+        segments = [cache_prefix, prompt[len(cache_prefix):]]
+
+    if not min_tokens:
+        return segments
+
+    if estimator.count_tokens(prompt) < min_tokens:
+        return []
+    if len(segments) > 1 and estimator.count_tokens(cache_prefix) < min_tokens:
+        return [prompt]
+    return segments
@@ -0,0 +1,175 @@
+import json
+import base64
+import threading
+from json.encoder import encode_basestring_ascii
+
+# Marcador do ponto do envelope onde o conteúdo variável da requisição é inserido
+CONTENT_PLACEHOLDER = '\x00__request_content__\x00'
+
+
+class Base64Text(str):
+    """
+    Texto base64 gerado por encode_base64() (ex: imagens). É inserido no corpo da
+    requisição sem escape, pois o alfabeto base64 não contém caracteres que
+    precisem de escape em JSON; as demais strings são sempre escapadas.
+    """
+    __slots__ = ()
+
+
+def encode_base64(data):
+    """
+    Codifica bytes em base64, marcando o resultado para a inserção sem escape.
+
+    Args:
+        data (bytes): Conteúdo binário (ex: imagem pré-processada)
+
+    Returns:
+        Base64Text: Texto base64 (uma str)
+    """
+    return Base64Text(base64.b64encode(data).decode('ascii'))
+
+
+def encode_value(value):
+    """
+    Serializa um valor do corpo da requisição diretamente em bytes JSON.
+
+    Textos são escapados uma única vez pelo codificador em C do módulo json (em
+    ASCII, como o json.dumps usado anteriormente, e mais rápido que o escape em
+    UTF-8 para textos grandes); textos base64 gerados por encode_base64() são
+    inseridos como estão, sem varredura de escape. Bytes são decodificados como
+    UTF-8 e escapados como texto; conteúdo binário deve passar por encode_base64().
+
+    Args:
+        value: Valor a serializar (dict, list, str, bytes, número, bool ou None)
+
+    Returns:
+        bytes: Valor serializado em JSON
+
+    Raises:
+        UnicodeDecodeError: Se um valor em bytes não for texto UTF-8
+    """
+    parts = []
+    _append_value(value, parts)
+    return b''.join(parts)
+
+
+def _append_value(value, parts):
+    """
+    Acrescenta os fragmentos JSON do valor à lista, para que o corpo inteiro seja
+    unido com uma única cópia ao final.
+    """
+    if isinstance(value, dict):
+        parts.append(b'{')
+        for index, (name, item) in enumerate(value.items()):
+            if index:
+                parts.append(b',')
+            parts.append(encode_basestring_ascii(name).encode('ascii') + b':')
+            _append_value(item, parts)
+        parts.append(b'}')
+    elif isinstance(value, list):
+        parts.append(b'[')
+        for index, item in enumerate(value):
+            if index:
+                parts.append(b',')
+            _append_value(item, parts)
+        parts.append(b']')
+    elif isinstance(value, (bytes, bytearray)):
+        parts.append(encode_basestring_ascii(value.decode('utf-8')).encode('ascii'))
+    elif isinstance(value, Base64Text):
+        parts.extend((b'"', value.encode('ascii'), b'"'))
+    elif isinstance(value, str):
+        parts.append(encode_basestring_ascii(value).encode('ascii'))
+    else:
+        parts.append(json.dumps(value).encode('utf-8'))
+
+
+class RequestBodyBuilder:
+
+    def __init__(self, name, envelope):
+        """
+        Construtor de corpos de requisição com envelope pré-serializado.
+
+        O envelope estático (versão da API, configuração de inferência, chaves do
+        esquema) é serializado uma vez por processo para cada combinação de
+        parâmetros, e o conteúdo variável (prompt, arquivo, imagens) é inserido
+        entre os fragmentos já codificados, sem montar nem serializar o dict completo.
+
+        Args:
+            name (str): Nome do formato da requisição (ex: 'anthropic_messages')
+            envelope (callable): Função que recebe os parâmetros estáticos e retorna o
+                envelope (dict) com CONTENT_PLACEHOLDER no lugar do conteúdo
+        """
+        self.name = name
+        self.envelope = envelope
+        self._fragments = {}
+        self._lock = threading.Lock()
+
+    def get_fragments(self, **params):
+        """
+        Retorna os fragmentos do envelope antes e depois do conteúdo, memoizados pelos parâmetros.
+
+        Returns:
+            tuple: (prefixo, sufixo) em bytes
+        """
+        key = tuple(sorted(params.items()))
+        fragments = self._fragments.get(key)
+
+        if fragments is None:
+            envelope_json = encode_value(self.envelope(**params))
+            prefix, suffix = envelope_json.split(encode_value(CONTENT_PLACEHOLDER))
+            fragments = (prefix, suffix)
+            with self._lock:
+                self._fragments[key] = fragments
+
+        return fragments
+
+    def build(self, content, **params):
+        """
+        Monta o corpo da requisição em bytes.
+
+        Args:
+            content: Conteúdo variável inserido no envelope (lista de blocos ou texto)
+            **params: Parâmetros estáticos do envelope (ex: max_tokens)
+
+        Returns:
+            bytes: Corpo da requisição em JSON (UTF-8)
+        """
+        prefix, suffix = self.get_fragments(**params)
+        parts = [prefix]
+        _append_value(content, parts)
+        parts.append(suffix)
+        return b''.join(parts)
+
+
+# Formato Messages da Anthropic (Claude Haiku e Sonnet)
+ANTHROPIC_MESSAGES_BUILDER = RequestBodyBuilder('anthropic_messages', lambda max_tokens: {
+    "anthropic_version": "bedrock-2023-05-31",
+    "max_tokens": max_tokens,
+    "messages": [
+        {
+            "role": "user",
+            "content": CONTENT_PLACEHOLDER
+        }
+    ]
+})
+
+# Formato Messages da Amazon Nova
+NOVA_MESSAGES_BUILDER = RequestBodyBuilder('nova_messages', lambda max_tokens: {
+    "inferenceConfig": {
+        "max_new_tokens": max_tokens
+    },
+    "messages": [
+        {
+            "role": "user",
+            "content": CONTENT_PLACEHOLDER
+        }
+    ]
+})
+
+# Formato de prompt único da Meta Llama
+LLAMA_PROMPT_BUILDER = RequestBodyBuilder('llama_prompt', lambda max_gen_len, temperature, top_p: {
+    "prompt": CONTENT_PLACEHOLDER,
+    "max_gen_len": max_gen_len,
+    "temperature": temperature,
+    "top_p": top_p
+})
@@ -0,0 +1,184 @@
+import threading
+from utils.environment import get_env
+from utils.instrumentation import log_debug
+
+# Região padrão utilizada pelo BedrockInferenceService
+DEFAULT_BEDROCK_REGION = 'us-east-1'
+
+# Parâmetros padrão de conexão do cliente Bedrock Runtime (sobrescritos pelo .env)
+DEFAULT_MAX_POOL_CONNECTIONS = 25
+DEFAULT_CONNECT_TIMEOUT = 5
+DEFAULT_READ_TIMEOUT = 300
+
+# Limite do timeout de leitura por família de modelo; as famílias ausentes (ex: 'anthropic', cujas
+# gerações longas demoram mais) usam o timeout completo de BEDROCK_READ_TIMEOUT
+MODEL_FAMILY_MAX_READ_TIMEOUTS = {
+    'meta': 120,
+}
+
+# Registro de clientes do processo, reutilizado entre invocações "quentes" da Lambda
+_BEDROCK_CLIENTS = {}
+_AWS_CLIENTS = {}
+_BEDROCK_CLIENTS_LOCK = threading.Lock()
+
+# Sessão AWS do processo, criada apenas quando o primeiro cliente é solicitado
+_SESSION = None
+
+
+def get_session():
+    """
+    Retorna a sessão AWS do processo, criando-a na primeira chamada.
+
+    O boto3 só é importado neste momento, de modo que o cold start da Lambda não
+    paga a criação da sessão quando o caminho de inferência não é utilizado.
+
+    Returns:
+        boto3.Session: Sessão AWS autenticada
+    """
+    global _SESSION
+
+    if _SESSION is None:
+        with _BEDROCK_CLIENTS_LOCK:
+            if _SESSION is None:
+                # +-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+
+                # RUN LOCALY
+                from utils.check_aws import AWS_SERVICES
+
+                aws_services = AWS_SERVICES()
+
+                _SESSION = aws_services.login_session_AWS()
+                # +-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+
+
+    return _SESSION
+
+
+def get_model_family(model_id):
+    """
+    Obtém a família do modelo a partir do prefixo do ID do modelo.
+
+    Args:
+        model_id (str): ID do modelo Bedrock (ex: 'amazon.nova-pro-v1:0')
+
+    Returns:
+        str: Família do modelo ('anthropic', 'amazon', 'meta', ...) ou 'default'
+    """
+    if not model_id:
+        return 'default'
+
+    # IDs de inference profile possuem o prefixo da região (ex: 'us.anthropic.claude...')
+    parts = model_id.split('.')
+    if len(parts) > 2 and parts[0] in ('us', 'eu', 'apac', 'global'):
+        return parts[1]
+
+    return parts[0]
+
+
+def build_client_config(model_family=None):
+    """
+    Cria a configuração do botocore para o cliente Bedrock Runtime.
+
+    Args:
+        model_family (str): Família do modelo (opcional)
+
+    Returns:
+        Config: Configuração com pool de conexões, keep-alive e timeouts (sem novas tentativas
+            do botocore, que ficam a cargo de services.retry_policy)
+    """
+    from botocore.config import Config
+
+    read_timeout = int(get_env('BEDROCK_READ_TIMEOUT', DEFAULT_READ_TIMEOUT))
+
+    return Config(
+        max_pool_connections=int(get_env('BEDROCK_MAX_POOL_CONNECTIONS', DEFAULT_MAX_POOL_CONNECTIONS)),
+        tcp_keepalive=True,
+        connect_timeout=int(get_env('BEDROCK_CONNECT_TIMEOUT', DEFAULT_CONNECT_TIMEOUT)),
+        read_timeout=min(read_timeout, MODEL_FAMILY_MAX_READ_TIMEOUTS.get(model_family, read_timeout)),
+        # As novas tentativas são feitas por services.retry_policy, junto ao limitador de taxa
+        retries={'max_attempts': 1, 'mode': 'standard'},
+    )
+
+
+def get_bedrock_client(region_name=None, model_family=None):
+    """
+    Retorna um cliente Bedrock Runtime compartilhado pelo processo.
+
+    O cliente é criado apenas na primeira chamada para cada par (região, família)
+    e reutilizado nas chamadas seguintes, mantendo as conexões HTTPS abertas.
+
+    Args:
+        region_name (str): Região AWS (padrão: região da sessão)
+        model_family (str): Família do modelo (ex: 'anthropic', 'amazon')
+
+    Returns:
+        botocore.client.BedrockRuntime: Cliente do Bedrock Runtime
+    """
+    session = get_session()
+    region_name = region_name or session.region_name
+    key = (region_name, model_family or 'default')
+
+    client = _BEDROCK_CLIENTS.get(key)
+    if client is not None:
+        return client
+
+    with _BEDROCK_CLIENTS_LOCK:
+        # Verifica novamente, pois outra thread pode ter criado o cliente
+        client = _BEDROCK_CLIENTS.get(key)
+        if client is None:
+            client = session.client(
+                'bedrock-runtime',
+                region_name=region_name,
+                # Endpoint alternativo (opcional), útil para apontar o cliente para um stub local
+                endpoint_url=get_env('BEDROCK_ENDPOINT_URL'),
+                config=build_client_config(model_family),
+            )
+            _BEDROCK_CLIENTS[key] = client
+            log_debug(f'Cliente criado para região={key[0]} família={key[1]}', tag='BEDROCK')
+
+    return client
+
+
+def get_aws_client(service_name, region_name=None):
+    """
+    Retorna um cliente compartilhado pelo processo para outros serviços AWS
+    (ex: 's3', 'bedrock', 'dynamodb').
+
+    Endpoints alternativos (ex: um S3 local) podem ser configurados pelas variáveis
+    padrão do boto3, como AWS_ENDPOINT_URL_S3.
+
+    Args:
+        service_name (str): Nome do serviço no boto3
+        region_name (str): Região AWS (padrão: região da sessão)
+
+    Returns:
+        botocore.client.BaseClient: Cliente do serviço
+    """
+    session = get_session()
+    key = (service_name, region_name or session.region_name)
+
+    client = _AWS_CLIENTS.get(key)
+    if client is not None:
+        return client
+
+    with _BEDROCK_CLIENTS_LOCK:
+        client = _AWS_CLIENTS.get(key)
+        if client is None:
+            from botocore.config import Config
+
+            client = session.client(service_name, region_name=key[1], config=Config(
+                max_pool_connections=int(get_env('BEDROCK_MAX_POOL_CONNECTIONS', DEFAULT_MAX_POOL_CONNECTIONS)),
+                tcp_keepalive=True,
+                retries={'max_attempts': 3, 'mode': 'standard'},
+            ))
+            _AWS_CLIENTS[key] = client
+            log_debug(f'Cliente {service_name} criado para região={key[1]}', tag='AWS')
+
+    return client
+
+
+def clear_bedrock_clients():
+    """
+    Remove todos os clientes do registro (usado em benchmarks e na troca de credenciais).
+    """
+    with _BEDROCK_CLIENTS_LOCK:
+        _BEDROCK_CLIENTS.clear()
+        _AWS_CLIENTS.clear()
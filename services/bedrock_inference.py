@@ -1,33 +1,29 @@
-# +-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+
-# RUN LOCALY
-from utils.check_aws import AWS_SERVICES
-
-aws_services = AWS_SERVICES()
-
-session = aws_services.login_session_AWS()
-# +-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+
-
 import json
-import boto3
-import os
-from dotenv import load_dotenv
+from utils.environment import get_env
 
-# Carregar variáveis de ambiente do arquivo .env
-load_dotenv()
+# Importa o registro de clientes compartilhados do Bedrock Runtime
+from services.bedrock_client_registry import get_bedrock_client, get_model_family
 
-# Obtem-se o ID do foundation model a partir das variáveis de ambiente
-CLAUDE_MODEL_ID = os.getenv('ANTHROPIC_CLAUDE_SONNET_MODEL_ID') # ID do modelo Claude para geração de texto
+# Importa as novas tentativas classificadas e o limitador de taxa por modelo
+from services.retry_policy import call_with_retry
+from services.rate_limiter import get_rate_limiter
 
 class BedrockInference:
     def __init__(self):
         """
         Inicializa o serviço AWS Bedrock.
 
-        Cria uma sessão do Boto3 e um cliente para o serviço Bedrock, com a região configurada como 'us-east-1'.
+        Obtém o cliente do Bedrock Runtime compartilhado pelo processo, na região da sessão AWS.
         """
 
-        # Inicializa o cliente do Bedrock Runtime
-        self.bedrock_client = session.client('bedrock-runtime')
+        # Obtem-se o ID do foundation model a partir das variáveis de ambiente
+        self.model_id = get_env('ANTHROPIC_CLAUDE_SONNET_MODEL_ID') # ID do modelo Claude para geração de texto
+
+        # Obtém o cliente compartilhado do Bedrock Runtime
+        self.bedrock_client = get_bedrock_client(model_family=get_model_family(self.model_id))
+
+        # Limitador de taxa compartilhado com os demais chamadores do modelo
+        self.rate_limiter = get_rate_limiter(self.model_id)
 
     # --------------------------------------------------------------------
     # Função que gera o corpo da requisição para o Bedrock
@@ -72,12 +68,16 @@ class BedrockInference:
         :param prompt: O prompt gerado que será enviado ao modelo.
         :return: Resposta de texto gerada pelo modelo.
         """
-        # Invoca o modelo Bedrock com o corpo da requisição gerado
-        response = self.bedrock_client.invoke_model(
-            modelId=CLAUDE_MODEL_ID, 
-            contentType='application/json',
-            accept='application/json',
-            body=self.generate_request_body(prompt)  # Gera o corpo da requisição
+        # Invoca o modelo Bedrock com o corpo da requisição gerado, repetindo as falhas recuperáveis
+        request_body = self.generate_request_body(prompt)  # Gera o corpo da requisição
+        response, _ = call_with_retry(
+            lambda: self.bedrock_client.invoke_model(
+                modelId=self.model_id, 
+                contentType='application/json',
+                accept='application/json',
+                body=request_body
+            ),
+            rate_limiter=self.rate_limiter,
         )
 
         # Lê o corpo da resposta e extrai o texto gerado pelo modelo
@@ -113,9 +113,8 @@ if __name__ == "__main__":
         "What is your favorite type of music?"
     ]
 
-    # Itera sobre as perguntas e invoca o modelo Bedrock para cada uma
+    # Itera sobre as perguntas e invoca o modelo Bedrock para cada uma; o ritmo das
+    # chamadas é controlado pelo limitador de taxa do modelo, sem pausas fixas
     for question in questions:
         response = bedrock_service.invoke_model(question)
-        print(f"Question: {question}\nResponse: {response}\n")
-        import time 
-        time.sleep(1)
\ No newline at end of file
+        print(f"Question: {question}\nResponse: {response}\n")
\ No newline at end of file
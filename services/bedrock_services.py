@@ -1,32 +1,69 @@
-# +-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+
-# RUN LOCALY
-from utils.check_aws import AWS_SERVICES
+import json
+import time
 
-aws_services = AWS_SERVICES()
+# Importa o registro de clientes compartilhados do Bedrock Runtime
+from services.bedrock_client_registry import DEFAULT_BEDROCK_REGION, get_bedrock_client, get_model_family
 
-session = aws_services.login_session_AWS()
-# +-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+
+# Importa o cache de respostas endereçado pelo conteúdo da requisição
+from services.response_cache import build_cache_key, get_response_cache
 
-import json
-import boto3
+# Importa as novas tentativas classificadas e o limitador de taxa por modelo
+from services.retry_policy import call_with_retry
+from services.rate_limiter import get_rate_limiter
+from controllers.token_estimator import IMAGE_TOKEN_ESTIMATE
+from utils.instrumentation import get_stage_metrics, log_debug, log_error, stage_timer
+
+# Aproximação de caracteres por token usada quando a estimativa não é informada
+CHARS_PER_TOKEN_ESTIMATE = 4
 
 class BedrockInferenceService:
-    def __init__(self, model_id, request_body):
+    def __init__(self, model_id, request_body, region_name=DEFAULT_BEDROCK_REGION, use_cache=True, cache=None,
+                 retry_policy=None, rate_limiter=None, estimated_tokens=None):
         """
         Inicializa o serviço AWS Bedrock.
 
-        Cria uma sessão do Boto3 e um cliente para o serviço Bedrock, com a região configurada como 'us-east-1'.
+        Obtém o cliente do Bedrock Runtime compartilhado pelo processo para a região
+        (padrão 'us-east-1') e família do modelo, evitando recriar o cliente e a
+        conexão TLS a cada invocação da Lambda.
+
+        Args:
+            use_cache (bool): Consulta o cache de respostas antes de invocar o modelo (padrão: True)
+            cache (ResponseCache): Cache utilizado (padrão: cache compartilhado do processo)
+            retry_policy (RetryPolicy): Política de novas tentativas (padrão: configurada no .env)
+            rate_limiter (ModelRateLimiter): Limitador de taxa (padrão: limitador compartilhado do modelo)
+            estimated_tokens (int): Tokens estimados da requisição para o limitador
+                (padrão: estimados a partir do tamanho do corpo e do limite de saída)
+
+        O corpo da requisição pode ser um dict ou os bytes já serializados pela classe do
+        modelo (get_request_body_bytes), enviados sem nova serialização.
         """
 
-        # Inicializa o cliente do Bedrock Runtime
-        self.bedrock_client = session.client('bedrock-runtime', region_name='us-east-1')
+        # Obtém o cliente compartilhado do Bedrock Runtime
+        self.bedrock_client = get_bedrock_client(region_name, get_model_family(model_id))
 
         # Define o ID do modelo Bedrock
         self.model_id = model_id
-        print(f'[DEBUG][BEDROCK] O modelo Bedrock selecionado: {self.model_id}')
+        log_debug(f'O modelo Bedrock selecionado: {self.model_id}', tag='BEDROCK')
 
-        # Define o corpo da requisição
+        # Define o corpo da requisição e o serializa uma única vez
         self.request_body = request_body
+        self.body = self.encode_request_body(request_body)
+
+        # Métricas da última invocação (preenchidas pelos métodos de inferência)
+        self.latency = None
+        self.time_to_first_token = None
+        self.invocation_metrics = {}
+        self.usage = {}
+        self.cache_hit = False
+
+        # Cache de respostas (None quando desabilitado)
+        self.cache = (cache or get_response_cache()) if use_cache else None
+
+        # Novas tentativas e limitador de taxa compartilhado por todos os chamadores do modelo
+        self.retry_policy = retry_policy
+        self.rate_limiter = rate_limiter or get_rate_limiter(model_id)
+        self.estimated_tokens = estimated_tokens
+        self.retries = 0
         
     # --------------------------------------------------------------------
     # Função que invoca o modelo e retorna a resposta gerada
@@ -36,34 +73,319 @@ class BedrockInferenceService:
         Invoca os modelos Bedrock com o corpo da requisição gerado.
         Realiza a inferência do modelo de NLP e retorna o texto gerado.
 
+        Requisições idênticas (mesmo modelo e corpo) são atendidas pelo cache de
+        respostas, sem uma nova chamada ao Bedrock.
+
         Returns:
             str: O texto gerado pelo modelo Bedrock.
         """
 
         try: 
-            # Invoca o modelo Bedrock com o corpo da requisição gerado
-            response = self.bedrock_client.invoke_model(
-                modelId=self.model_id, 
-                contentType='application/json',
-                accept='application/json',
-                body=json.dumps(self.request_body)
-            )
+            start_time = time.perf_counter()
+
+            # Consulta o cache de respostas antes de invocar o modelo
+            cache_key = None
+            if self.cache is not None:
+                cache_key = build_cache_key(self.model_id, self.request_body)
+                cached_response = self.cache.get(cache_key)
+                self.cache_hit = cached_response is not None
+
+                if self.cache_hit:
+                    self.latency = time.perf_counter() - start_time
+                    self.usage = cached_response.get('usage') or {}
+                    log_debug(f'Resposta obtida do cache: {cache_key}', tag='BEDROCK')
+                    return cached_response.get('text')
+
+            # Invoca o modelo Bedrock com o corpo da requisição gerado, repetindo as falhas recuperáveis
+            reserved_tokens = self.get_estimated_tokens()
+            with stage_timer('invoke'):
+                response, self.retries = call_with_retry(
+                    lambda: self.bedrock_client.invoke_model(
+                        modelId=self.model_id, 
+                        contentType='application/json',
+                        accept='application/json',
+                        body=self.body
+                    ),
+                    self.retry_policy, self.rate_limiter, reserved_tokens,
+                )
+                raw_body = response.get('body').read()
 
-            print(response)
+            # Registra apenas os metadados da resposta, nunca o corpo
+            log_debug('Resposta recebida', tag='BEDROCK', model_id=self.model_id, bytes=len(raw_body),
+                      retries=self.retries, request_id=response.get('ResponseMetadata', {}).get('RequestId'))
 
-            # Lê o corpo da resposta e extrai o texto gerado pelo modelo
-            response_body = json.loads(response.get('body').read())
+            # Decodifica o corpo da resposta e extrai o texto gerado pelo modelo
+            with stage_timer('parse'):
+                response_body = json.loads(raw_body)
+                response_text = self.extract_response_text(response_body)
 
-            # Caso seja um modelo da Anthropic, o texto gerado pode estar em diferentes formatos
-            if response_body.get('content', None):
-                response_text = response_body.get('content')[0]['text']
+            # Registra a latência e o uso de tokens da invocação
+            self.latency = time.perf_counter() - start_time
+            self.usage = self.extract_usage(response_body)
+            self.record_usage(reserved_tokens)
 
-            # Caso seja um modelo da Amazon, o texto gerado pode estar em um formato diferente
-            if response_body.get('output', None):
-                response_text = response_body['output']['message']['content'][0]['text']
+            # Armazena a resposta no cache (respostas sem texto não são armazenadas)
+            if cache_key is not None and response_text is not None:
+                self.cache.put(cache_key, {'text': response_text, 'usage': self.usage})
 
             return response_text  # Retorna o texto gerado
     
         except Exception as e:
-            print(f'[ERROR] Ocorreu um erro ao invocar o modelo: {e}')
-            raise e
\ No newline at end of file
+            log_error(f'Ocorreu um erro ao invocar o modelo: {e}')
+            raise e
+
+    # --------------------------------------------------------------------
+    # Função que invoca o modelo em modo streaming, retornando os trechos gerados
+    # --------------------------------------------------------------------
+    def stream_model(self):
+        """
+        Invoca o modelo Bedrock com invoke_model_with_response_stream.
+        Gera os trechos de texto (deltas) à medida que o modelo os produz, permitindo
+        que o relatório comece a ser gravado antes do fim da geração.
+
+        Ao final, registra em `self.time_to_first_token` e `self.latency` os tempos
+        (em segundos) até o primeiro trecho e até o fim do stream.
+
+        Yields:
+            str: Trecho de texto gerado pelo modelo
+        """
+        self.latency = None
+        self.time_to_first_token = None
+        self.invocation_metrics = {}
+        self.usage = {}
+
+        try:
+            start_time = time.perf_counter()
+
+            # Invoca o modelo Bedrock com o corpo da requisição gerado, em modo streaming; apenas
+            # a abertura do stream é repetida, nunca um stream que já entregou trechos
+            reserved_tokens = self.get_estimated_tokens()
+            with stage_timer('invoke'):
+                response, self.retries = call_with_retry(
+                    lambda: self.bedrock_client.invoke_model_with_response_stream(
+                        modelId=self.model_id,
+                        contentType='application/json',
+                        accept='application/json',
+                        body=self.body
+                    ),
+                    self.retry_policy, self.rate_limiter, reserved_tokens,
+                )
+
+            # Percorre os eventos do stream, extraindo os trechos de texto
+            for event in response.get('body'):
+                chunk = event.get('chunk')
+                if not chunk:
+                    continue
+
+                chunk_body = json.loads(chunk.get('bytes'))
+
+                # O último evento traz as métricas da invocação calculadas pelo Bedrock
+                if 'amazon-bedrock-invocationMetrics' in chunk_body:
+                    self.invocation_metrics = chunk_body['amazon-bedrock-invocationMetrics']
+
+                delta = self.extract_stream_delta(chunk_body)
+                if not delta:
+                    continue
+
+                # Registra o tempo até o primeiro token
+                if self.time_to_first_token is None:
+                    self.time_to_first_token = time.perf_counter() - start_time
+                    get_stage_metrics().record('time_to_first_token', self.time_to_first_token)
+                    log_debug(f'Tempo até o primeiro token: {self.time_to_first_token:.3f}s', tag='BEDROCK')
+
+                yield delta
+
+            self.latency = time.perf_counter() - start_time
+            get_stage_metrics().record('stream', self.latency)
+            self.usage = {
+                'input_tokens': self.invocation_metrics.get('inputTokenCount'),
+                'output_tokens': self.invocation_metrics.get('outputTokenCount'),
+                'cache_read_input_tokens': self.invocation_metrics.get('cacheReadInputTokenCount'),
+                'cache_write_input_tokens': self.invocation_metrics.get('cacheWriteInputTokenCount'),
+            }
+            self.record_usage(reserved_tokens)
+            log_debug(f'Stream finalizado em {self.latency:.3f}s', tag='BEDROCK')
+
+        except Exception as e:
+            log_error(f'Ocorreu um erro ao invocar o modelo em streaming: {e}')
+            raise e
+
+    def invoke_model_stream(self, callback=None):
+        """
+        Invoca o modelo em modo streaming, repassando cada trecho ao callback.
+
+        Args:
+            callback (callable): Função chamada com cada trecho de texto (opcional)
+
+        Returns:
+            str: O texto completo gerado pelo modelo Bedrock.
+        """
+        chunks = []
+
+        for delta in self.stream_model():
+            if callback:
+                callback(delta)
+            chunks.append(delta)
+
+        return ''.join(chunks)
+
+    def get_estimated_tokens(self):
+        """
+        Retorna os tokens estimados da requisição (entrada + limite de saída) usados no limitador.
+
+        Returns:
+            int: Tokens estimados
+        """
+        if self.estimated_tokens is None:
+            if isinstance(self.request_body, dict):
+                self.estimated_tokens = self.estimate_request_tokens(self.request_body)
+            else:
+                self.estimated_tokens = len(self.body) // CHARS_PER_TOKEN_ESTIMATE
+        return self.estimated_tokens
+
+    def record_usage(self, reserved_tokens):
+        """
+        Informa ao limitador o consumo real de tokens da invocação.
+
+        Args:
+            reserved_tokens (int): Tokens reservados antes da invocação
+        """
+        if self.rate_limiter is None:
+            return
+
+        input_tokens = self.usage.get('input_tokens')
+        output_tokens = self.usage.get('output_tokens')
+        if input_tokens is not None and output_tokens is not None:
+            self.rate_limiter.record_usage(reserved_tokens, input_tokens + output_tokens)
+
+    @staticmethod
+    def encode_request_body(request_body):
+        """
+        Serializa o corpo da requisição para o envio ao Bedrock.
+
+        Args:
+            request_body (dict | str | bytes): Corpo da requisição
+
+        Returns:
+            bytes | str: Corpo pronto para o parâmetro 'body' do invoke_model
+        """
+        if isinstance(request_body, (bytes, bytearray, str)):
+            return request_body
+        return json.dumps(request_body)
+
+    @staticmethod
+    def estimate_request_tokens(request_body):
+        """
+        Estima os tokens de uma requisição a partir do tamanho do corpo e do limite de saída.
+
+        Args:
+            request_body (dict): Corpo da requisição
+
+        Returns:
+            int: Tokens estimados
+        """
+        inference_config = request_body.get('inferenceConfig') or {}
+        max_output_tokens = (request_body.get('max_tokens') or request_body.get('max_gen_len')
+                             or inference_config.get('max_new_tokens') or 0)
+
+        return BedrockInferenceService._estimate_value_tokens(request_body) + max_output_tokens
+
+    @staticmethod
+    def _estimate_value_tokens(value, key=None):
+        """
+        Estima os tokens de um valor do corpo; imagens em base64 ('data' na Anthropic,
+        'bytes' na Amazon Nova) contam como uma imagem, e não pelo tamanho do texto.
+        """
+        if isinstance(value, dict):
+            return sum(BedrockInferenceService._estimate_value_tokens(item, name) for name, item in value.items())
+        if isinstance(value, list):
+            return sum(BedrockInferenceService._estimate_value_tokens(item) for item in value)
+        if isinstance(value, str):
+            if key in ('data', 'bytes'):
+                return IMAGE_TOKEN_ESTIMATE
+            return len(value) // CHARS_PER_TOKEN_ESTIMATE
+        return 0
+
+    @staticmethod
+    def extract_response_text(response_body):
+        """
+        Extrai o texto gerado do corpo da resposta do modelo.
+
+        Args:
+            response_body (dict): Corpo da resposta já decodificado
+
+        Returns:
+            str: O texto gerado pelo modelo
+        """
+        response_text = None
+
+        # Caso seja um modelo da Anthropic, o texto gerado pode estar em diferentes formatos
+        if response_body.get('content', None):
+            response_text = response_body.get('content')[0]['text']
+
+        # Caso seja um modelo da Amazon, o texto gerado pode estar em um formato diferente
+        if response_body.get('output', None):
+            response_text = response_body['output']['message']['content'][0]['text']
+
+        # Caso seja um modelo da Meta Llama, o texto gerado está no campo 'generation'
+        if 'generation' in response_body:
+            response_text = response_body['generation']
+
+        return response_text
+
+    @staticmethod
+    def extract_usage(response_body):
+        """
+        Extrai o uso de tokens do corpo da resposta do modelo.
+
+        Args:
+            response_body (dict): Corpo da resposta já decodificado
+
+        Returns:
+            dict: {'input_tokens': int, 'output_tokens': int, 'cache_read_input_tokens': int,
+                'cache_write_input_tokens': int}; os campos de cache são None sem cache de prompt
+        """
+        usage = response_body.get('usage') or {}
+
+        # A Meta Llama informa o uso na raiz do corpo (prompt_token_count e generation_token_count)
+        if 'prompt_token_count' in response_body:
+            return {
+                'input_tokens': response_body.get('prompt_token_count'),
+                'output_tokens': response_body.get('generation_token_count'),
+            }
+
+        # A Anthropic usa snake_case (input_tokens) e a Amazon Nova usa camelCase (inputTokens); os
+        # tokens lidos do cache de prompt e gravados nele não são contados em input_tokens
+        return {
+            'input_tokens': usage.get('input_tokens', usage.get('inputTokens')),
+            'output_tokens': usage.get('output_tokens', usage.get('outputTokens')),
+            'cache_read_input_tokens': usage.get('cache_read_input_tokens',
+                                                 usage.get('cacheReadInputTokenCount')),
+            'cache_write_input_tokens': usage.get('cache_creation_input_tokens',
+                                                  usage.get('cacheWriteInputTokenCount')),
+        }
+
+    @staticmethod
+    def extract_stream_delta(chunk_body):
+        """
+        Extrai o trecho de texto de um evento do stream.
+
+        Args:
+            chunk_body (dict): Evento do stream já decodificado
+
+        Returns:
+            str: O trecho de texto, ou None caso o evento não contenha texto
+        """
+        # Formato da Anthropic: {"type": "content_block_delta", "delta": {"type": "text_delta", "text": ...}}
+        if chunk_body.get('type') == 'content_block_delta':
+            return chunk_body.get('delta', {}).get('text')
+
+        # Formato da Amazon Nova: {"contentBlockDelta": {"delta": {"text": ...}}}
+        if 'contentBlockDelta' in chunk_body:
+            return chunk_body['contentBlockDelta'].get('delta', {}).get('text')
+
+        # Formato da Meta Llama: {"generation": ..., "stop_reason": ...}
+        if 'generation' in chunk_body:
+            return chunk_body['generation']
+
+        return None
\ No newline at end of file
@@ -0,0 +1,515 @@
+import os
+import json
+import time
+import hashlib
+import functools
+import threading
+from contextlib import contextmanager
+
+from utils.environment import get_env
+from utils.instrumentation import log_error, log_info, log_warning
+
+# Parâmetros padrão da idempotência (sobrescritos pelo .env)
+DEFAULT_IDEMPOTENCY_STORE = 'file'
+DEFAULT_IDEMPOTENCY_PATH = '/tmp/idempotency'
+DEFAULT_IDEMPOTENCY_TTL = 60 * 60
+DEFAULT_IDEMPOTENCY_LOCK_TIMEOUT = 15 * 60
+DEFAULT_IDEMPOTENCY_WAIT = 60
+DEFAULT_IDEMPOTENCY_POLL_INTERVAL = 0.5
+
+# Folga entre o tempo restante da invocação e o bloqueio/espera (segundos)
+INVOCATION_TIME_MARGIN = 2
+
+# Campos do evento que não identificam o trabalho solicitado (ex: ID gerado a cada reenvio)
+IGNORED_EVENT_FIELDS = ('request_id', 'idempotency_key')
+
+# Estados do registro de um evento
+STATUS_IN_PROGRESS = 'in_progress'
+STATUS_COMPLETED = 'completed'
+
+# Controle de idempotência do processo, criado na primeira chamada a get_idempotency()
+_IDEMPOTENCY = None
+_IDEMPOTENCY_LOCK = threading.Lock()
+
+
+class EventInProgressError(Exception):
+    """
+    O mesmo evento continua em processamento em outra invocação após o tempo de espera.
+    """
+
+    def __init__(self, key):
+        super().__init__(f'Evento duplicado em processamento: {key}')
+        self.key = key
+
+
+def build_idempotency_key(event, ignored_fields=IGNORED_EVENT_FIELDS):
+    """
+    Gera a chave de idempotência: SHA-256 do evento normalizado.
+
+    A normalização ordena as chaves e descarta os campos que não identificam o
+    trabalho (ex: 'request_id') e os campos nulos, de modo que reenvios do mesmo
+    evento (retentativas assíncronas ou duplicatas da origem) gerem a mesma chave.
+
+    Args:
+        event (dict): Evento recebido pela Lambda
+        ignored_fields (tuple): Campos desconsiderados
+
+    Returns:
+        str: Hash hexadecimal do evento
+    """
+    normalized = {name: value for name, value in event.items() if name not in ignored_fields and value is not None}
+    serialized = json.dumps(normalized, sort_keys=True, separators=(',', ':'), ensure_ascii=False, default=str)
+    return hashlib.sha256(serialized.encode('utf-8')).hexdigest()
+
+
+class IdempotencyStore:
+    """
+    Interface dos armazenamentos de idempotência. Cada registro tem o estado
+    ('in_progress' ou 'completed'), o resultado (string JSON, apenas quando concluído)
+    e expires_at, um timestamp Unix em segundos (o mesmo formato do TTL do DynamoDB).
+    """
+    name = 'store'
+
+    def acquire(self, key, expires_at):
+        """
+        Cria o registro 'em andamento' do evento, de forma atômica, caso não exista um
+        registro válido (ausente ou expirado).
+
+        Args:
+            key (str): Chave de idempotência
+            expires_at (float): Expiração do bloqueio
+
+        Returns:
+            dict: None se o bloqueio foi obtido; caso contrário, o registro existente
+        """
+        raise NotImplementedError
+
+    def get(self, key):
+        """
+        Returns:
+            dict: Registro do evento, ou None se ausente ou expirado
+        """
+        raise NotImplementedError
+
+    def complete(self, key, result, expires_at):
+        raise NotImplementedError
+
+    def release(self, key):
+        raise NotImplementedError
+
+
+class MemoryIdempotencyStore(IdempotencyStore):
+    """
+    Armazenamento em memória, restrito ao processo (testes e benchmarks).
+    """
+    name = 'memory'
+
+    def __init__(self):
+        self._records = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, key, expires_at):
+        with self._lock:
+            record = self._records.get(key)
+            if record is not None and record['expires_at'] > time.time():
+                return dict(record)
+
+            self._records[key] = {'status': STATUS_IN_PROGRESS, 'result': None, 'expires_at': expires_at}
+            return None
+
+    def get(self, key):
+        with self._lock:
+            record = self._records.get(key)
+            if record is None or record['expires_at'] <= time.time():
+                return None
+            return dict(record)
+
+    def complete(self, key, result, expires_at):
+        with self._lock:
+            self._records[key] = {'status': STATUS_COMPLETED, 'result': result, 'expires_at': expires_at}
+
+    def release(self, key):
+        with self._lock:
+            self._records.pop(key, None)
+
+
+class FileIdempotencyStore(IdempotencyStore):
+    """
+    Armazenamento em arquivos locais (ex: '/tmp' da Lambda, que sobrevive entre
+    invocações "quentes" do mesmo ambiente de execução), um arquivo JSON por evento.
+
+    A criação do bloqueio é serializada entre processos por um flock no diretório,
+    e cada registro é gravado em um arquivo temporário e renomeado, para que as
+    leituras nunca encontrem um registro incompleto.
+    """
+    name = 'file'
+
+    def __init__(self, path=DEFAULT_IDEMPOTENCY_PATH):
+        """
+        Args:
+            path (str): Diretório dos registros
+        """
+        self.path = path
+        self.lock_path = os.path.join(path, '.lock')
+        self._lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+
+    def acquire(self, key, expires_at):
+        with self._exclusive():
+            record = self.get(key)
+            if record is not None:
+                return record
+
+            self._write(key, {'status': STATUS_IN_PROGRESS, 'result': None, 'expires_at': expires_at})
+            return None
+
+    def get(self, key):
+        try:
+            with open(self._record_path(key), encoding='utf-8') as file:
+                record = json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+        if record['expires_at'] <= time.time():
+            return None
+        return record
+
+    def complete(self, key, result, expires_at):
+        with self._exclusive():
+            self._write(key, {'status': STATUS_COMPLETED, 'result': result, 'expires_at': expires_at})
+
+    def release(self, key):
+        with self._exclusive():
+            try:
+                os.remove(self._record_path(key))
+            except FileNotFoundError:
+                pass
+
+    def _record_path(self, key):
+        return os.path.join(self.path, f'{key}.json')
+
+    def _write(self, key, record):
+        temporary_path = f'{self._record_path(key)}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(temporary_path, 'w', encoding='utf-8') as file:
+            json.dump(record, file, ensure_ascii=False)
+        os.replace(temporary_path, self._record_path(key))
+
+    @contextmanager
+    def _exclusive(self):
+        """
+        Bloqueio exclusivo entre threads e processos sobre o diretório dos registros
+        (o flock é liberado no fechamento do arquivo).
+        """
+        # O fcntl só é importado quando o armazenamento em arquivos é utilizado
+        import fcntl
+
+        with self._lock, open(self.lock_path, 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            yield
+
+
+class DynamoDBIdempotencyStore(IdempotencyStore):
+    """
+    Armazenamento em uma tabela DynamoDB compartilhada entre ambientes de execução.
+
+    A tabela deve ter a chave de partição 'idempotency_key' (string) e, opcionalmente,
+    o TTL do DynamoDB habilitado no atributo 'expires_at'. O bloqueio é obtido com
+    uma gravação condicional (registro ausente ou expirado); como a remoção pelo TTL
+    não é imediata, a expiração também é verificada na leitura.
+    """
+    name = 'dynamodb'
+
+    def __init__(self, table_name, client=None):
+        """
+        Args:
+            table_name (str): Nome da tabela DynamoDB
+            client: Cliente DynamoDB do boto3 (padrão: cliente compartilhado do processo)
+        """
+        if client is None:
+            from services.bedrock_client_registry import get_aws_client
+            client = get_aws_client('dynamodb')
+
+        self.table_name = table_name
+        self.client = client
+
+    def acquire(self, key, expires_at):
+        try:
+            self.client.put_item(
+                TableName=self.table_name,
+                Item={
+                    'idempotency_key': {'S': key},
+                    'status': {'S': STATUS_IN_PROGRESS},
+                    'expires_at': {'N': str(int(expires_at))},
+                },
+                ConditionExpression='attribute_not_exists(idempotency_key) OR expires_at <= :now',
+                ExpressionAttributeValues={':now': {'N': str(int(time.time()))}},
+            )
+            return None
+        except Exception as e:
+            code = (getattr(e, 'response', None) or {}).get('Error', {}).get('Code')
+            if code != 'ConditionalCheckFailedException':
+                raise
+
+        # Registro removido entre a gravação e a leitura: tratado como em andamento até a próxima tentativa
+        return self.get(key) or {'status': STATUS_IN_PROGRESS, 'result': None, 'expires_at': 0}
+
+    def get(self, key):
+        item = self.client.get_item(TableName=self.table_name, Key={'idempotency_key': {'S': key}},
+                                    ConsistentRead=True).get('Item')
+
+        if not item or float(item['expires_at']['N']) <= time.time():
+            return None
+        return {
+            'status': item['status']['S'],
+            'result': item['result']['S'] if 'result' in item else None,
+            'expires_at': float(item['expires_at']['N']),
+        }
+
+    def complete(self, key, result, expires_at):
+        self.client.put_item(TableName=self.table_name, Item={
+            'idempotency_key': {'S': key},
+            'status': {'S': STATUS_COMPLETED},
+            'result': {'S': result},
+            'expires_at': {'N': str(int(expires_at))},
+        })
+
+    def release(self, key):
+        self.client.delete_item(TableName=self.table_name, Key={'idempotency_key': {'S': key}})
+
+
+class Idempotency:
+    """
+    Executa cada evento no máximo uma vez enquanto o resultado estiver válido.
+
+    A primeira invocação de um evento grava um registro 'em andamento' e executa o
+    processamento; invocações concorrentes do mesmo evento aguardam o resultado da
+    primeira (sem uma nova chamada ao Bedrock), e as posteriores recebem o resultado
+    gravado até a expiração. Falhas liberam o registro, permitindo novas tentativas.
+    Falhas do armazenamento são registradas e o evento é processado normalmente.
+    """
+
+    def __init__(self, store, ttl=DEFAULT_IDEMPOTENCY_TTL, lock_timeout=DEFAULT_IDEMPOTENCY_LOCK_TIMEOUT,
+                 wait_timeout=DEFAULT_IDEMPOTENCY_WAIT, poll_interval=DEFAULT_IDEMPOTENCY_POLL_INTERVAL,
+                 sleep=time.sleep):
+        """
+        Args:
+            store (IdempotencyStore): Armazenamento dos registros
+            ttl (float): Tempo de vida dos resultados gravados, em segundos
+            lock_timeout (float): Expiração do registro 'em andamento' (ex: uma invocação interrompida)
+            wait_timeout (float): Tempo máximo de espera pelo resultado de um evento em andamento
+            poll_interval (float): Intervalo entre as consultas durante a espera
+            sleep (callable): Função de espera (substituível em benchmarks)
+        """
+        self.store = store
+        self.ttl = ttl
+        self.lock_timeout = lock_timeout
+        self.wait_timeout = wait_timeout
+        self.poll_interval = poll_interval
+        self.sleep = sleep
+
+        self._stats_lock = threading.Lock()
+        self.stats = {'executions': 0, 'replays': 0, 'waits': 0, 'in_progress': 0, 'errors': 0}
+
+    def run(self, key, func, should_store=None, lock_timeout=None, wait_timeout=None):
+        """
+        Executa func() para o evento, ou retorna o resultado de uma execução anterior.
+
+        Args:
+            key (str): Chave gerada por build_idempotency_key()
+            func (callable): Processamento do evento; o resultado deve ser serializável em JSON
+            should_store (callable): Indica se o resultado deve ser gravado (padrão: sempre);
+                resultados não gravados liberam o registro para novas tentativas
+            lock_timeout (float): Expiração do registro 'em andamento' (padrão: lock_timeout)
+            wait_timeout (float): Tempo máximo de espera (padrão: wait_timeout)
+
+        Returns:
+            Resultado de func(), da execução atual ou de uma anterior
+
+        Raises:
+            EventInProgressError: O evento continua em andamento após o tempo de espera
+        """
+        lock_timeout = self.lock_timeout if lock_timeout is None else lock_timeout
+        wait_timeout = self.wait_timeout if wait_timeout is None else wait_timeout
+        deadline = time.monotonic() + wait_timeout
+        waited = False
+
+        while True:
+            try:
+                record = self.store.acquire(key, time.time() + lock_timeout)
+            except Exception as e:
+                log_error(f'Falha ao consultar o armazenamento de idempotência ({self.store.name}): {e}')
+                self._count('errors')
+                return func()
+
+            if record is None:
+                return self._execute(key, func, should_store)
+
+            if record['status'] == STATUS_COMPLETED:
+                self._count('replays')
+                log_info('Evento duplicado: resultado de uma execução anterior reaproveitado', tag='IDEMPOTENCY',
+                         key=key)
+                return json.loads(record['result'])
+
+            # Evento em andamento em outra invocação: aguarda o resultado ou a expiração do bloqueio
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self._count('in_progress')
+                log_warning('Evento duplicado ainda em processamento', tag='IDEMPOTENCY', key=key)
+                raise EventInProgressError(key)
+
+            if not waited:
+                waited = True
+                self._count('waits')
+            self.sleep(min(self.poll_interval, remaining))
+
+    def _execute(self, key, func, should_store):
+        """
+        Executa o evento com o bloqueio obtido e grava (ou libera) o registro.
+        """
+        self._count('executions')
+        try:
+            result = func()
+        except BaseException:
+            self._release(key)
+            raise
+
+        if should_store is not None and not should_store(result):
+            self._release(key)
+            return result
+
+        try:
+            self.store.complete(key, json.dumps(result, ensure_ascii=False), time.time() + self.ttl)
+        except Exception as e:
+            log_error(f'Falha ao gravar o resultado no armazenamento de idempotência ({self.store.name}): {e}')
+            self._count('errors')
+            self._release(key)
+
+        return result
+
+    def _release(self, key):
+        try:
+            self.store.release(key)
+        except Exception as e:
+            # O registro 'em andamento' expira após lock_timeout
+            log_error(f'Falha ao liberar o registro de idempotência ({self.store.name}): {e}')
+            self._count('errors')
+
+    def get_stats(self):
+        """
+        Returns:
+            dict: Contadores de execuções, resultados reaproveitados, esperas, eventos
+                ainda em andamento após a espera e erros do armazenamento
+        """
+        with self._stats_lock:
+            return dict(self.stats)
+
+    def _count(self, name):
+        with self._stats_lock:
+            self.stats[name] += 1
+
+
+def build_idempotency_store(store_name=None):
+    """
+    Cria o armazenamento configurado no .env (IDEMPOTENCY_STORE).
+
+    Args:
+        store_name (str): 'file', 'dynamodb' ou 'memory'
+
+    Returns:
+        IdempotencyStore: Armazenamento dos registros
+    """
+    store_name = (store_name or get_env('IDEMPOTENCY_STORE', DEFAULT_IDEMPOTENCY_STORE)).lower()
+
+    if store_name == 'file':
+        return FileIdempotencyStore(get_env('IDEMPOTENCY_PATH', DEFAULT_IDEMPOTENCY_PATH))
+    elif store_name == 'dynamodb':
+        return DynamoDBIdempotencyStore(get_env('IDEMPOTENCY_TABLE'))
+    elif store_name == 'memory':
+        return MemoryIdempotencyStore()
+
+    raise ValueError(f'Armazenamento de idempotência desconhecido: {store_name}')
+
+
+def get_idempotency():
+    """
+    Retorna o controle de idempotência do processo, criando-o na primeira chamada.
+
+    Returns:
+        Idempotency: Controle compartilhado, ou None se desabilitado (IDEMPOTENCY_ENABLED=false)
+            ou se o armazenamento não puder ser criado
+    """
+    global _IDEMPOTENCY
+
+    if get_env('IDEMPOTENCY_ENABLED', 'true').lower() != 'true':
+        return None
+
+    if _IDEMPOTENCY is None:
+        with _IDEMPOTENCY_LOCK:
+            if _IDEMPOTENCY is None:
+                try:
+                    store = build_idempotency_store()
+                except Exception as e:
+                    # Sem armazenamento, os eventos são processados sem deduplicação
+                    log_error(f'Falha ao criar o armazenamento de idempotência: {e}')
+                    return None
+
+                _IDEMPOTENCY = Idempotency(
+                    store,
+                    ttl=float(get_env('IDEMPOTENCY_TTL_SECONDS', DEFAULT_IDEMPOTENCY_TTL)),
+                    wait_timeout=float(get_env('IDEMPOTENCY_WAIT_SECONDS', DEFAULT_IDEMPOTENCY_WAIT)),
+                    poll_interval=float(get_env('IDEMPOTENCY_POLL_INTERVAL_SECONDS',
+                                                DEFAULT_IDEMPOTENCY_POLL_INTERVAL)),
+                )
+
+    return _IDEMPOTENCY
+
+
+def clear_idempotency():
+    """
+    Descarta o controle de idempotência do processo (os registros gravados não são apagados).
+    """
+    global _IDEMPOTENCY
+
+    with _IDEMPOTENCY_LOCK:
+        _IDEMPOTENCY = None
+
+
+def idempotent(key_func, should_store=None):
+    """
+    Decorador que aplica a idempotência a um handler da Lambda (event, context).
+
+    O bloqueio dura o tempo restante da invocação (context.get_remaining_time_in_millis),
+    e a espera por um evento em andamento termina antes do fim da invocação; nesse
+    caso o handler responde 409, sem nova tentativa da invocação assíncrona.
+
+    Args:
+        key_func (callable): Gera a chave do evento, ou None para processá-lo sem deduplicação
+        should_store (callable): Indica se a resposta deve ser gravada (padrão: sempre)
+    """
+    def decorator(handler):
+        @functools.wraps(handler)
+        def wrapper(event, context):
+            idempotency = get_idempotency()
+            key = key_func(event) if idempotency is not None else None
+            if key is None:
+                return handler(event, context)
+
+            lock_timeout = wait_timeout = None
+            if hasattr(context, 'get_remaining_time_in_millis'):
+                remaining = context.get_remaining_time_in_millis() / 1000
+                lock_timeout = remaining + INVOCATION_TIME_MARGIN
+                wait_timeout = max(0, min(idempotency.wait_timeout, remaining - INVOCATION_TIME_MARGIN))
+
+            try:
+                return idempotency.run(key, lambda: handler(event, context), should_store=should_store,
+                                       lock_timeout=lock_timeout, wait_timeout=wait_timeout)
+            except EventInProgressError:
+                return {
+                    'statusCode': 409,
+                    'body': json.dumps({
+                        'message': 'Evento duplicado em processamento',
+                        'idempotency_key': key,
+                    }),
+                }
+        return wrapper
+    return decorator
@@ -0,0 +1,253 @@
+import time
+import threading
+
+from utils.environment import get_env
+from utils.instrumentation import log_debug
+
+# Cotas padrão por modelo (sobrescritas pelo .env); 0 desabilita o limite correspondente
+DEFAULT_REQUESTS_PER_MINUTE = 100
+DEFAULT_TOKENS_PER_MINUTE = 200_000
+
+# Ajuste AIMD: redução multiplicativa a cada throttling e aumento aditivo a cada sucesso
+DEFAULT_DECREASE_FACTOR = 0.7
+DEFAULT_INCREASE_STEP = 0.02
+DEFAULT_MIN_RATE_FACTOR = 0.05
+DEFAULT_DECREASE_COOLDOWN = 2.0
+
+# Rajada máxima aceita pelos baldes, em segundos de cota
+DEFAULT_BURST_SECONDS = 1.0
+
+# Limitadores do processo, um por modelo, compartilhados por todos os chamadores
+_RATE_LIMITERS = {}
+_RATE_LIMITERS_LOCK = threading.Lock()
+
+
+class TokenBucket:
+    """
+    Balde de fichas (token bucket) com reposição contínua, seguro entre threads.
+    """
+
+    def __init__(self, rate_per_minute, capacity=None, clock=time.monotonic, sleep=time.sleep):
+        """
+        Args:
+            rate_per_minute (float): Fichas repostas por minuto
+            capacity (float): Máximo de fichas acumuladas (padrão: DEFAULT_BURST_SECONDS de cota)
+            clock (callable): Relógio monotônico (substituível em benchmarks)
+            sleep (callable): Função de espera (substituível em benchmarks)
+        """
+        self.rate_per_minute = float(rate_per_minute)
+        self.capacity = float(capacity or max(1.0, rate_per_minute * DEFAULT_BURST_SECONDS / 60))
+        self.tokens = self.capacity
+        self.clock = clock
+        self.sleep = sleep
+        self._updated_at = clock()
+        self._lock = threading.Lock()
+
+    def set_rate(self, rate_per_minute):
+        with self._lock:
+            self._refill()
+            self.rate_per_minute = float(rate_per_minute)
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated_at) * self.rate_per_minute / 60)
+        self._updated_at = now
+
+    def acquire(self, amount=1):
+        """
+        Retira fichas do balde, aguardando a reposição quando necessário.
+
+        Pedidos maiores que a capacidade aguardam apenas o balde encher e deixam o
+        saldo negativo; a dívida é paga pelas requisições seguintes, mantendo a taxa
+        média sem bloquear para sempre uma requisição grande.
+
+        Args:
+            amount (float): Quantidade de fichas
+
+        Returns:
+            float: Tempo de espera, em segundos
+        """
+        required = min(float(amount), self.capacity)
+        waited = 0.0
+
+        while True:
+            with self._lock:
+                self._refill()
+                if self.tokens >= required:
+                    self.tokens -= amount
+                    return waited
+                wait = (required - self.tokens) * 60 / max(self.rate_per_minute, 1e-9)
+
+            self.sleep(wait)
+            waited += wait
+
+    def refund(self, amount):
+        """
+        Ajusta o saldo após conhecer o consumo real (valores negativos cobram a diferença).
+        """
+        with self._lock:
+            self._refill()
+            self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class ModelRateLimiter:
+    """
+    Limitador de requisições/min e tokens/min de um modelo, com ajuste AIMD.
+
+    Cada throttling reduz multiplicativamente as taxas (no máximo uma vez por janela
+    de cooldown, para que uma rajada de erros simultâneos conte como um único sinal)
+    e cada sucesso as aumenta aditivamente até as cotas configuradas. Assim a vazão
+    converge para a cota real da conta em vez de alternar entre ocioso e throttling.
+    """
+
+    def __init__(self, model_id, requests_per_minute=DEFAULT_REQUESTS_PER_MINUTE,
+                 tokens_per_minute=DEFAULT_TOKENS_PER_MINUTE, decrease_factor=DEFAULT_DECREASE_FACTOR,
+                 increase_step=DEFAULT_INCREASE_STEP, min_rate_factor=DEFAULT_MIN_RATE_FACTOR,
+                 decrease_cooldown=DEFAULT_DECREASE_COOLDOWN, clock=time.monotonic, sleep=time.sleep):
+        """
+        Args:
+            model_id (str): ID do modelo Bedrock
+            requests_per_minute (float): Cota de requisições por minuto (0 desabilita)
+            tokens_per_minute (float): Cota de tokens por minuto (0 desabilita)
+            decrease_factor (float): Fator aplicado às taxas a cada throttling
+            increase_step (float): Fração da cota somada às taxas a cada sucesso
+            min_rate_factor (float): Fração mínima da cota mantida após reduções
+            decrease_cooldown (float): Intervalo mínimo, em segundos, entre reduções
+        """
+        self.model_id = model_id
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.decrease_factor = decrease_factor
+        self.increase_step = increase_step
+        self.min_rate_factor = min_rate_factor
+        self.decrease_cooldown = decrease_cooldown
+        self.clock = clock
+
+        self.rate_factor = 1.0
+        self.throttles = 0
+        self._last_decrease = None
+        self._lock = threading.Lock()
+
+        self.request_bucket = TokenBucket(requests_per_minute, clock=clock, sleep=sleep) if requests_per_minute else None
+        self.token_bucket = TokenBucket(tokens_per_minute, clock=clock, sleep=sleep) if tokens_per_minute else None
+
+    def acquire(self, tokens=0):
+        """
+        Aguarda a liberação de uma requisição com o número estimado de tokens.
+
+        Args:
+            tokens (int): Tokens estimados da requisição (entrada + saída máxima)
+
+        Returns:
+            float: Tempo de espera, em segundos
+        """
+        waited = 0.0
+        if self.request_bucket:
+            waited += self.request_bucket.acquire(1)
+        if self.token_bucket and tokens:
+            waited += self.token_bucket.acquire(tokens)
+        return waited
+
+    def record_usage(self, reserved_tokens, used_tokens):
+        """
+        Corrige o balde de tokens com o consumo real informado pelo Bedrock.
+
+        Args:
+            reserved_tokens (int): Tokens retirados em acquire()
+            used_tokens (int): Tokens efetivamente consumidos
+        """
+        if self.token_bucket and used_tokens is not None:
+            self.token_bucket.refund(reserved_tokens - used_tokens)
+
+    def release(self, reserved_tokens):
+        """
+        Devolve ao balde os tokens reservados por uma tentativa que falhou.
+
+        Uma requisição rejeitada (ex: throttling) não consome tokens da cota; sem a
+        devolução, cada nova tentativa retiraria a reserva outra vez e a dívida
+        acumulada atrasaria as requisições seguintes.
+
+        Args:
+            reserved_tokens (int): Tokens retirados em acquire()
+        """
+        if self.token_bucket and reserved_tokens:
+            self.token_bucket.refund(reserved_tokens)
+
+    def on_success(self):
+        """
+        Aumento aditivo das taxas após uma requisição bem-sucedida.
+        """
+        with self._lock:
+            if self.rate_factor < 1.0:
+                self._set_rate_factor(min(1.0, self.rate_factor + self.increase_step))
+
+    def on_throttle(self):
+        """
+        Redução multiplicativa das taxas após um throttling.
+        """
+        with self._lock:
+            self.throttles += 1
+            now = self.clock()
+            if self._last_decrease is not None and now - self._last_decrease < self.decrease_cooldown:
+                return
+
+            self._last_decrease = now
+            self._set_rate_factor(max(self.min_rate_factor, self.rate_factor * self.decrease_factor))
+            log_debug(f'Throttling em {self.model_id}: taxa reduzida para '
+                      f'{self.rate_factor:.0%} da cota', tag='BEDROCK')
+
+    def _set_rate_factor(self, rate_factor):
+        self.rate_factor = rate_factor
+        if self.request_bucket:
+            self.request_bucket.set_rate(self.requests_per_minute * rate_factor)
+        if self.token_bucket:
+            self.token_bucket.set_rate(self.tokens_per_minute * rate_factor)
+
+
+def get_rate_limiter(model_id):
+    """
+    Retorna o limitador compartilhado do modelo, criando-o na primeira chamada.
+
+    As cotas vêm do .env (BEDROCK_REQUESTS_PER_MINUTE e BEDROCK_TOKENS_PER_MINUTE);
+    use register_rate_limiter() para cotas específicas de um modelo.
+
+    Args:
+        model_id (str): ID do modelo Bedrock
+
+    Returns:
+        ModelRateLimiter: Limitador do modelo
+    """
+    limiter = _RATE_LIMITERS.get(model_id)
+    if limiter is not None:
+        return limiter
+
+    with _RATE_LIMITERS_LOCK:
+        limiter = _RATE_LIMITERS.get(model_id)
+        if limiter is None:
+            limiter = ModelRateLimiter(
+                model_id,
+                requests_per_minute=float(get_env('BEDROCK_REQUESTS_PER_MINUTE', DEFAULT_REQUESTS_PER_MINUTE)),
+                tokens_per_minute=float(get_env('BEDROCK_TOKENS_PER_MINUTE', DEFAULT_TOKENS_PER_MINUTE)),
+            )
+            _RATE_LIMITERS[model_id] = limiter
+
+    return limiter
+
+
+def register_rate_limiter(limiter):
+    """
+    Registra (ou substitui) o limitador de um modelo.
+
+    Args:
+        limiter (ModelRateLimiter): Limitador a ser registrado
+    """
+    with _RATE_LIMITERS_LOCK:
+        _RATE_LIMITERS[limiter.model_id] = limiter
+
+
+def clear_rate_limiters():
+    """
+    Remove todos os limitadores do processo (usado em benchmarks).
+    """
+    with _RATE_LIMITERS_LOCK:
+        _RATE_LIMITERS.clear()
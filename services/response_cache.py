@@ -0,0 +1,406 @@
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+from utils.environment import get_env
+from utils.instrumentation import log_error
+
+# Parâmetros padrão do cache de respostas (sobrescritos pelo .env)
+DEFAULT_CACHE_BACKEND = 'sqlite'
+DEFAULT_CACHE_PATH = '/tmp/bedrock_response_cache.sqlite3'
+DEFAULT_CACHE_TTL = 24 * 60 * 60
+DEFAULT_CACHE_MAX_ENTRIES = 256
+DEFAULT_CACHE_MAX_BYTES = 32 * 1024 * 1024
+
+# Cache de respostas do processo, criado na primeira chamada a get_response_cache()
+_RESPONSE_CACHE = None
+_RESPONSE_CACHE_LOCK = threading.Lock()
+
+
+def canonicalize_request_body(request_body):
+    """
+    Serializa o corpo da requisição de forma estável (chaves ordenadas, sem espaços).
+
+    Args:
+        request_body (dict | str | bytes): Corpo da requisição
+
+    Returns:
+        bytes: Corpo canônico
+    """
+    if isinstance(request_body, (bytes, bytearray)):
+        return bytes(request_body)
+    if isinstance(request_body, str):
+        return request_body.encode('utf-8')
+    return json.dumps(request_body, sort_keys=True, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def build_cache_key(model_id, request_body):
+    """
+    Gera a chave do cache: SHA-256 do ID do modelo e do corpo canônico da requisição.
+
+    Args:
+        model_id (str): ID do modelo Bedrock
+        request_body (dict | str | bytes): Corpo da requisição
+
+    Returns:
+        str: Hash hexadecimal da requisição
+    """
+    digest = hashlib.sha256(model_id.encode('utf-8'))
+    digest.update(b'\n')
+    digest.update(canonicalize_request_body(request_body))
+    return digest.hexdigest()
+
+
+class MemoryCache:
+    """
+    Camada em memória (LRU) com limite de entradas, de bytes e expiração por TTL.
+    """
+
+    def __init__(self, max_entries=DEFAULT_CACHE_MAX_ENTRIES, max_bytes=DEFAULT_CACHE_MAX_BYTES):
+        """
+        Args:
+            max_entries (int): Número máximo de respostas em memória
+            max_bytes (int): Tamanho máximo, em bytes, das respostas em memória
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.size_bytes = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            value, size, expires_at = entry
+            if expires_at <= time.time():
+                self._remove(key)
+                return None
+
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value, size, expires_at):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+            # Respostas maiores que a camada inteira não são mantidas em memória
+            if size > self.max_bytes:
+                return
+
+            self._entries[key] = (value, size, expires_at)
+            self.size_bytes += size
+
+            # Remove as entradas menos usadas até respeitar os limites
+            while len(self._entries) > self.max_entries or self.size_bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size_bytes = 0
+
+    def _remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        self.size_bytes -= size
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class CacheBackend:
+    """
+    Interface da camada persistente do cache. Os valores são strings JSON e
+    expires_at é um timestamp Unix em segundos (o mesmo formato do TTL do DynamoDB).
+    """
+    name = 'backend'
+
+    def get(self, key):
+        """
+        Returns:
+            tuple: (valor armazenado, expires_at), ou None se ausente ou expirado
+        """
+        raise NotImplementedError
+
+    def put(self, key, value, expires_at):
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+
+class SQLiteCacheBackend(CacheBackend):
+    """
+    Camada persistente em um arquivo SQLite local (ex: '/tmp' da Lambda, que sobrevive
+    entre invocações "quentes" do mesmo ambiente de execução).
+    """
+    name = 'sqlite'
+
+    def __init__(self, path=DEFAULT_CACHE_PATH):
+        """
+        Args:
+            path (str): Caminho do arquivo SQLite
+        """
+        # O sqlite3 só é importado quando a camada persistente é utilizada
+        import sqlite3
+
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute(
+            'CREATE TABLE IF NOT EXISTS response_cache '
+            '(cache_key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)'
+        )
+        self.purge_expired()
+
+    def get(self, key):
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT value, expires_at FROM response_cache WHERE cache_key = ?', (key,)
+            ).fetchone()
+
+        if row is None:
+            return None
+        if row[1] <= time.time():
+            self.delete(key)
+            return None
+        return row[0], row[1]
+
+    def put(self, key, value, expires_at):
+        with self._lock:
+            self._connection.execute(
+                'INSERT OR REPLACE INTO response_cache (cache_key, value, expires_at) VALUES (?, ?, ?)',
+                (key, value, expires_at),
+            )
+
+    def delete(self, key):
+        with self._lock:
+            self._connection.execute('DELETE FROM response_cache WHERE cache_key = ?', (key,))
+
+    def purge_expired(self):
+        """
+        Remove as entradas expiradas do arquivo.
+        """
+        with self._lock:
+            self._connection.execute('DELETE FROM response_cache WHERE expires_at <= ?', (time.time(),))
+
+
+class DynamoDBCacheBackend(CacheBackend):
+    """
+    Camada persistente em uma tabela DynamoDB compartilhada entre ambientes de execução.
+
+    A tabela deve ter a chave de partição 'cache_key' (string) e, opcionalmente, o TTL
+    do DynamoDB habilitado no atributo 'expires_at'. Como a remoção pelo TTL não é
+    imediata, a expiração também é verificada na leitura.
+    """
+    name = 'dynamodb'
+
+    def __init__(self, table_name, client=None):
+        """
+        Args:
+            table_name (str): Nome da tabela DynamoDB
+            client: Cliente DynamoDB do boto3 (padrão: cliente compartilhado do processo)
+        """
+        if client is None:
+            from services.bedrock_client_registry import get_aws_client
+            client = get_aws_client('dynamodb')
+
+        self.table_name = table_name
+        self.client = client
+
+    def get(self, key):
+        item = self.client.get_item(TableName=self.table_name, Key={'cache_key': {'S': key}}).get('Item')
+
+        if not item:
+            return None
+        expires_at = float(item['expires_at']['N'])
+        if expires_at <= time.time():
+            return None
+        return item['value']['S'], expires_at
+
+    def put(self, key, value, expires_at):
+        self.client.put_item(TableName=self.table_name, Item={
+            'cache_key': {'S': key},
+            'value': {'S': value},
+            'expires_at': {'N': str(int(expires_at))},
+        })
+
+    def delete(self, key):
+        self.client.delete_item(TableName=self.table_name, Key={'cache_key': {'S': key}})
+
+
+class ResponseCache:
+    """
+    Cache de respostas do Bedrock endereçado pelo conteúdo da requisição.
+
+    Consulta primeiro a camada em memória e depois a camada persistente (quando
+    configurada), promovendo para a memória as respostas encontradas no disco.
+    Falhas da camada persistente são registradas e tratadas como miss, sem
+    interromper a inferência.
+    """
+
+    def __init__(self, backend=None, ttl=DEFAULT_CACHE_TTL, max_entries=DEFAULT_CACHE_MAX_ENTRIES,
+                 max_bytes=DEFAULT_CACHE_MAX_BYTES):
+        """
+        Args:
+            backend (CacheBackend): Camada persistente (opcional)
+            ttl (float): Tempo de vida das respostas, em segundos
+            max_entries (int): Número máximo de respostas em memória
+            max_bytes (int): Tamanho máximo, em bytes, das respostas em memória
+        """
+        self.backend = backend
+        self.ttl = ttl
+        self.memory = MemoryCache(max_entries, max_bytes)
+
+        self._stats_lock = threading.Lock()
+        self.stats = {'memory_hits': 0, 'backend_hits': 0, 'misses': 0, 'stores': 0, 'errors': 0}
+
+    def get(self, key):
+        """
+        Busca uma resposta no cache.
+
+        Args:
+            key (str): Chave gerada por build_cache_key()
+
+        Returns:
+            dict: Resposta armazenada ({'text': ..., 'usage': ...}), ou None
+        """
+        value = self.memory.get(key)
+        if value is not None:
+            self._count('memory_hits')
+            return value
+
+        if self.backend is not None:
+            try:
+                entry = self.backend.get(key)
+            except Exception as e:
+                log_error(f'Falha ao consultar o cache de respostas ({self.backend.name}): {e}')
+                self._count('errors')
+                entry = None
+
+            if entry is not None:
+                # A resposta promovida mantém a expiração gravada na camada persistente,
+                # sem estender o TTL a cada promoção
+                serialized, expires_at = entry
+                value = json.loads(serialized)
+                self.memory.put(key, value, len(serialized), expires_at)
+                self._count('backend_hits')
+                return value
+
+        self._count('misses')
+        return None
+
+    def put(self, key, value):
+        """
+        Armazena uma resposta nas duas camadas do cache.
+
+        Args:
+            key (str): Chave gerada por build_cache_key()
+            value (dict): Resposta a ser armazenada (serializável em JSON)
+        """
+        serialized = json.dumps(value, ensure_ascii=False)
+        expires_at = time.time() + self.ttl
+
+        self.memory.put(key, value, len(serialized), expires_at)
+
+        if self.backend is not None:
+            try:
+                self.backend.put(key, serialized, expires_at)
+            except Exception as e:
+                log_error(f'Falha ao gravar no cache de respostas ({self.backend.name}): {e}')
+                self._count('errors')
+
+        self._count('stores')
+
+    def get_stats(self):
+        """
+        Retorna as métricas de acerto do cache.
+
+        Returns:
+            dict: Contadores de hits, misses, gravações, erros e a taxa de acerto
+        """
+        with self._stats_lock:
+            stats = dict(self.stats)
+
+        lookups = stats['memory_hits'] + stats['backend_hits'] + stats['misses']
+        stats['hit_rate'] = (stats['memory_hits'] + stats['backend_hits']) / lookups if lookups else 0.0
+        stats['memory_entries'] = len(self.memory)
+        stats['memory_bytes'] = self.memory.size_bytes
+        stats['evictions'] = self.memory.evictions
+        return stats
+
+    def _count(self, name):
+        with self._stats_lock:
+            self.stats[name] += 1
+
+
+def build_cache_backend(backend_name=None):
+    """
+    Cria a camada persistente configurada no .env (RESPONSE_CACHE_BACKEND).
+
+    Args:
+        backend_name (str): 'sqlite', 'dynamodb' ou 'memory' (sem camada persistente)
+
+    Returns:
+        CacheBackend: Camada persistente, ou None
+    """
+    backend_name = (backend_name or get_env('RESPONSE_CACHE_BACKEND', DEFAULT_CACHE_BACKEND)).lower()
+
+    if backend_name == 'sqlite':
+        return SQLiteCacheBackend(get_env('RESPONSE_CACHE_PATH', DEFAULT_CACHE_PATH))
+    elif backend_name == 'dynamodb':
+        return DynamoDBCacheBackend(get_env('RESPONSE_CACHE_TABLE'))
+    elif backend_name == 'memory':
+        return None
+
+    raise ValueError(f'Backend de cache desconhecido: {backend_name}')
+
+
+def get_response_cache():
+    """
+    Retorna o cache de respostas do processo, criando-o na primeira chamada.
+
+    Returns:
+        ResponseCache: Cache compartilhado, ou None se desabilitado (RESPONSE_CACHE_ENABLED=false)
+    """
+    global _RESPONSE_CACHE
+
+    if get_env('RESPONSE_CACHE_ENABLED', 'true').lower() != 'true':
+        return None
+
+    if _RESPONSE_CACHE is None:
+        with _RESPONSE_CACHE_LOCK:
+            if _RESPONSE_CACHE is None:
+                try:
+                    backend = build_cache_backend()
+                except Exception as e:
+                    # Sem a camada persistente, o cache continua funcionando apenas em memória
+                    log_error(f'Falha ao criar a camada persistente do cache: {e}')
+                    backend = None
+
+                _RESPONSE_CACHE = ResponseCache(
+                    backend=backend,
+                    ttl=float(get_env('RESPONSE_CACHE_TTL_SECONDS', DEFAULT_CACHE_TTL)),
+                    max_entries=int(get_env('RESPONSE_CACHE_MAX_ENTRIES', DEFAULT_CACHE_MAX_ENTRIES)),
+                    max_bytes=int(get_env('RESPONSE_CACHE_MAX_BYTES', DEFAULT_CACHE_MAX_BYTES)),
+                )
+
+    return _RESPONSE_CACHE
+
+
+def clear_response_cache():
+    """
+    Descarta o cache de respostas do processo (a camada persistente não é apagada).
+    """
+    global _RESPONSE_CACHE
+
+    with _RESPONSE_CACHE_LOCK:
+        _RESPONSE_CACHE = None
@@ -0,0 +1,356 @@
+import io
+import json
+import gzip
+import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.environment import get_env
+from utils.instrumentation import log_error
+from services.retry_policy import RetryPolicy, classify_error
+
+# Parâmetros padrão da gravação dos resultados (sobrescritos pelo .env)
+DEFAULT_RESULTS_PREFIX = 'results/'
+DEFAULT_RESULTS_INLINE_MAX_BYTES = 64 * 1024
+DEFAULT_RESULTS_FLUSH_TIMEOUT = 30
+DEFAULT_RESULTS_PART_SIZE = 8 * 1024 * 1024
+
+# Nível do gzip: o nível 9 é ~4x mais lento que o 6 para uma redução de ~2% no tamanho
+RESULTS_GZIP_LEVEL = 6
+
+# Limites do DynamoDB: itens por BatchWriteItem e tamanho máximo de um item (400 KB),
+# com margem para a chave e os demais atributos
+DYNAMODB_BATCH_SIZE = 25
+DYNAMODB_MAX_PAYLOAD_BYTES = 350 * 1024
+
+# Tamanho mínimo de uma parte do upload multipart do S3 (exceto a última)
+S3_MIN_PART_SIZE = 5 * 1024 * 1024
+S3_MAX_PART_WORKERS = 4
+
+# Erros de limite de capacidade do DynamoDB, tratados como throttling
+DYNAMODB_THROTTLING_ERROR_CODES = {'ProvisionedThroughputExceededException', 'RequestLimitExceeded',
+                                   'ThrottlingException'}
+
+# Gravador de resultados do processo, criado na primeira chamada a get_results_sink()
+_RESULTS_SINK = None
+_RESULTS_SINK_LOCK = threading.Lock()
+
+
+def classify_write_error(error):
+    """
+    Classifica uma exceção do DynamoDB ou do S3 quanto à possibilidade de nova tentativa.
+
+    Returns:
+        str: Classe do erro (ver classify_error), ou None se o erro for definitivo
+    """
+    code = (getattr(error, 'response', None) or {}).get('Error', {}).get('Code')
+    if code in DYNAMODB_THROTTLING_ERROR_CODES:
+        return 'throttling'
+    return classify_error(error)
+
+
+class ResultsSink:
+    """
+    Grava os resultados das inferências no DynamoDB e/ou no S3 em segundo plano.
+
+    put() apenas enfileira o resultado; uma thread de gravação agrupa os itens
+    pendentes em chamadas BatchWriteItem (até 25 itens, repetindo os itens não
+    processados com backoff), enquanto a próxima inferência já está em execução.
+    flush() aguarda a fila esvaziar e deve ser chamado antes do fim da invocação,
+    pois o ambiente da Lambda é congelado após o retorno do handler.
+
+    Resultados maiores que `inline_bytes` são comprimidos com gzip; os que não
+    cabem em um item do DynamoDB mesmo comprimidos (ex: relatórios HTML grandes)
+    são enviados ao S3 (com upload multipart acima de `part_size`), e o item
+    guarda apenas o URI do objeto. Sem tabela configurada, todos os resultados
+    são gravados no S3.
+    """
+
+    def __init__(self, table_name=None, bucket=None, prefix=DEFAULT_RESULTS_PREFIX, dynamodb_client=None,
+                 s3_client=None, inline_bytes=DEFAULT_RESULTS_INLINE_MAX_BYTES, part_size=DEFAULT_RESULTS_PART_SIZE,
+                 policy=None):
+        """
+        Args:
+            table_name (str): Tabela DynamoDB com a chave de partição 'result_id' (string)
+            bucket (str): Bucket dos resultados grandes (ou de todos, sem tabela)
+            prefix (str): Prefixo das chaves dos objetos no bucket
+            dynamodb_client: Cliente DynamoDB do boto3 (padrão: cliente compartilhado do processo)
+            s3_client: Cliente S3 do boto3 (padrão: cliente compartilhado do processo)
+            inline_bytes (int): Tamanho máximo do resultado gravado sem compressão
+            part_size (int): Tamanho das partes do upload multipart (mínimo de 5 MB)
+            policy (RetryPolicy): Política de novas tentativas das gravações
+        """
+        if not table_name and not bucket:
+            raise ValueError('Informe a tabela DynamoDB e/ou o bucket S3 dos resultados')
+
+        if table_name and dynamodb_client is None:
+            from services.bedrock_client_registry import get_aws_client
+            dynamodb_client = get_aws_client('dynamodb')
+        if bucket and s3_client is None:
+            from services.bedrock_client_registry import get_aws_client
+            s3_client = get_aws_client('s3')
+
+        self.table_name = table_name
+        self.bucket = bucket
+        self.prefix = prefix
+        self.dynamodb_client = dynamodb_client
+        self.s3_client = s3_client
+        self.inline_bytes = inline_bytes
+        self.part_size = max(S3_MIN_PART_SIZE, part_size)
+        self.policy = policy or RetryPolicy(max_attempts=8, base_delay=0.05, max_delay=1.0)
+
+        self._pending = deque()
+        self._unfinished = 0
+        self._condition = threading.Condition()
+        self._thread = None
+
+        self.stats = {'queued': 0, 'items_written': 0, 'objects_written': 0, 'multipart_uploads': 0,
+                      'compressed': 0, 'batch_requests': 0, 'unprocessed_retries': 0, 'errors': 0}
+
+    def put(self, request_id, name, result, metadata=None):
+        """
+        Enfileira um resultado para gravação, sem bloquear a inferência.
+
+        Args:
+            request_id (str): ID da invocação (parte da chave do item)
+            name (str): Nome do resultado (ex: nome do modelo ou 'batch_3')
+            result (dict): Saída, uso de tokens e tempos (serializável em JSON)
+            metadata (dict): Atributos adicionais do item, em texto (ex: 'context_path')
+        """
+        record = {
+            'result_id': f'{request_id}#{name}',
+            'request_id': request_id,
+            'name': name,
+            'created_at': time.time(),
+            'result': result,
+            'metadata': metadata or {},
+        }
+
+        with self._condition:
+            self._pending.append(record)
+            self._unfinished += 1
+            self.stats['queued'] += 1
+            self._condition.notify_all()
+
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='results-sink', daemon=True)
+                self._thread.start()
+
+    def flush(self, timeout=None):
+        """
+        Aguarda a gravação de todos os resultados enfileirados.
+
+        Args:
+            timeout (float): Tempo máximo de espera, em segundos (padrão: sem limite)
+
+        Returns:
+            bool: True se a fila foi esvaziada dentro do tempo
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            while self._unfinished:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+        return True
+
+    def get_stats(self):
+        """
+        Retorna os contadores de gravação.
+        """
+        with self._condition:
+            stats = dict(self.stats)
+            stats['pending'] = self._unfinished
+        return stats
+
+    def _run(self):
+        """
+        Laço da thread de gravação: grava os itens pendentes em grupos de até 25.
+        """
+        while True:
+            with self._condition:
+                while not self._pending:
+                    self._condition.wait()
+                records = [self._pending.popleft() for _ in range(min(DYNAMODB_BATCH_SIZE, len(self._pending)))]
+
+            try:
+                self._write(records)
+            except Exception as e:
+                log_error(f'Falha ao gravar {len(records)} resultados: {e}')
+                self._count('errors', len(records))
+            finally:
+                with self._condition:
+                    self._unfinished -= len(records)
+                    self._condition.notify_all()
+
+    def _write(self, records):
+        """
+        Grava um grupo de resultados: objetos grandes no S3 e os itens em um único BatchWriteItem.
+        """
+        items = {}
+        for record in records:
+            try:
+                item = self._build_item(record)
+            except Exception as e:
+                log_error(f"Falha ao gravar o resultado {record['result_id']}: {e}")
+                self._count('errors')
+                continue
+            if item is not None:
+                # O BatchWriteItem não aceita a mesma chave duas vezes; prevalece o último resultado
+                items[record['result_id']] = item
+
+        if items:
+            self._batch_write(list(items.values()))
+
+    def _build_item(self, record):
+        """
+        Monta o item do DynamoDB de um resultado, comprimindo ou enviando ao S3 os resultados grandes.
+
+        Returns:
+            dict: Item no formato do cliente de baixo nível, ou None quando não há tabela
+        """
+        payload = json.dumps(record['result'], ensure_ascii=False, default=str).encode('utf-8')
+
+        if not self.table_name:
+            self._upload(record, gzip.compress(payload, RESULTS_GZIP_LEVEL))
+            return None
+
+        item = {
+            'result_id': {'S': record['result_id']},
+            'request_id': {'S': record['request_id']},
+            'name': {'S': record['name']},
+            'created_at': {'N': str(int(record['created_at']))},
+        }
+        for key, value in record['metadata'].items():
+            if value is not None:
+                item[key] = {'S': str(value)}
+
+        result = record['result'] if isinstance(record['result'], dict) else {}
+        for key in ('model_id', 'status'):
+            if result.get(key) is not None:
+                item[key] = {'S': str(result[key])}
+        if isinstance(result.get('latency'), (int, float)):
+            item['latency'] = {'N': repr(float(result['latency']))}
+
+        if len(payload) <= self.inline_bytes:
+            item['result'] = {'S': payload.decode('utf-8')}
+            return item
+
+        compressed = gzip.compress(payload, RESULTS_GZIP_LEVEL)
+        self._count('compressed')
+        if len(compressed) <= DYNAMODB_MAX_PAYLOAD_BYTES or not self.bucket:
+            if len(compressed) > DYNAMODB_MAX_PAYLOAD_BYTES:
+                raise ValueError(f'{len(compressed)} bytes comprimidos excedem o item do DynamoDB e não há '
+                                 f'bucket configurado')
+            item['result_gz'] = {'B': compressed}
+        else:
+            item['result_s3_uri'] = {'S': self._upload(record, compressed)}
+        return item
+
+    def _batch_write(self, items):
+        """
+        Grava até 25 itens com BatchWriteItem, repetindo os itens não processados com backoff.
+        """
+        request_items = {self.table_name: [{'PutRequest': {'Item': item}} for item in items]}
+
+        for attempt in range(self.policy.max_attempts):
+            try:
+                response = self.dynamodb_client.batch_write_item(RequestItems=request_items)
+            except Exception as e:
+                error_class = classify_write_error(e)
+                if error_class is None or attempt + 1 >= self.policy.max_attempts:
+                    raise
+                self.policy.sleep(self.policy.get_delay(attempt, error_class))
+                continue
+            finally:
+                self._count('batch_requests')
+
+            unprocessed = response.get('UnprocessedItems') or {}
+            remaining = sum(len(requests) for requests in unprocessed.values())
+            self._count('items_written', sum(len(requests) for requests in request_items.values()) - remaining)
+            if not remaining:
+                return
+
+            self._count('unprocessed_retries', remaining)
+            request_items = unprocessed
+            self.policy.sleep(self.policy.get_delay(attempt, 'throttling'))
+
+        raise RuntimeError(f'{remaining} itens não processados após {self.policy.max_attempts} tentativas')
+
+    def _upload(self, record, data):
+        """
+        Envia um resultado comprimido ao S3, com upload multipart acima de `part_size`.
+
+        Returns:
+            str: URI 's3://bucket/chave' do objeto
+        """
+        key = f"{self.prefix}{record['request_id']}/{record['name']}.json.gz"
+        options = {'ContentType': 'application/json', 'ContentEncoding': 'gzip'}
+
+        if len(data) <= self.part_size:
+            self.s3_client.put_object(Bucket=self.bucket, Key=key, Body=data, **options)
+        else:
+            self._multipart_upload(key, data, options)
+
+        self._count('objects_written')
+        return f's3://{self.bucket}/{key}'
+
+    def _multipart_upload(self, key, data, options):
+        """
+        Envia as partes de um objeto grande em paralelo, abortando o upload em caso de falha.
+        """
+        upload_id = self.s3_client.create_multipart_upload(Bucket=self.bucket, Key=key, **options)['UploadId']
+        view = memoryview(data)
+        offsets = range(0, len(data), self.part_size)
+
+        def upload_part(part):
+            number, offset = part
+            body = io.BytesIO(view[offset:offset + self.part_size])
+            response = self.s3_client.upload_part(Bucket=self.bucket, Key=key, UploadId=upload_id,
+                                                  PartNumber=number, Body=body)
+            return {'ETag': response['ETag'], 'PartNumber': number}
+
+        try:
+            with ThreadPoolExecutor(max_workers=min(S3_MAX_PART_WORKERS, len(offsets))) as executor:
+                parts = list(executor.map(upload_part, enumerate(offsets, start=1)))
+            self.s3_client.complete_multipart_upload(Bucket=self.bucket, Key=key, UploadId=upload_id,
+                                                     MultipartUpload={'Parts': parts})
+        except Exception:
+            self.s3_client.abort_multipart_upload(Bucket=self.bucket, Key=key, UploadId=upload_id)
+            raise
+
+        self._count('multipart_uploads')
+
+    def _count(self, name, value=1):
+        with self._condition:
+            self.stats[name] += value
+
+
+def get_results_sink():
+    """
+    Retorna o gravador de resultados do processo, criando-o na primeira chamada.
+
+    Returns:
+        ResultsSink: Gravador compartilhado, ou None se RESULTS_TABLE e RESULTS_BUCKET
+            não estiverem configurados
+    """
+    global _RESULTS_SINK
+
+    table_name = get_env('RESULTS_TABLE')
+    bucket = get_env('RESULTS_BUCKET')
+    if not table_name and not bucket:
+        return None
+
+    if _RESULTS_SINK is None:
+        with _RESULTS_SINK_LOCK:
+            if _RESULTS_SINK is None:
+                _RESULTS_SINK = ResultsSink(
+                    table_name=table_name or None,
+                    bucket=bucket or None,
+                    prefix=get_env('RESULTS_S3_PREFIX', DEFAULT_RESULTS_PREFIX),
+                    inline_bytes=int(get_env('RESULTS_INLINE_MAX_BYTES', DEFAULT_RESULTS_INLINE_MAX_BYTES)),
+                )
+
+    return _RESULTS_SINK
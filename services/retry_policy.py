@@ -0,0 +1,156 @@
+import time
+import random
+
+from utils.environment import get_env
+from utils.instrumentation import log_debug
+
+# Parâmetros padrão das novas tentativas (sobrescritos pelo .env)
+DEFAULT_MAX_ATTEMPTS = 5
+DEFAULT_BASE_DELAY = 0.5
+DEFAULT_MAX_DELAY = 20.0
+
+# Códigos de erro do Bedrock agrupados por classe de falha recuperável
+THROTTLING_ERROR_CODES = {'ThrottlingException', 'TooManyRequestsException', 'ServiceQuotaExceededException'}
+MODEL_NOT_READY_ERROR_CODES = {'ModelNotReadyException'}
+SERVER_ERROR_CODES = {'InternalServerException', 'ServiceUnavailableException', 'ModelTimeoutException'}
+
+# Exceções de conexão do botocore (comparadas pelo nome, sem importar o botocore)
+CONNECTION_ERROR_NAMES = {'EndpointConnectionError', 'ConnectionClosedError', 'ReadTimeoutError',
+                          'ConnectTimeoutError', 'ConnectionError'}
+
+# Multiplicador do atraso base por classe (o modelo leva mais tempo para ficar pronto)
+ERROR_CLASS_DELAY_MULTIPLIERS = {
+    'throttling': 1.0,
+    'model_not_ready': 4.0,
+    'server_error': 1.0,
+    'connection': 0.5,
+}
+
+
+def classify_error(error):
+    """
+    Classifica uma exceção do cliente Bedrock quanto à possibilidade de nova tentativa.
+
+    Args:
+        error (Exception): Exceção lançada pelo cliente
+
+    Returns:
+        str: 'throttling', 'model_not_ready', 'server_error', 'connection' ou None
+            (erro definitivo, ex: ValidationException ou AccessDeniedException)
+    """
+    response = getattr(error, 'response', None) or {}
+    code = response.get('Error', {}).get('Code')
+    status = response.get('ResponseMetadata', {}).get('HTTPStatusCode')
+
+    if code in THROTTLING_ERROR_CODES or status == 429:
+        return 'throttling'
+    if code in MODEL_NOT_READY_ERROR_CODES:
+        return 'model_not_ready'
+    if code in SERVER_ERROR_CODES or (status is not None and status >= 500):
+        return 'server_error'
+    if type(error).__name__ in CONNECTION_ERROR_NAMES:
+        return 'connection'
+    return None
+
+
+class RetryPolicy:
+    """
+    Política de novas tentativas com backoff exponencial e "full jitter": o atraso
+    da tentativa n é sorteado entre 0 e min(max_delay, base_delay * 2^n), evitando
+    que chamadores concorrentes voltem todos ao mesmo tempo.
+    """
+
+    def __init__(self, max_attempts=DEFAULT_MAX_ATTEMPTS, base_delay=DEFAULT_BASE_DELAY,
+                 max_delay=DEFAULT_MAX_DELAY, sleep=time.sleep, rng=None):
+        """
+        Args:
+            max_attempts (int): Número máximo de tentativas (incluindo a primeira)
+            base_delay (float): Atraso base, em segundos
+            max_delay (float): Atraso máximo, em segundos
+            sleep (callable): Função de espera (substituível em benchmarks)
+            rng (random.Random): Gerador do jitter (opcional)
+        """
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.sleep = sleep
+        self.rng = rng or random.Random()
+
+    def get_delay(self, attempt, error_class):
+        """
+        Calcula o atraso antes da próxima tentativa.
+
+        Args:
+            attempt (int): Número da tentativa que falhou (começando em 0)
+            error_class (str): Classe do erro retornada por classify_error()
+
+        Returns:
+            float: Atraso, em segundos
+        """
+        ceiling = self.base_delay * ERROR_CLASS_DELAY_MULTIPLIERS.get(error_class, 1.0) * (2 ** attempt)
+        return self.rng.uniform(0, min(self.max_delay, ceiling))
+
+
+def get_default_retry_policy():
+    """
+    Cria a política de novas tentativas configurada no .env.
+
+    Returns:
+        RetryPolicy: Política com BEDROCK_MAX_ATTEMPTS, BEDROCK_RETRY_BASE_DELAY e BEDROCK_RETRY_MAX_DELAY
+    """
+    return RetryPolicy(
+        max_attempts=int(get_env('BEDROCK_MAX_ATTEMPTS', DEFAULT_MAX_ATTEMPTS)),
+        base_delay=float(get_env('BEDROCK_RETRY_BASE_DELAY', DEFAULT_BASE_DELAY)),
+        max_delay=float(get_env('BEDROCK_RETRY_MAX_DELAY', DEFAULT_MAX_DELAY)),
+    )
+
+
+def call_with_retry(func, policy=None, rate_limiter=None, tokens=0):
+    """
+    Executa uma chamada ao Bedrock respeitando o limitador do modelo e repetindo
+    as falhas recuperáveis.
+
+    Antes de cada tentativa, aguarda a liberação do limitador; cada throttling
+    reduz a taxa do limitador e cada sucesso a aumenta novamente. Os tokens
+    reservados por uma tentativa que falhou são devolvidos ao limitador, de modo
+    que apenas a reserva da tentativa bem-sucedida fica pendente (corrigida pelo
+    chamador com record_usage).
+
+    Args:
+        func (callable): Chamada ao cliente Bedrock, sem argumentos
+        policy (RetryPolicy): Política de novas tentativas (padrão: configurada no .env)
+        rate_limiter (ModelRateLimiter): Limitador compartilhado do modelo (opcional)
+        tokens (int): Tokens estimados da requisição, retirados do limitador
+
+    Returns:
+        tuple: (resultado da chamada, número de novas tentativas realizadas)
+    """
+    policy = policy or get_default_retry_policy()
+
+    for attempt in range(policy.max_attempts):
+        if rate_limiter is not None:
+            rate_limiter.acquire(tokens)
+
+        try:
+            result = func()
+
+        except Exception as e:
+            error_class = classify_error(e)
+
+            if rate_limiter is not None:
+                rate_limiter.release(tokens)
+                if error_class == 'throttling':
+                    rate_limiter.on_throttle()
+
+            if error_class is None or attempt + 1 >= policy.max_attempts:
+                raise
+
+            delay = policy.get_delay(attempt, error_class)
+            log_debug(f'Falha recuperável ({error_class}) na tentativa {attempt + 1}: {e}. '
+                      f'Nova tentativa em {delay:.2f}s', tag='BEDROCK')
+            policy.sleep(delay)
+            continue
+
+        if rate_limiter is not None:
+            rate_limiter.on_success()
+        return result, attempt
@@ -0,0 +1,160 @@
+import io
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.environment import get_env
+from services.bedrock_client_registry import get_aws_client
+
+# Tamanho de cada leitura por intervalo (Range) e número de intervalos baixados antecipadamente.
+# Intervalos pequenos reduzem a espera pelo primeiro intervalo e a memória da janela; o prefetch
+# mantém a banda (com 1 MB, cada GET leva poucas dezenas de ms)
+DEFAULT_S3_CHUNK_SIZE = 1024 * 1024
+DEFAULT_S3_PREFETCH_CHUNKS = 2
+
+# Limite de bytes em prefetch: intervalos maiores (S3_STREAM_CHUNK_SIZE) reduzem o número de
+# intervalos baixados antecipadamente, mantendo ao menos um
+DEFAULT_S3_PREFETCH_MAX_BYTES = 4 * 1024 * 1024
+
+# Buffer do leitor de texto sobre o stream binário
+TEXT_BUFFER_SIZE = 1024 * 1024
+
+
+def is_s3_uri(path):
+    """
+    Verifica se o caminho é um URI do S3 ('s3://bucket/chave').
+    """
+    return isinstance(path, str) and path.startswith('s3://')
+
+
+def parse_s3_uri(s3_uri):
+    """
+    Separa um URI 's3://bucket/chave' em (bucket, chave).
+
+    Raises:
+        ValueError: Se o URI não possuir bucket e chave
+    """
+    bucket, _, key = s3_uri[len('s3://'):].partition('/')
+    if not bucket or not key:
+        raise ValueError(f'URI do S3 inválido: {s3_uri}')
+    return bucket, key
+
+
+class S3RangeReader(io.RawIOBase):
+
+    def __init__(self, bucket, key, s3_client=None, chunk_size=None, prefetch=None):
+        """
+        Stream binário somente leitura sobre um objeto do S3, lido por intervalos.
+
+        O objeto é baixado em GETs com o cabeçalho Range de `chunk_size` bytes; enquanto
+        um intervalo é consumido, os `prefetch` intervalos seguintes já estão sendo
+        baixados em segundo plano. A memória fica limitada a (1 + prefetch) intervalos,
+        independentemente do tamanho do objeto, com o prefetch limitado a
+        S3_STREAM_PREFETCH_MAX_BYTES, e o processamento começa após o primeiro
+        intervalo, sem esperar o download completo.
+
+        Args:
+            bucket (str): Nome do bucket
+            key (str): Chave do objeto
+            s3_client: Cliente do S3 (padrão: cliente compartilhado do processo)
+            chunk_size (int): Bytes por leitura (padrão: S3_STREAM_CHUNK_SIZE ou 1 MB)
+            prefetch (int): Intervalos baixados antecipadamente (padrão: S3_STREAM_PREFETCH_CHUNKS ou 2)
+        """
+        super().__init__()
+        self.bucket = bucket
+        self.key = key
+        self.s3_client = s3_client or get_aws_client('s3')
+        self.chunk_size = chunk_size or int(get_env('S3_STREAM_CHUNK_SIZE', DEFAULT_S3_CHUNK_SIZE))
+        self.prefetch = max(0, prefetch if prefetch is not None
+                            else int(get_env('S3_STREAM_PREFETCH_CHUNKS', DEFAULT_S3_PREFETCH_CHUNKS)))
+        max_prefetch_bytes = int(get_env('S3_STREAM_PREFETCH_MAX_BYTES', DEFAULT_S3_PREFETCH_MAX_BYTES))
+        self.prefetch = min(self.prefetch, max(1, max_prefetch_bytes // self.chunk_size))
+
+        self.size = self.s3_client.head_object(Bucket=bucket, Key=key)['ContentLength']
+        self.requests = 0
+
+        self._chunk = memoryview(b'')
+        self._next_offset = 0
+        self._pending = []
+        self._executor = ThreadPoolExecutor(max_workers=max(1, self.prefetch)) if self.prefetch else None
+
+    def readable(self):
+        return True
+
+    def _fetch(self, offset):
+        """
+        Baixa o intervalo [offset, offset + chunk_size) do objeto.
+        """
+        end = min(offset + self.chunk_size, self.size) - 1
+        response = self.s3_client.get_object(Bucket=self.bucket, Key=self.key, Range=f'bytes={offset}-{end}')
+        self.requests += 1
+        return response['Body'].read()
+
+    def _schedule(self):
+        """
+        Mantém até `prefetch` intervalos seguintes em download.
+        """
+        while self._next_offset < self.size and len(self._pending) < max(1, self.prefetch):
+            offset = self._next_offset
+            self._next_offset += self.chunk_size
+            if self._executor is None:
+                self._pending.append(_Completed(self._fetch(offset)))
+            else:
+                self._pending.append(self._executor.submit(self._fetch, offset))
+
+    def readinto(self, buffer):
+        if not len(self._chunk):
+            self._schedule()
+            if not self._pending:
+                return 0
+            self._chunk = memoryview(self._pending.pop(0).result())
+            self._schedule()
+
+        size = min(len(buffer), len(self._chunk))
+        buffer[:size] = self._chunk[:size]
+        self._chunk = self._chunk[size:]
+        return size
+
+    def close(self):
+        if self._executor is not None:
+            for future in self._pending:
+                future.cancel()
+            self._executor.shutdown(wait=False)
+            self._executor = None
+        self._pending = []
+        super().close()
+
+
+class _Completed:
+    """
+    Resultado já disponível, com a mesma interface de um Future (leitura sem prefetch).
+    """
+
+    def __init__(self, value):
+        self.value = value
+
+    def result(self):
+        return self.value
+
+
+def open_text(path, newline=None, s3_client=None):
+    """
+    Abre um arquivo local ou um objeto do S3 para leitura como texto UTF-8.
+
+    Objetos do S3 são lidos como stream (S3RangeReader), com decodificação
+    incremental: caracteres multibyte divididos entre dois intervalos são
+    decodificados corretamente, e a leitura linha a linha não mantém o objeto
+    inteiro em memória.
+
+    Args:
+        path (str): Caminho local ou URI 's3://bucket/chave'
+        newline (str): Mesmo significado do parâmetro de open() (ex: '' para CSV)
+        s3_client: Cliente do S3 (padrão: cliente compartilhado do processo)
+
+    Returns:
+        io.TextIOBase: Arquivo de texto
+    """
+    if not is_s3_uri(path):
+        return open(path, 'r', encoding='utf-8', newline=newline)
+
+    bucket, key = parse_s3_uri(path)
+    raw = S3RangeReader(bucket, key, s3_client=s3_client)
+    return io.TextIOWrapper(io.BufferedReader(raw, TEXT_BUFFER_SIZE), encoding='utf-8', newline=newline)
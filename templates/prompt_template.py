@@ -1,38 +1,11 @@
 import os
 import json
-import pandas as pd
 
-class PromptTemplate:
-    """
-    Classe para gerar um template de prompt para análise de dados de saúde mental.
-    """
-
-    def __init__(self, context):
-        """
-        Inicializa a classe com os dados do paciente e URLs de imagens.
-        
-        Args:
-            context (str): Contexto para o prompt, incluindo dados do paciente e URLs de imagens.
-        """
-
-        # Verifica se o caminho do arquivo existe
-        self.context = context
-
-        # Cria o template do prompt com o formato esperado
-        self.create_prompt_template(self.context)
-
-    def create_prompt_template(self, context):
-        """
-        Gera o prompt, incluindo uma nova seção e instruções para as imagens.
-
-        Args:
-            context (str): Contexto para o prompt, incluindo dados do paciente e URLs de imagens.
-
-        Returns:
-            str: O prompt formatado.
-        """
+# Marcador da parte dinâmica dos templates, renderizada a cada requisição
+CONTEXT_PLACEHOLDER = '{context}'
 
-        self.prompt = f"""
+# Template do relatório de desempenho do jogador (o bloco de instruções é estático)
+PLAYER_SUMMARY_TEMPLATE = """
         <context>
             You are a specialized board game analyst with extensive experience in game mechanics evaluation and strategy analysis. 
             Your task is to analyze player game session data from multiple sessions and produce a comprehensive gaming performance summary.
@@ -69,6 +42,191 @@ class PromptTemplate:
             {context}
         </context>
         """
+
+# Template da etapa map: resume uma parte dos dados do jogador em um digest compacto
+SESSION_DIGEST_TEMPLATE = """
+        <context>
+            You are a specialized board game analyst. You will receive ONE PART of a player's game session data.
+            Your task is to produce a compact session digest that will later be merged with the digests of the other parts.
+        </context>
+
+        <instructions>
+            INSTRUCTIONS:
+            1. Summarize only the sessions in the attached file. Do not invent data.
+            2. The output format MUST be plain text (no HTML), with at most 300 words.
+            3. Keep player identification, dates, counts, scores, game names, image URLs and file keys exactly as they appear.
+            4. Use short bullet points grouped under: Sessions, Games, Performance, Strategies, Keywords, Attachments, File Keys.
+        </instructions>
+
+        <context>
+            {context}
+        </context>
+        """
+
+# Template da etapa reduce: combina vários digests em um único digest
+DIGEST_MERGE_TEMPLATE = """
+        <context>
+            You are a specialized board game analyst. You will receive several session digests of the same player,
+            each one summarizing a different part of the player's game session data.
+        </context>
+
+        <instructions>
+            INSTRUCTIONS:
+            1. Merge the attached digests into ONE session digest. Do not invent data.
+            2. The output format MUST be plain text (no HTML), with at most 400 words.
+            3. Aggregate counts and scores, keep the earliest and latest dates, and remove duplicated items.
+            4. Keep player identification, image URLs and file keys exactly as they appear.
+            5. Use short bullet points grouped under: Sessions, Games, Performance, Strategies, Keywords, Attachments, File Keys.
+        </instructions>
+
+        <context>
+            {context}
+        </context>
+        """
+
+
+class CompiledPromptTemplate:
+    """
+    Template de prompt compilado uma única vez por processo.
+
+    O texto é dividido no marcador {context}: o prefixo e o sufixo estáticos ficam
+    pré-renderizados e apenas o contexto é inserido a cada requisição. A contagem de
+    tokens da parte estática é memorizada por estimador.
+    """
+
+    def __init__(self, name, template_text):
+        """
+        Args:
+            name (str): Nome do template no registro
+            template_text (str): Texto do template com um único marcador {context}
+        """
+        if template_text.count(CONTEXT_PLACEHOLDER) != 1:
+            raise ValueError(f'O template {name} deve conter exatamente um marcador {CONTEXT_PLACEHOLDER}')
+
+        self.name = name
+        self.prefix, _, self.suffix = template_text.partition(CONTEXT_PLACEHOLDER)
+        self._static_tokens = {}
+
+    def render(self, context):
+        """
+        Insere o contexto entre as partes estáticas (mesma conversão de uma f-string).
+
+        Args:
+            context: Contexto do prompt
+
+        Returns:
+            str: O prompt formatado
+        """
+        return self.prefix + format(context) + self.suffix
+
+    def get_static_tokens(self, estimator):
+        """
+        Retorna os tokens da parte estática do template, calculados uma única vez por estimador.
+
+        Args:
+            estimator (TokenEstimator): Estimador da família do modelo
+
+        Returns:
+            int: Tokens do prefixo e do sufixo
+        """
+        tokens = self._static_tokens.get(estimator)
+        if tokens is None:
+            tokens = estimator.count_tokens(self.prefix) + estimator.count_tokens(self.suffix)
+            self._static_tokens[estimator] = tokens
+        return tokens
+
+    def count_tokens(self, context, estimator):
+        """
+        Estima os tokens do prompt renderizado, contando apenas o contexto.
+
+        Args:
+            context: Contexto do prompt
+            estimator (TokenEstimator): Estimador da família do modelo
+
+        Returns:
+            int: Tokens estimados do prompt
+        """
+        return self.get_static_tokens(estimator) + estimator.count_tokens(format(context))
+
+
+# Templates compilados disponíveis no processo, indexados pelo nome
+PROMPT_TEMPLATES = {}
+
+# Template utilizado quando nenhum nome é informado
+DEFAULT_TEMPLATE_NAME = 'player_summary'
+
+
+def register_prompt_template(name, template_text):
+    """
+    Compila e registra (ou substitui) um template de prompt.
+
+    Args:
+        name (str): Nome do template
+        template_text (str): Texto do template com um único marcador {context}
+
+    Returns:
+        CompiledPromptTemplate: Template compilado
+    """
+    PROMPT_TEMPLATES[name] = CompiledPromptTemplate(name, template_text)
+    return PROMPT_TEMPLATES[name]
+
+
+def get_prompt_template(name=None):
+    """
+    Retorna um template compilado pelo nome.
+
+    Args:
+        name (str): Nome do template (padrão: DEFAULT_TEMPLATE_NAME)
+
+    Raises:
+        ValueError: Se o template não estiver registrado
+    """
+    name = name or DEFAULT_TEMPLATE_NAME
+    if name not in PROMPT_TEMPLATES:
+        raise ValueError(f'Template desconhecido: {name}. Disponíveis: {", ".join(PROMPT_TEMPLATES)}')
+    return PROMPT_TEMPLATES[name]
+
+
+register_prompt_template(DEFAULT_TEMPLATE_NAME, PLAYER_SUMMARY_TEMPLATE)
+register_prompt_template('session_digest', SESSION_DIGEST_TEMPLATE)
+register_prompt_template('digest_merge', DIGEST_MERGE_TEMPLATE)
+
+
+class PromptTemplate:
+    """
+    Classe para gerar um template de prompt para análise de dados de saúde mental.
+    """
+
+    def __init__(self, context, template_name=None):
+        """
+        Inicializa a classe com os dados do paciente e URLs de imagens.
+        
+        Args:
+            context (str): Contexto para o prompt, incluindo dados do paciente e URLs de imagens.
+            template_name (str): Nome do template registrado (padrão: DEFAULT_TEMPLATE_NAME)
+        """
+
+        # Verifica se o caminho do arquivo existe
+        self.context = context
+        self.template = get_prompt_template(template_name)
+
+        # Cria o template do prompt com o formato esperado
+        self.create_prompt_template(self.context)
+
+    def create_prompt_template(self, context):
+        """
+        Gera o prompt, incluindo uma nova seção e instruções para as imagens.
+
+        Apenas o contexto é renderizado; o bloco de instruções já está compilado.
+
+        Args:
+            context (str): Contexto para o prompt, incluindo dados do paciente e URLs de imagens.
+
+        Returns:
+            str: O prompt formatado.
+        """
+
+        self.prompt = self.template.render(context)
         
         return self.prompt
     
@@ -76,4 +234,20 @@ class PromptTemplate:
         """
         Retorna o texto do prompt formatado.
         """
-        return self.prompt
\ No newline at end of file
+        return self.prompt
+
+    def get_static_prefix(self):
+        """
+        Retorna o bloco estático de instruções que antecede o contexto, usado como
+        prefixo cacheável no cache de prompt do Bedrock.
+        """
+        return self.template.prefix
+
+    def get_prompt_tokens(self, estimator):
+        """
+        Retorna os tokens estimados do prompt, reaproveitando a contagem da parte estática.
+
+        Args:
+            estimator (TokenEstimator): Estimador da família do modelo
+        """
+        return self.template.count_tokens(self.context, estimator)
@@ -0,0 +1,48 @@
+import os
+import threading
+
+# Indica se o arquivo .env já foi carregado neste processo
+_ENVIRONMENT_LOADED = False
+_ENVIRONMENT_LOCK = threading.Lock()
+
+
+def load_environment():
+    """
+    Carrega as variáveis do arquivo .env uma única vez por processo.
+
+    O python-dotenv só é importado na primeira chamada, mantendo o cold start da
+    Lambda livre dessa dependência. Variáveis já definidas no ambiente (ex: as
+    configuradas no console da Lambda) não são sobrescritas.
+    """
+    global _ENVIRONMENT_LOADED
+
+    if _ENVIRONMENT_LOADED:
+        return
+
+    with _ENVIRONMENT_LOCK:
+        if _ENVIRONMENT_LOADED:
+            return
+
+        try:
+            from dotenv import load_dotenv
+            load_dotenv()
+        except ImportError:
+            # Sem python-dotenv (ex: pacote da Lambda), usa apenas o ambiente do processo
+            pass
+
+        _ENVIRONMENT_LOADED = True
+
+
+def get_env(name, default=None):
+    """
+    Obtém uma variável de ambiente, carregando o .env na primeira chamada.
+
+    Args:
+        name (str): Nome da variável de ambiente
+        default: Valor padrão caso a variável não esteja definida
+
+    Returns:
+        str: Valor da variável de ambiente ou o valor padrão
+    """
+    load_environment()
+    return os.getenv(name, default)
@@ -1,9 +1,9 @@
 import os
-from dotenv import load_dotenv
+from utils.environment import load_environment
 
 def aws_credentials():
     # Carregar variáveis de ambiente do arquivo .env
-    load_dotenv()
+    load_environment()
 
     # Acessa as variáveis definidas
     ACESS_KEY = os.getenv('AWS_ACCESS_KEY_ID')
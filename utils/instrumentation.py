@@ -0,0 +1,300 @@
+import json
+import time
+import functools
+import threading
+from contextlib import contextmanager
+
+from utils.environment import get_env
+
+# Níveis de log, do mais ao menos detalhado (LOG_LEVEL no .env; padrão: INFO)
+LOG_LEVELS = {'DEBUG': 10, 'INFO': 20, 'WARNING': 30, 'ERROR': 40}
+DEFAULT_LOG_LEVEL = 'INFO'
+
+# Limites do resumo dos valores registrados: caracteres de textos, itens de listas e
+# chaves de dicionários, e profundidade das estruturas aninhadas
+MAX_LOGGED_CHARS = 200
+MAX_LOGGED_ITEMS = 5
+MAX_LOGGED_DEPTH = 3
+
+# Métricas no Embedded Metric Format (EMF) do CloudWatch: namespace e limite de
+# valores por métrica em cada linha
+DEFAULT_METRICS_NAMESPACE = 'BedrockInference'
+EMF_MAX_VALUES = 100
+
+# Nível de log do processo, lido na primeira chamada a get_log_level()
+_LOG_LEVEL = None
+
+
+def get_log_level():
+    """
+    Retorna o nível mínimo de log do processo (LOG_LEVEL), lido uma única vez.
+
+    Returns:
+        int: Valor numérico do nível (ver LOG_LEVELS)
+    """
+    global _LOG_LEVEL
+
+    if _LOG_LEVEL is None:
+        name = (get_env('LOG_LEVEL') or DEFAULT_LOG_LEVEL).upper()
+        _LOG_LEVEL = LOG_LEVELS.get(name, LOG_LEVELS[DEFAULT_LOG_LEVEL])
+    return _LOG_LEVEL
+
+
+def set_log_level(level):
+    """
+    Altera o nível mínimo de log do processo (ex: 'DEBUG').
+    """
+    global _LOG_LEVEL
+    _LOG_LEVEL = LOG_LEVELS[level.upper()]
+
+
+def is_log_enabled(level):
+    """
+    Verifica se as mensagens do nível informado são registradas.
+
+    Permite evitar a montagem de mensagens caras quando o nível está desabilitado.
+    """
+    return LOG_LEVELS[level] >= get_log_level()
+
+
+def summarize(value, depth=0):
+    """
+    Resume um valor para o log sem convertê-lo por inteiro em texto.
+
+    Textos longos são cortados (com o tamanho original), bytes são representados
+    apenas pelo tamanho, e listas e dicionários mostram os primeiros itens. Assim,
+    corpos de requisição e imagens em base64 com vários MB custam o mesmo que um
+    valor pequeno.
+
+    Args:
+        value: Valor a ser resumido
+        depth (int): Profundidade atual nas estruturas aninhadas
+
+    Returns:
+        Valor resumido, serializável em JSON
+    """
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    if isinstance(value, str):
+        if len(value) <= MAX_LOGGED_CHARS:
+            return value
+        return f'{value[:MAX_LOGGED_CHARS]}... ({len(value)} caracteres)'
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return f'<{len(value)} bytes>'
+    if depth >= MAX_LOGGED_DEPTH:
+        return f'<{type(value).__name__}>'
+
+    if isinstance(value, dict):
+        summary = {str(key): summarize(item, depth + 1) for key, item in list(value.items())[:MAX_LOGGED_ITEMS]}
+        if len(value) > MAX_LOGGED_ITEMS:
+            summary['...'] = f'{len(value) - MAX_LOGGED_ITEMS} chaves omitidas'
+        return summary
+    if isinstance(value, (list, tuple, set)):
+        items = list(value)
+        summary = [summarize(item, depth + 1) for item in items[:MAX_LOGGED_ITEMS]]
+        if len(items) > MAX_LOGGED_ITEMS:
+            summary.append(f'... {len(items) - MAX_LOGGED_ITEMS} itens omitidos')
+        return summary
+
+    return f'<{type(value).__name__}>'
+
+
+def log(level, message, tag=None, **fields):
+    """
+    Registra uma mensagem no formato '[NÍVEL][TAG] mensagem campo=valor ...'.
+
+    A mensagem só é montada se o nível estiver habilitado, e os campos são
+    resumidos por summarize(), nunca convertidos por inteiro em texto.
+
+    Args:
+        level (str): 'DEBUG', 'INFO', 'WARNING' ou 'ERROR'
+        message (str): Mensagem
+        tag (str): Componente de origem (ex: 'BEDROCK'), opcional
+        **fields: Valores associados à mensagem
+    """
+    if LOG_LEVELS[level] < get_log_level():
+        return
+
+    line = f'[{level}][{tag}] {message}' if tag else f'[{level}] {message}'
+    if fields:
+        line += ' ' + ' '.join(f'{name}={json.dumps(summarize(value), ensure_ascii=False, default=str)}'
+                               for name, value in fields.items())
+    print(line)
+
+
+def log_debug(message, tag=None, **fields):
+    log('DEBUG', message, tag, **fields)
+
+
+def log_info(message, tag=None, **fields):
+    log('INFO', message, tag, **fields)
+
+
+def log_warning(message, tag=None, **fields):
+    log('WARNING', message, tag, **fields)
+
+
+def log_error(message, tag=None, **fields):
+    log('ERROR', message, tag, **fields)
+
+
+class StageMetrics:
+    """
+    Duração de cada etapa da invocação (ex: 'prompt_render', 'invoke'), em milissegundos.
+
+    As etapas executadas várias vezes na mesma invocação (ex: uma inferência por
+    lote) acumulam todos os valores, emitidos como uma lista no EMF para que o
+    CloudWatch calcule os percentis (p50, p99) de cada etapa.
+    """
+
+    def __init__(self):
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage, seconds):
+        """
+        Registra a duração de uma execução da etapa.
+
+        Args:
+            stage (str): Nome da etapa
+            seconds (float): Duração, em segundos
+        """
+        with self._lock:
+            self._values.setdefault(stage, []).append(round(seconds * 1000, 3))
+
+    @contextmanager
+    def timer(self, stage):
+        """
+        Mede a duração do bloco e a registra na etapa, mesmo quando o bloco falha.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start)
+
+    def get_summary(self):
+        """
+        Retorna, por etapa, o número de execuções, o tempo total e o tempo máximo (ms).
+        """
+        with self._lock:
+            return {stage: {'count': len(values), 'total_ms': round(sum(values), 3), 'max_ms': max(values)}
+                    for stage, values in self._values.items()}
+
+    def reset(self):
+        with self._lock:
+            self._values = {}
+
+    def to_emf(self, namespace=DEFAULT_METRICS_NAMESPACE, dimensions=None, timestamp=None):
+        """
+        Monta os documentos do Embedded Metric Format com as durações registradas.
+
+        Cada documento leva até 100 valores por métrica (limite do EMF); etapas com
+        mais execuções são divididas em vários documentos.
+
+        Args:
+            namespace (str): Namespace das métricas no CloudWatch
+            dimensions (dict): Dimensões das métricas (ex: {'Mode': 'initial_batch'})
+            timestamp (int): Instante, em milissegundos (padrão: agora)
+
+        Returns:
+            list: Documentos EMF (dicts), um por linha de log
+        """
+        with self._lock:
+            values = {stage: list(stage_values) for stage, stage_values in self._values.items()}
+
+        dimensions = {name: str(value) for name, value in (dimensions or {}).items()}
+        timestamp = timestamp or int(time.time() * 1000)
+        documents = []
+
+        offset = 0
+        while any(len(stage_values) > offset for stage_values in values.values()):
+            chunk = {stage: stage_values[offset:offset + EMF_MAX_VALUES]
+                     for stage, stage_values in values.items() if len(stage_values) > offset}
+            document = {
+                '_aws': {
+                    'Timestamp': timestamp,
+                    'CloudWatchMetrics': [{
+                        'Namespace': namespace,
+                        'Dimensions': [list(dimensions)],
+                        'Metrics': [{'Name': stage, 'Unit': 'Milliseconds'} for stage in chunk],
+                    }],
+                },
+                **dimensions,
+            }
+            for stage, stage_values in chunk.items():
+                document[stage] = stage_values if len(stage_values) > 1 else stage_values[0]
+
+            documents.append(document)
+            offset += EMF_MAX_VALUES
+
+        return documents
+
+
+# Métricas da invocação atual (a Lambda processa uma invocação por vez em cada processo)
+_STAGE_METRICS = StageMetrics()
+
+
+def get_stage_metrics():
+    """
+    Retorna as métricas de etapas da invocação atual.
+    """
+    return _STAGE_METRICS
+
+
+def stage_timer(stage):
+    """
+    Mede a duração de um bloco 'with' como uma execução da etapa.
+
+    Exemplo:
+        with stage_timer('prompt_render'):
+            prompt = PromptTemplate(context)
+    """
+    return _STAGE_METRICS.timer(stage)
+
+
+def timed(stage):
+    """
+    Decorador que mede cada chamada da função como uma execução da etapa.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with _STAGE_METRICS.timer(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def timed_iter(iterable, stage):
+    """
+    Percorre um iterável medindo a produção de cada item como uma execução da etapa
+    (ex: a montagem de cada lote), sem incluir o processamento do item pelo chamador.
+    """
+    iterator = iter(iterable)
+    while True:
+        start = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            return
+        _STAGE_METRICS.record(stage, time.perf_counter() - start)
+        yield item
+
+
+def emit_metrics(dimensions=None):
+    """
+    Imprime as métricas da invocação no Embedded Metric Format e as reinicia.
+
+    O CloudWatch Logs extrai as métricas das linhas EMF do log da Lambda, sem
+    chamadas adicionais à API do CloudWatch. Desabilitado com METRICS_ENABLED=false.
+
+    Args:
+        dimensions (dict): Dimensões das métricas (ex: {'Mode': 'initial_batch'})
+    """
+    if get_env('METRICS_ENABLED', 'true').lower() == 'true':
+        namespace = get_env('METRICS_NAMESPACE', DEFAULT_METRICS_NAMESPACE)
+        for document in _STAGE_METRICS.to_emf(namespace, dimensions):
+            print(json.dumps(document, separators=(',', ':')))
+
+    _STAGE_METRICS.reset()